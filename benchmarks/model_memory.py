@@ -0,0 +1,76 @@
+"""Memory held by the world model per connected snake.
+
+Builds a World with --snakes connected snakes spread over pits of --pit-size
+members and reports the traced allocations per snake. Point --src at another
+checkout's src/ directory (e.g. a `git worktree` of an older commit) to
+compare against it:
+
+    python benchmarks/model_memory.py --snakes 200000
+    python benchmarks/model_memory.py --src /tmp/sss-old/src
+"""
+
+import argparse
+import gc
+import sys
+import tracemalloc
+import uuid
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure(snakes: int, pit_size: int) -> dict:
+    from server.model import Snake, World
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    world = World()
+    pit = None
+    for n in range(snakes):
+        snake = Snake(f"{n:020d}")
+        world.add_snake(snake)
+        if n % pit_size == 0:
+            pit = world.create_pit(uuid.uuid4())
+        world.add_snake_to_pit(snake, pit)
+
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # sids are allocated by the transport whatever the model looks like
+    sid_bytes = sum(sys.getsizeof(snake_id) for snake_id in world.snakes)
+    total = after - before
+    return {
+        "snakes": snakes,
+        "pits": len(world.pits),
+        "total_bytes": total,
+        "bytes_per_snake": total / snakes,
+        "bytes_per_snake_without_sid": (total - sid_bytes) / snakes,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snakes", type=int, default=100_000)
+    parser.add_argument("--pit-size", type=int, default=6)
+    parser.add_argument(
+        "--src", default=str(REPO_ROOT / "src"), help="Source tree to measure"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, args.src)
+
+    results = measure(args.snakes, args.pit_size)
+    print(f"source:               {args.src}")
+    print(f"snakes / pits:        {results['snakes']} / {results['pits']}")
+    print(f"total:                {results['total_bytes'] / 2**20:.1f} MiB")
+    print(f"per snake:            {results['bytes_per_snake']:.0f} B")
+    print(f"per snake, sid aside: {results['bytes_per_snake_without_sid']:.0f} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""Cost per call of the model and manager hot paths, by world size.
+
+For every --sizes world (connected snakes in pits of --pit-size members)
+each operation runs --rounds timed rounds of --batch calls, after one
+warmup round. Setup, such as connecting the snakes a join round needs, is
+done outside the timed part, and the world is back to its size after every
+round. Stats per call are min, max, mean, stddev, median, IQR and calls/s,
+as pytest-benchmark reports them. The emitter drops everything and logging
+is disabled, although log arguments are still evaluated.
+
+An operation is flagged when its median grows with the world size, by the
+slope of log(median) over log(size): 0 for constant time, 1 for linear.
+Constant time lookups into dicts of a million snakes still miss the CPU
+caches, which shows as a slope of up to about 0.2, so the default
+--max-slope only flags growth of an algorithmic kind, like formatting the
+whole world into a log line on every join.
+
+    python benchmarks/model_micro.py
+    python benchmarks/model_micro.py --sizes 1000 100000 --output micro.json
+"""
+
+import argparse
+import gc
+import itertools
+import json
+import logging
+import math
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from server.model import Snake, World  # noqa: E402
+from server.pit_manager import SnakePitManager  # noqa: E402
+from server.webrtc_manager import WebRtcManager  # noqa: E402
+
+new_ids = (f"new{n:017d}" for n in itertools.count())
+
+
+class NullEmitter:
+    def emit(self, event, data, to, skip_sid=None):
+        pass
+
+    def enter_room(self, sid, room):
+        pass
+
+    def leave_room(self, sid, room):
+        pass
+
+    def disconnect(self, sid):
+        pass
+
+
+class Population:
+    """A world of `size` snakes, all of them in full pits."""
+
+    def __init__(self, size: int, pit_size: int):
+        self.world = World()
+        emitter = NullEmitter()
+        self.pit_manager = SnakePitManager(self.world, emitter)
+        self.web_rtc_manager = WebRtcManager(self.world, emitter)
+        self.pits = []
+        self.snake_ids = []
+        pit = None
+        for n in range(size):
+            snake = Snake(f"{n:020d}", name_index=self.pit_manager.names.allocate())
+            self.world.add_snake(snake)
+            if n % pit_size == 0:
+                pit = self.world.create_pit(uuid.uuid4())
+                self.pits.append(pit)
+            self.world.add_snake_to_pit(snake, pit)
+            self.snake_ids.append(snake.id)
+
+    def batch_size(self, batch: int) -> int:
+        # rounds touching pits use each one at most once, so pits keep their size
+        return min(batch, len(self.pits))
+
+
+def bench_snake_init(population: Population, batch: int) -> float:
+    snake_ids = [next(new_ids) for _ in range(batch)]
+    started = time.perf_counter()
+    for snake_id in snake_ids:
+        Snake(snake_id)
+    return time.perf_counter() - started
+
+
+def bench_world_add_snake(population: Population, batch: int) -> float:
+    world = population.world
+    snakes = [Snake(next(new_ids)) for _ in range(batch)]
+    started = time.perf_counter()
+    for snake in snakes:
+        world.add_snake(snake)
+    elapsed = time.perf_counter() - started
+    for snake in snakes:
+        world.remove_snake(snake.id)
+    return elapsed
+
+
+def bench_world_remove_snake(population: Population, batch: int) -> float:
+    world = population.world
+    snake_ids = [next(new_ids) for _ in range(batch)]
+    for snake_id in snake_ids:
+        world.add_snake(Snake(snake_id))
+    started = time.perf_counter()
+    for snake_id in snake_ids:
+        world.remove_snake(snake_id)
+    return time.perf_counter() - started
+
+
+def bench_world_get_snake_state(population: Population, batch: int) -> float:
+    world = population.world
+    snake_ids = random.choices(population.snake_ids, k=batch)
+    started = time.perf_counter()
+    for snake_id in snake_ids:
+        world.get_snake_state(snake_id)
+    return time.perf_counter() - started
+
+
+def bench_pit_add_snake(population: Population, batch: int) -> float:
+    world = population.world
+    pits = random.sample(population.pits, population.batch_size(batch))
+    snakes = [Snake(next(new_ids)) for _ in pits]
+    for snake in snakes:
+        world.add_snake(snake)
+    started = time.perf_counter()
+    for snake, pit in zip(snakes, pits):
+        world.add_snake_to_pit(snake, pit)
+    elapsed = time.perf_counter() - started
+    for snake, pit in zip(snakes, pits):
+        world.remove_snake_from_pit(snake, pit)
+        world.remove_snake(snake.id)
+    return elapsed
+
+
+def bench_pit_remove_snake(population: Population, batch: int) -> float:
+    world = population.world
+    pits = random.sample(population.pits, population.batch_size(batch))
+    snakes = [Snake(next(new_ids)) for _ in pits]
+    for snake, pit in zip(snakes, pits):
+        world.add_snake(snake)
+        world.add_snake_to_pit(snake, pit)
+    started = time.perf_counter()
+    for snake, pit in zip(snakes, pits):
+        world.remove_snake_from_pit(snake, pit)
+    elapsed = time.perf_counter() - started
+    for snake in snakes:
+        world.remove_snake(snake.id)
+    return elapsed
+
+
+def bench_handle_connect(population: Population, batch: int) -> float:
+    pit_manager = population.pit_manager
+    snake_ids = [next(new_ids) for _ in range(batch)]
+    started = time.perf_counter()
+    for snake_id in snake_ids:
+        pit_manager.handle_connect(snake_id)
+    elapsed = time.perf_counter() - started
+    for snake_id in snake_ids:
+        pit_manager.handle_disconnect(snake_id)
+    return elapsed
+
+
+def bench_handle_join_pit(population: Population, batch: int) -> float:
+    pit_manager = population.pit_manager
+    pit_ids = [
+        pit.id for pit in random.sample(population.pits, population.batch_size(batch))
+    ]
+    snake_ids = [next(new_ids) for _ in pit_ids]
+    for snake_id in snake_ids:
+        pit_manager.handle_connect(snake_id)
+    started = time.perf_counter()
+    for snake_id, pit_id in zip(snake_ids, pit_ids):
+        pit_manager.handle_join_pit(snake_id, pit_id)
+    elapsed = time.perf_counter() - started
+    for snake_id in snake_ids:
+        pit_manager.handle_disconnect(snake_id)
+    return elapsed
+
+
+def bench_handle_disconnect(population: Population, batch: int) -> float:
+    pit_manager = population.pit_manager
+    pit_ids = [
+        pit.id for pit in random.sample(population.pits, population.batch_size(batch))
+    ]
+    snake_ids = [next(new_ids) for _ in pit_ids]
+    for snake_id, pit_id in zip(snake_ids, pit_ids):
+        pit_manager.handle_connect(snake_id)
+        pit_manager.handle_join_pit(snake_id, pit_id)
+    started = time.perf_counter()
+    for snake_id in snake_ids:
+        pit_manager.handle_disconnect(snake_id)
+    return time.perf_counter() - started
+
+
+def bench_assert_peers_in_same_pit(population: Population, batch: int) -> float:
+    web_rtc_manager = population.web_rtc_manager
+    pairs = []
+    for pit in random.choices(population.pits, k=batch):
+        from_snake, to_snake = random.sample(list(pit), 2)
+        pairs.append((from_snake.id, to_snake.id))
+    started = time.perf_counter()
+    for from_peer_id, to_peer_id in pairs:
+        web_rtc_manager._assert_peers_in_same_pit(from_peer_id, to_peer_id)
+    return time.perf_counter() - started
+
+
+BENCHMARKS = {
+    "Snake()": bench_snake_init,
+    "World.add_snake": bench_world_add_snake,
+    "World.remove_snake": bench_world_remove_snake,
+    "World.get_snake_state": bench_world_get_snake_state,
+    "World.add_snake_to_pit": bench_pit_add_snake,
+    "World.remove_snake_from_pit": bench_pit_remove_snake,
+    "SnakePitManager.handle_connect": bench_handle_connect,
+    "SnakePitManager.handle_join_pit": bench_handle_join_pit,
+    "SnakePitManager.handle_disconnect": bench_handle_disconnect,
+    "WebRtcManager._assert_peers_in_same_pit": bench_assert_peers_in_same_pit,
+}
+# pit rounds are capped by the pit count, see Population.batch_size
+PIT_BENCHMARKS = (
+    bench_pit_add_snake,
+    bench_pit_remove_snake,
+    bench_handle_join_pit,
+    bench_handle_disconnect,
+)
+
+
+def stats(per_call: list[float]) -> dict:
+    quartiles = statistics.quantiles(per_call, n=4) if len(per_call) > 1 else [0] * 3
+    mean = statistics.fmean(per_call)
+    return {
+        "min": min(per_call),
+        "max": max(per_call),
+        "mean": mean,
+        "stddev": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+        "median": statistics.median(per_call),
+        "iqr": quartiles[2] - quartiles[0],
+        "ops": 1 / mean if mean else math.inf,
+        "rounds": len(per_call),
+    }
+
+
+def run(benchmark, population: Population, rounds: int, batch: int) -> dict:
+    calls = population.batch_size(batch) if benchmark in PIT_BENCHMARKS else batch
+    # as many calls as with a full batch when the pits run short
+    rounds = rounds * math.ceil(batch / calls)
+    benchmark(population, calls)
+    per_call = []
+    for _ in range(rounds):
+        per_call.append(benchmark(population, calls) / calls)
+    return stats(per_call)
+
+
+def growth(results: dict[int, dict]) -> float:
+    """Least squares slope of log(median) over log(world size)."""
+    points = [
+        (math.log(size), math.log(result["median"]))
+        for size, result in results.items()
+        if result["median"] > 0
+    ]
+    if len(points) < 2:
+        return 0.0
+    mean_x = statistics.fmean(x for x, _ in points)
+    mean_y = statistics.fmean(y for _, y in points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def print_report(results: dict[str, dict[int, dict]], max_slope: float):
+    flagged = []
+    for name, by_size in results.items():
+        slope = growth(by_size)
+        print(name)
+        print(
+            f"  {'size':>9} {'min':>9} {'median':>9} {'mean':>9} {'stddev':>9} "
+            f"{'iqr':>9} {'max':>9} {'Kops/s':>9}   (us per call)"
+        )
+        for size, result in by_size.items():
+            print(
+                f"  {size:>9} "
+                + " ".join(
+                    f"{result[key] * 1e6:>9.3f}"
+                    for key in ("min", "median", "mean", "stddev", "iqr", "max")
+                )
+                + f" {result['ops'] / 1000:>9.1f}"
+            )
+        sizes = list(by_size)
+        ratio = by_size[sizes[-1]]["median"] / by_size[sizes[0]]["median"]
+        verdict = "GROWS with world size" if slope > max_slope else "flat"
+        print(
+            f"  slope {slope:.3f}, {ratio:.2f}x "
+            f"from {sizes[0]} to {sizes[-1]}: {verdict}"
+        )
+        if slope > max_slope:
+            flagged.append(name)
+    print()
+    if flagged:
+        print(f"grow with world size: {', '.join(flagged)}")
+    else:
+        print(f"no operation grows with world size (slope <= {max_slope})")
+    return flagged
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1_000, 10_000, 100_000, 1_000_000],
+    )
+    parser.add_argument("--pit-size", type=int, default=6)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=200, help="Calls per round")
+    parser.add_argument(
+        "--max-slope",
+        type=float,
+        default=0.25,
+        help="Flag operations whose log-log growth is above this",
+    )
+    parser.add_argument(
+        "--only", nargs="+", choices=list(BENCHMARKS), help="Operations to run"
+    )
+    parser.add_argument(
+        "--disable-gc", action="store_true", help="No collections while timing"
+    )
+    parser.add_argument("--output", help="Write the stats as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.disable(logging.CRITICAL)
+    names = args.only or list(BENCHMARKS)
+
+    results: dict[str, dict[int, dict]] = {name: {} for name in names}
+    for size in args.sizes:
+        started = time.perf_counter()
+        population = Population(size, args.pit_size)
+        gc.collect()
+        print(
+            f"world of {size} snakes built in {time.perf_counter() - started:.1f} s",
+            file=sys.stderr,
+        )
+        if args.disable_gc:
+            gc.disable()
+        for name in names:
+            results[name][size] = run(
+                BENCHMARKS[name], population, args.rounds, args.batch
+            )
+        gc.enable()
+        del population
+        gc.collect()
+
+    flagged = print_report(results, args.max_slope)
+    if args.output:
+        Path(args.output).write_text(
+            json.dumps(
+                {
+                    "args": vars(args),
+                    "results": results,
+                    "slopes": {
+                        name: growth(by_size) for name, by_size in results.items()
+                    },
+                    "flagged": flagged,
+                },
+                indent=2,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
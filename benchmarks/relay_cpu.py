@@ -0,0 +1,182 @@
+"""Server CPU and bytes per relayed offer, from inbound to outbound packet.
+
+Feeds encoded send_offer packets carrying browser-like SDPs of --sdp-bytes
+through the server's packet class, the send_offer validation and
+WebRtcManager.send_offer, encoding each new_offer the way socket.io would.
+Modes cover the JSON and msgpack serializers, SSS_RAW_SIGNALING and
+deflated SDPs, relayed as is to a peer that opted in or inflated for one
+that did not. Each mode is timed with process_time, logging off:
+
+    python benchmarks/relay_cpu.py --sdp-bytes 3000 5000 8000
+"""
+
+import argparse
+import logging
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from socketio import packet  # noqa: E402
+
+from server.model import Snake, World  # noqa: E402
+from server.packets import (  # noqa: E402
+    RAW_SIGNALING_EVENTS,
+    parse_payload_limits,
+    signaling_packet_class,
+)
+from server.sdp_compression import SDP_DEFLATE_CAPABILITY, deflate_sdp  # noqa: E402
+from server.validation import parse_session_description, parse_snake_id  # noqa: E402
+from server.webrtc_manager import WebRtcManager  # noqa: E402
+
+# one audio and one video section, as Chrome offers them
+SDP_HEAD = [
+    "v=0",
+    "o=- 4611731400430051336 2 IN IP4 127.0.0.1",
+    "s=-",
+    "t=0 0",
+    "a=group:BUNDLE 0 1",
+    "a=extmap-allow-mixed",
+    "a=msid-semantic: WMS stream",
+]
+SDP_MEDIA = [
+    "m={kind} 9 UDP/TLS/RTP/SAVPF 111 63 9 0 8 13 110 126",
+    "c=IN IP4 0.0.0.0",
+    "a=rtcp:9 IN IP4 0.0.0.0",
+    "a=ice-ufrag:Xk3q",
+    "a=ice-pwd:9Yy0e8bZ0NbJ2m0bUq8aX5tG",
+    "a=ice-options:trickle",
+    "a=fingerprint:sha-256 7B:8B:F0:65:5F:78:E2:51:3B:AC:6F:F3:3F:46:1B:35"
+    ":DC:B8:5F:64:1A:24:C2:43:F0:A1:58:D0:A1:2C:19:08",
+    "a=setup:actpass",
+    "a=mid:{mid}",
+    "a=extmap:1 urn:ietf:params:rtp-hdrext:ssrc-audio-level",
+    "a=extmap:2 http://www.webrtc.org/experiments/rtp-hdrext/abs-send-time",
+    "a=sendrecv",
+    "a=msid:stream {kind}-track",
+    "a=rtcp-mux",
+    "a=rtpmap:111 opus/48000/2",
+    "a=rtcp-fb:111 transport-cc",
+    "a=fmtp:111 minptime=10;useinbandfec=1",
+    "a=ssrc:{ssrc} cname:4TOk42mSjXCkVIa6",
+]
+
+
+def fake_sdp(size: int) -> str:
+    lines = list(SDP_HEAD)
+    mid = 0
+    while len("\r\n".join(lines)) < size:
+        kind = "audio" if mid % 2 == 0 else "video"
+        lines += [
+            line.format(kind=kind, mid=mid, ssrc=1000 + mid) for line in SDP_MEDIA
+        ]
+        mid += 1
+    return "\r\n".join(lines)[:size] + "\r\n"
+
+
+class EncodingEmitter:
+    """Encodes what it is given like socketio.Server.emit does, once per emit."""
+
+    def __init__(self, packet_class):
+        self.packet_class = packet_class
+        self.sent_bytes = 0
+
+    def emit(self, event, data, to, skip_sid=None):
+        self.sent_bytes += encoded_size(
+            self.packet_class(packet.EVENT, data=[event, data]).encode()
+        )
+
+
+def encoded_size(encoded) -> int:
+    # JSON packets with binary data are a list, the attachments following
+    if isinstance(encoded, list):
+        return sum(len(part) for part in encoded)
+    return len(encoded)
+
+
+def receive(packet_class, encoded):
+    if not isinstance(encoded, list):
+        return packet_class(encoded_packet=encoded)
+
+    received = packet_class(encoded_packet=encoded[0])
+    for attachment in encoded[1:]:
+        received.add_attachment(attachment)
+    return received
+
+
+def relay(
+    packet_class, encoded, offers: int, capabilities: frozenset[str]
+) -> tuple[float, int]:
+    world = World()
+    pit = world.create_pit(uuid.uuid4())
+    for snake_id in ("peer-1", "peer-2"):
+        snake = Snake(snake_id, capabilities=capabilities)
+        world.add_snake(snake)
+        world.add_snake_to_pit(snake, pit)
+    emitter = EncodingEmitter(packet_class)
+    manager = WebRtcManager(world, emitter)
+
+    started = time.process_time()
+    for _ in range(offers):
+        received = receive(packet_class, encoded)
+        _, to_peer_id, offer = received.data
+        manager.send_offer(
+            "peer-1",
+            parse_snake_id(to_peer_id),
+            parse_session_description(offer, "offer"),
+        )
+    return time.process_time() - started, emitter.sent_bytes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sdp-bytes", type=int, nargs="+", default=[3000, 5000, 8000])
+    parser.add_argument("--offers", type=int, default=20_000)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.disable(logging.INFO)
+    limits = parse_payload_limits(None)
+    json_packet = signaling_packet_class(limits)
+    raw_packet = signaling_packet_class(limits, RAW_SIGNALING_EVENTS)
+    msgpack_packet = signaling_packet_class(limits, serializer="msgpack")
+    deflating = frozenset([SDP_DEFLATE_CAPABILITY])
+    # name, packet class, whether the sender deflates, recipient capabilities
+    modes = [
+        ("json", json_packet, False, frozenset()),
+        ("json raw", raw_packet, False, frozenset()),
+        ("json deflate", json_packet, True, deflating),
+        ("msgpack", msgpack_packet, False, frozenset()),
+        ("msgpack deflate", msgpack_packet, True, deflating),
+        ("msgpack inflate", msgpack_packet, True, frozenset()),
+    ]
+
+    print(
+        f"{'sdp bytes':>9}  {'mode':<16} {'us/offer':>9} {'bytes in':>9} "
+        f"{'bytes out':>9}"
+    )
+    for sdp_bytes in args.sdp_bytes:
+        sdp = fake_sdp(sdp_bytes)
+        for mode, packet_class, deflate, capabilities in modes:
+            offer = {"type": "offer", "sdp": sdp}
+            if deflate:
+                offer = {"type": "offer", "sdp_deflate": deflate_sdp(sdp)}
+            encoded = packet_class(
+                packet.EVENT, data=["send_offer", "peer-2", offer]
+            ).encode()
+
+            seconds, sent_bytes = relay(
+                packet_class, encoded, args.offers, capabilities
+            )
+            print(
+                f"{sdp_bytes:>9}  {mode:<16} {seconds / args.offers * 1e6:>9.1f} "
+                f"{encoded_size(encoded):>9} {sent_bytes / args.offers:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
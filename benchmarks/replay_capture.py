@@ -0,0 +1,112 @@
+"""Handler CPU time of a captured stretch of traffic, replayed without the network.
+
+Reads a log written with SSS_CAPTURE_PATH and feeds its events to a fresh
+SnakePitManager and WebRtcManager, through the same validation as the
+server, with an emitter that drops what it is given. Events go out at
+their captured pace divided by --speed, or back to back with --speed 0
+(the default), and each handler is timed with process_time, logging off:
+
+    python benchmarks/replay_capture.py capture.bin --speed 10
+"""
+
+import argparse
+import logging
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from server.capture import read_capture, replay_event  # noqa: E402
+from server.ice_batcher import IceCandidateBatcher  # noqa: E402
+from server.model import World  # noqa: E402
+from server.pit_manager import SnakePitManager  # noqa: E402
+from server.reaper import Reaper  # noqa: E402
+from server.webrtc_manager import WebRtcManager  # noqa: E402
+
+
+class NullEmitter:
+    def emit(self, event, data, to, skip_sid=None):
+        pass
+
+    def enter_room(self, sid, room):
+        pass
+
+    def leave_room(self, sid, room):
+        pass
+
+    def disconnect(self, sid):
+        pass
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="file written with SSS_CAPTURE_PATH")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0,
+        help="replay this many times faster than captured, 0 for back to back",
+    )
+    parser.add_argument(
+        "--ice-batch-window-ms",
+        type=float,
+        default=0,
+        help="batch ICE candidates as SSS_ICE_BATCH_WINDOW_MS does",
+    )
+    parser.add_argument("--resume-grace", type=float, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.disable(logging.CRITICAL)
+
+    world = World()
+    emitter = NullEmitter()
+    pit_manager = SnakePitManager(world, emitter, resume_grace=args.resume_grace)
+    pit_manager.reaper = Reaper(pit_manager)
+    web_rtc_manager = WebRtcManager(
+        world,
+        emitter,
+        IceCandidateBatcher(args.ice_batch_window_ms / 1000)
+        if args.ice_batch_window_ms > 0
+        else None,
+    )
+
+    cpu = defaultdict(float)
+    counts = defaultdict(int)
+    errors = defaultdict(int)
+    started = time.monotonic()
+    for captured in read_capture(args.capture):
+        if args.speed > 0:
+            delay = captured.at / args.speed - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+        cpu_started = time.process_time()
+        try:
+            replay_event(pit_manager, web_rtc_manager, captured)
+        except Exception:
+            # the server answers these with an error event
+            errors[captured.event] += 1
+        web_rtc_manager.flush_ice_candidates()
+        cpu[captured.event] += time.process_time() - cpu_started
+        counts[captured.event] += 1
+    wall = time.monotonic() - started
+
+    print(f"{'event':<20} {'count':>9} {'errors':>7} {'cpu ms':>9} {'us/event':>9}")
+    for event in sorted(cpu, key=cpu.get, reverse=True):
+        print(
+            f"{event:<20} {counts[event]:>9} {errors[event]:>7} "
+            f"{cpu[event] * 1000:>9.1f} {cpu[event] / counts[event] * 1e6:>9.1f}"
+        )
+    print(f"events:    {sum(counts.values())}")
+    print(f"cpu:       {sum(cpu.values()) * 1000:.1f} ms")
+    print(f"wall:      {wall:.2f} s")
+    print(f"world:     {len(world.snakes)} snakes, {len(world.pits)} pits left")
+
+
+if __name__ == "__main__":
+    main()
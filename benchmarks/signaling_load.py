@@ -0,0 +1,540 @@
+"""End-to-end signaling load generator.
+
+Starts the real server in a subprocess (or targets --url) and drives synthetic
+socket.io clients through connect -> join_snake_pit -> offer/answer/ICE full
+mesh -> leave -> disconnect. Reports throughput, relay latency percentiles per
+event type and time-to-full-mesh per pit, and writes them as JSON so runs can
+be compared across commits:
+
+    uv run --extra asyncio python benchmarks/signaling_load.py --clients 1200
+    uv run --extra asyncio python benchmarks/signaling_load.py --baseline old.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import socketio
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(sorted_samples: list[float], fraction: float) -> float:
+    index = min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))
+    return sorted_samples[index]
+
+
+def summarize_ms(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered) * 1000,
+        "p50": percentile(ordered, 0.50) * 1000,
+        "p95": percentile(ordered, 0.95) * 1000,
+        "p99": percentile(ordered, 0.99) * 1000,
+        "max": ordered[-1] * 1000,
+    }
+
+
+@dataclass
+class Recorder:
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    errors: list[str] = field(default_factory=list)
+    relayed: int = 0
+    # connects and joins turned away by admission control, then retried
+    refused: int = 0
+
+    def latency(self, event: str, sent_at: float):
+        self.latencies.setdefault(event, []).append(time.perf_counter() - sent_at)
+
+
+class PitRun:
+    """Tracks one pit until every pair finished offer/answer and ICE."""
+
+    def __init__(self, pit_id: str, size: int, ice_candidates: int):
+        self.pit_id = pit_id
+        self.ice_candidates = ice_candidates
+        self.pending_pairs = size * (size - 1) // 2
+        self.ice_received: dict[tuple[str, str], int] = {}
+        self.answered: set[frozenset] = set()
+        self.done: set[frozenset] = set()
+        self.started_at = 0.0
+        self.full_mesh = asyncio.Event()
+        self.time_to_full_mesh: float | None = None
+
+    def on_ice(self, from_peer: str, to_peer: str, count: int):
+        key = (from_peer, to_peer)
+        self.ice_received[key] = self.ice_received.get(key, 0) + count
+        self._check_pair(from_peer, to_peer)
+
+    def on_answer(self, peer_a: str, peer_b: str):
+        self.answered.add(frozenset((peer_a, peer_b)))
+        self._check_pair(peer_a, peer_b)
+
+    def _check_pair(self, peer_a: str, peer_b: str):
+        pair = frozenset((peer_a, peer_b))
+        if pair in self.done or pair not in self.answered:
+            return
+        if (
+            self.ice_received.get((peer_a, peer_b), 0) < self.ice_candidates
+            or self.ice_received.get((peer_b, peer_a), 0) < self.ice_candidates
+        ):
+            return
+
+        self.done.add(pair)
+        if len(self.done) == self.pending_pairs:
+            self.time_to_full_mesh = time.perf_counter() - self.started_at
+            self.full_mesh.set()
+
+
+class SyntheticSnake:
+    def __init__(self, args, recorder: Recorder):
+        self.args = args
+        self.recorder = recorder
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.pit: PitRun | None = None
+        self.events: dict[str, asyncio.Event] = {
+            name: asyncio.Event() for name in ("connected", "pit_created", "pit_joined")
+        }
+        self.sent_at: dict[str, float] = {}
+        self.sdp = "a=x-padding:" + "x" * max(0, args.sdp_bytes - 12)
+
+        self.sio.on("connected", self._on_connected)
+        self.sio.on("pit_created", self._on_pit_created)
+        self.sio.on("pit_joined", self._on_pit_joined)
+        self.sio.on("new_room_member", self._on_new_room_member)
+        self.sio.on("room_member_left", self._on_room_member_left)
+        self.sio.on("new_offer", self._on_new_offer)
+        self.sio.on("new_answer", self._on_new_answer)
+        self.sio.on("new_ice_candidate", self._on_new_ice_candidate)
+        self.sio.on("new_ice_candidates", self._on_new_ice_candidates)
+        self.sio.on("error", self._on_error)
+
+    @property
+    def id(self) -> str:
+        return self.sio.get_sid()
+
+    async def connect(self, url: str, pit_id: str):
+        auth = {"capabilities": self.args.capabilities}
+        self.sent_at["connect"] = time.perf_counter()
+        while True:
+            try:
+                await self.sio.connect(
+                    f"{url}?pit_id={pit_id}", transports=["websocket"], auth=auth
+                )
+                break
+            except socketio.exceptions.ConnectionError:
+                # refused under load, back off like a real client would
+                self.recorder.refused += 1
+                await asyncio.sleep(random.uniform(0.5, 1.5))
+        await self.events["connected"].wait()
+
+    async def create_pit(self, pit_id: str):
+        self.sent_at["create"] = time.perf_counter()
+        await self.sio.emit("create_snake_pit", pit_id)
+        await self.events["pit_created"].wait()
+
+    async def join(self, pit: PitRun):
+        self.pit = pit
+        self.sent_at["join"] = time.perf_counter()
+        await self.sio.emit("join_snake_pit", pit.pit_id)
+        await self.events["pit_joined"].wait()
+
+    async def leave(self, leave_times: dict[str, float]):
+        leave_times[self.id] = time.perf_counter()
+        await self.sio.emit("leave_snake_pit")
+
+    async def _on_connected(self, data):
+        self.recorder.latency("connected", self.sent_at["connect"])
+        self.events["connected"].set()
+
+    async def _on_pit_created(self, data):
+        self.recorder.latency("pit_created", self.sent_at["create"])
+        self.events["pit_created"].set()
+
+    async def _on_pit_joined(self, data):
+        self.recorder.latency("pit_joined", self.sent_at["join"])
+        self.events["pit_joined"].set()
+        if self.args.offers in ("plan", "uncoordinated"):
+            # the newcomer offers to every member it is told to at once
+            for peer_id in data["offer_to"]:
+                await self._send_offer(peer_id)
+
+    async def _on_new_room_member(self, data):
+        # earlier members offer to newcomers, so every pair negotiates once,
+        # unless both sides offer as clients deciding on their own might
+        if self.args.offers in ("members", "uncoordinated"):
+            await self._send_offer(data["new_peer_id"])
+
+    async def _send_offer(self, peer_id: str):
+        await self.sio.emit(
+            "send_offer",
+            (
+                peer_id,
+                {"type": "offer", "sdp": self.sdp, "sent_at": time.perf_counter()},
+            ),
+        )
+
+    async def _on_room_member_left(self, data):
+        sent_at = self.args.leave_times.get(data["leaving_peer_id"])
+        if sent_at is not None:
+            self.recorder.latency("room_member_left", sent_at)
+
+    async def _on_new_offer(self, data):
+        self.recorder.latency("new_offer", data["offer"]["sent_at"])
+        self.recorder.relayed += 1
+        peer_id = data["fromPeerId"]
+        await self.sio.emit(
+            "send_answer",
+            (
+                peer_id,
+                {"type": "answer", "sdp": self.sdp, "sent_at": time.perf_counter()},
+            ),
+        )
+        await self._send_ice_candidates(peer_id)
+
+    async def _on_new_answer(self, data):
+        self.recorder.latency("new_answer", data["answer"]["sent_at"])
+        self.recorder.relayed += 1
+        peer_id = data["fromPeerId"]
+        self.pit.on_answer(self.id, peer_id)
+        await self._send_ice_candidates(peer_id)
+
+    async def _send_ice_candidates(self, peer_id: str):
+        for n in range(self.args.ice_candidates):
+            candidate = {
+                "candidate": f"candidate:{n} 1 UDP 2113667326 10.0.{n // 250}.{n % 250} {50000 + n} typ host",
+                "sdpMid": "0",
+                "sdpMLineIndex": 0,
+                "sent_at": time.perf_counter(),
+            }
+            await self.sio.emit("send_ice_candidate", (peer_id, candidate))
+
+    async def _on_new_ice_candidate(self, data):
+        self._on_candidates(data["fromPeerId"], [data["newIceCandidate"]])
+
+    async def _on_new_ice_candidates(self, data):
+        self._on_candidates(data["fromPeerId"], data["newIceCandidates"])
+
+    def _on_candidates(self, peer_id: str, candidates: list):
+        for candidate in candidates:
+            if candidate and candidate.get("sent_at"):
+                self.recorder.latency("new_ice_candidate", candidate["sent_at"])
+        self.recorder.relayed += len(candidates)
+        self.pit.on_ice(peer_id, self.id, len(candidates))
+
+    async def _on_error(self, data):
+        if "retry_after" in data and not self.events["pit_joined"].is_set():
+            self.recorder.refused += 1
+            asyncio.create_task(self._retry_join(data["retry_after"]))
+            return
+        self.recorder.errors.append(data.get("message", str(data)))
+
+    async def _retry_join(self, retry_after: float):
+        await asyncio.sleep(retry_after * random.uniform(1, 1.5))
+        await self.sio.emit("join_snake_pit", self.pit.pit_id)
+
+
+async def connect_storm(url: str, clients: int, stop, connects, failed):
+    """Clients connecting, quick joining and leaving in a loop until `stop`."""
+
+    async def churn():
+        while not stop.is_set():
+            client = socketio.AsyncClient(reconnection=False)
+            try:
+                await client.connect(url, transports=["websocket"])
+            except socketio.exceptions.ConnectionError:
+                with failed.get_lock():
+                    failed.value += 1
+                await asyncio.sleep(random.uniform(0.5, 1.5))
+                continue
+            with connects.get_lock():
+                connects.value += 1
+            await client.emit("quick_join")
+            await client.disconnect()
+
+    await asyncio.gather(*(churn() for _ in range(clients)))
+
+
+def run_connect_storm(url: str, clients: int, stop, connects, failed):
+    # in its own process, sharing a loop with the measured clients starves it
+    asyncio.run(connect_storm(url, clients, stop, connects, failed))
+
+
+def wait_for_port(host: str, port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"server did not listen on {host}:{port} in {timeout}s")
+
+
+def start_server(args) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(REPO_ROOT / "src"), env.get("PYTHONPATH", "")]
+    )
+    command = [
+        sys.executable,
+        "-m",
+        "server.server",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(args.port),
+        "--runtime",
+        args.runtime,
+        "--workers",
+        str(args.workers),
+    ]
+    process = subprocess.Popen(
+        command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    wait_for_port("127.0.0.1", args.port, timeout=30)
+    return process
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_load(args) -> dict:
+    recorder = Recorder()
+    args.leave_times = {}
+    pits = [
+        PitRun(str(uuid.uuid4()), args.pit_size, args.ice_candidates)
+        for _ in range(args.clients // args.pit_size)
+    ]
+    snakes = [
+        [SyntheticSnake(args, recorder) for _ in range(args.pit_size)] for _ in pits
+    ]
+    connect_slots = asyncio.Semaphore(args.connect_concurrency)
+
+    async def connect(snake: SyntheticSnake, pit: PitRun):
+        async with connect_slots:
+            await snake.connect(args.url, pit.pit_id)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(
+        *(connect(s, pit) for pit, group in zip(pits, snakes) for s in group)
+    )
+    connect_seconds = time.perf_counter() - started_at
+
+    async def form_mesh(pit: PitRun, group: list[SyntheticSnake]):
+        await group[0].create_pit(pit.pit_id)
+        pit.started_at = time.perf_counter()
+        await asyncio.gather(*(snake.join(pit) for snake in group))
+        try:
+            await asyncio.wait_for(pit.full_mesh.wait(), args.mesh_timeout)
+        except asyncio.TimeoutError:
+            recorder.errors.append(f"pit {pit.pit_id} did not reach full mesh")
+
+    storm_stop = multiprocessing.Event()
+    storm_connects = multiprocessing.Value("i", 0)
+    storm_failed = multiprocessing.Value("i", 0)
+    storm = multiprocessing.Process(
+        target=run_connect_storm,
+        args=(args.url, args.connect_storm, storm_stop, storm_connects, storm_failed),
+    )
+    if args.connect_storm:
+        storm.start()
+        await asyncio.sleep(1)
+
+    signaling_started_at = time.perf_counter()
+    await asyncio.gather(*(form_mesh(pit, group) for pit, group in zip(pits, snakes)))
+    signaling_seconds = time.perf_counter() - signaling_started_at
+    storm_stop.set()
+    if args.connect_storm:
+        await asyncio.to_thread(storm.join)
+
+    await asyncio.gather(
+        *(snake.leave(args.leave_times) for group in snakes for snake in group)
+    )
+    await asyncio.sleep(0.5)
+    await asyncio.gather(
+        *(snake.sio.disconnect() for group in snakes for snake in group)
+    )
+
+    mesh_times = [p.time_to_full_mesh for p in pits if p.time_to_full_mesh is not None]
+    return {
+        "clients": len(pits) * args.pit_size,
+        "pits": len(pits),
+        "connect_seconds": connect_seconds,
+        "connections_per_second": len(pits) * args.pit_size / connect_seconds,
+        "signaling_seconds": signaling_seconds,
+        "relayed_messages": recorder.relayed,
+        "relayed_per_second": recorder.relayed / signaling_seconds,
+        "relayed_per_pit": recorder.relayed / len(pits),
+        "latency_ms": {
+            event: summarize_ms(samples)
+            for event, samples in sorted(recorder.latencies.items())
+        },
+        "time_to_full_mesh_ms": summarize_ms(mesh_times),
+        "incomplete_pits": len(pits) - len(mesh_times),
+        "storm_connects": storm_connects.value,
+        "storm_failed": storm_failed.value,
+        "refused": recorder.refused,
+        "errors": len(recorder.errors),
+        "error_samples": recorder.errors[:10],
+    }
+
+
+def print_report(results: dict, baseline: dict | None):
+    def delta(path: list[str]) -> str:
+        if baseline is None:
+            return ""
+        old = baseline["results"]
+        for key in path:
+            old = old.get(key, {}) if isinstance(old, dict) else {}
+        new = results
+        for key in path:
+            new = new[key]
+        if not isinstance(old, (int, float)) or not old:
+            return ""
+        return f" ({(new - old) / old * 100:+.1f}%)"
+
+    print(
+        f"{results['clients']} clients in {results['pits']} pits, "
+        f"{results['connections_per_second']:.0f} connects/s{delta(['connections_per_second'])}, "
+        f"{results['relayed_per_second']:.0f} relayed msgs/s{delta(['relayed_per_second'])}, "
+        f"{results['relayed_per_pit']:.0f} relayed msgs per pit{delta(['relayed_per_pit'])}"
+    )
+    print(f"{'event':<20}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = dict(results["latency_ms"])
+    rows["time_to_full_mesh"] = results["time_to_full_mesh_ms"]
+    for event, stats in rows.items():
+        if not stats["count"]:
+            continue
+        path = (
+            ["time_to_full_mesh_ms", "p99"]
+            if event == "time_to_full_mesh"
+            else ["latency_ms", event, "p99"]
+        )
+        print(
+            f"{event:<20}{stats['count']:>8}{stats['p50']:>10.2f}"
+            f"{stats['p95']:>10.2f}{stats['p99']:>10.2f}{delta(path)}"
+        )
+    if results["storm_connects"] or results["refused"]:
+        print(
+            f"{results['storm_connects']} storm connects "
+            f"({results['storm_failed']} failed or refused), "
+            f"{results['refused']} connects/joins of measured clients refused"
+        )
+    if results["errors"]:
+        print(f"{results['errors']} errors, e.g. {results['error_samples'][:3]}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=600)
+    parser.add_argument("--pit-size", type=int, default=6)
+    parser.add_argument("--ice-candidates", type=int, default=4)
+    parser.add_argument("--sdp-bytes", type=int, default=4000)
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--mesh-timeout", type=float, default=60)
+    parser.add_argument(
+        "--capability",
+        dest="capabilities",
+        action="append",
+        default=[],
+        help="Capability announced at connect, e.g. ice_candidate_batching",
+    )
+    parser.add_argument(
+        "--offers",
+        choices=("members", "plan", "uncoordinated"),
+        default="members",
+        help="Who offers when a snake joins: members on new_room_member, the "
+        "newcomer to its offer_to list as the mesh plan has it, or both",
+    )
+    parser.add_argument(
+        "--connect-storm",
+        type=int,
+        default=0,
+        help="Clients churning through connect/quick_join/disconnect while the "
+        "pits signal",
+    )
+    parser.add_argument(
+        "--url", help="Target a running server instead of starting one"
+    )
+    parser.add_argument("--port", type=int, default=5790)
+    parser.add_argument(
+        "--runtime", choices=["eventlet", "asyncio"], default="eventlet"
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--output", help="Defaults to benchmarks/results/signaling_load-<commit>.json"
+    )
+    parser.add_argument("--baseline", help="Previous --output file to compare to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = None
+    if args.url is None:
+        server = start_server(args)
+        args.url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        results = asyncio.run(run_load(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    print_report(results, baseline)
+
+    config = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("leave_times", "baseline", "output")
+    }
+    commit = git_commit()
+    output = Path(
+        args.output
+        or REPO_ROOT / "benchmarks" / "results" / f"signaling_load-{(commit or 'local')[:10]}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {
+                "commit": commit,
+                "timestamp": time.time(),
+                "config": config,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
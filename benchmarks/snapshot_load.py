@@ -0,0 +1,81 @@
+"""Cost of writing a world snapshot and of restoring sessions from it.
+
+Builds a World with --snakes resumable snakes in pits of --pit-size members,
+writes it with write_snapshot, then times opening the snapshot and looking up
+--lookups random sessions, which is all a restarted server does up front:
+
+    python benchmarks/snapshot_load.py --snakes 1000000
+"""
+
+import argparse
+import os
+import random
+import secrets
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from server.model import Snake, World  # noqa: E402
+from server.snapshot import WorldSnapshot, write_snapshot  # noqa: E402
+
+
+def build_world(snakes: int, pit_size: int) -> tuple[World, list[str]]:
+    world = World()
+    tokens = []
+    pit = None
+    for n in range(snakes):
+        snake = Snake(f"{n:020d}", name_index=n)
+        snake.resume_token = secrets.token_urlsafe(16)
+        tokens.append(snake.resume_token)
+        world.add_snake(snake)
+        if n % pit_size == 0:
+            pit = world.create_pit(uuid.uuid4())
+        world.add_snake_to_pit(snake, pit)
+    return world, tokens
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snakes", type=int, default=1_000_000)
+    parser.add_argument("--pit-size", type=int, default=6)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    world, tokens = build_world(args.snakes, args.pit_size)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "world.snapshot")
+
+        started = time.perf_counter()
+        write_snapshot(world, path)
+        write_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        snapshot = WorldSnapshot.open(path)
+        open_seconds = time.perf_counter() - started
+
+        sample = random.sample(tokens, min(args.lookups, len(tokens)))
+        started = time.perf_counter()
+        for token in sample:
+            snapshot.find_session(token)
+        lookup_seconds = time.perf_counter() - started
+
+        size = os.path.getsize(path)
+        snapshot.close()
+
+    print(f"snakes / pits:  {args.snakes} / {len(world.pits)}")
+    print(f"snapshot size:  {size / 2**20:.1f} MiB")
+    print(f"write:          {write_seconds * 1000:.0f} ms")
+    print(f"open:           {open_seconds * 1e6:.0f} us")
+    print(f"lookup:         {lookup_seconds / len(sample) * 1e6:.1f} us per session")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import math
+import time
+
+from server.emitter import Emitter
+from server.logger import get_logger
+from server.metrics import ADMISSION_REFUSALS
+from server.model import SnakeId
+
+_logger = get_logger(__name__)
+
+# events per second and burst, per snake
+DEFAULT_RATE_LIMITS: dict[str, tuple[float, float]] = {
+    "create_snake_pit": (1, 5),
+    "join_snake_pit": (2, 10),
+    "quick_join": (2, 10),
+    "leave_snake_pit": (2, 10),
+    "send_offer": (10, 50),
+    "send_answer": (10, 50),
+    "send_ice_candidate": (50, 200),
+    "peer_connected": (10, 50),
+}
+# refused while the loop lags, signaling inside established pits is not
+LAG_ADMITTED_EVENTS = ("join_snake_pit", "quick_join")
+
+
+def parse_rate_limits(spec: str | None) -> dict[str, tuple[float, float]]:
+    # "send_ice_candidate=50/100,create_snake_pit=1/5", over the defaults
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for item in (spec or "").split(","):
+        if "=" in item:
+            event, limit = item.split("=", 1)
+            rate, _, burst = limit.partition("/")
+            limits[event.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated", "refusals")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+        # refusals since the last accepted event
+        self.refusals = 0
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.refusals = 0
+            return True
+
+        self.refusals += 1
+        return False
+
+    def retry_after(self) -> float:
+        return (1 - self.tokens) / self.rate
+
+
+class LagMonitor:
+    """Event loop lag, as seen by a task sleeping a known interval.
+
+    Lag samples raise the estimate at once and it decays by `decay` per
+    sample, so a burst of lag is noticed straight away and forgotten over a
+    few dozen housekeeping rounds.
+    """
+
+    __slots__ = ("threshold", "decay", "lag")
+
+    def __init__(self, threshold: float, decay: float = 0.9):
+        self.threshold = threshold
+        self.decay = decay
+        self.lag = 0.0
+
+    def record(self, lag: float) -> None:
+        self.lag = max(lag, self.lag * self.decay)
+
+    def overloaded(self) -> bool:
+        return self.threshold > 0 and self.lag > self.threshold
+
+    def retry_after(self) -> int:
+        # the further behind the loop is, the longer clients back off
+        return max(1, math.ceil(self.lag / self.threshold))
+
+
+class AdmissionControl:
+    """Refuses events before any handler work.
+
+    - every event with a rate limit goes through a per snake token bucket
+    - joins, and connections through `connect_retry_after`, are refused
+      while the event loop lags more than `max_loop_lag` seconds
+
+    Refused snakes get an `error` with a `retry_after`, once per streak of
+    refusals so a flood is not answered message for message.
+    """
+
+    def __init__(
+        self,
+        emitter: Emitter,
+        rate_limits: dict[str, tuple[float, float]] = DEFAULT_RATE_LIMITS,
+        max_loop_lag: float = 0,
+    ):
+        self.emitter = emitter
+        self.rate_limits = rate_limits
+        self.buckets: dict[SnakeId, dict[str, TokenBucket]] = dict()
+        self.loop_lag = LagMonitor(max_loop_lag)
+
+    def admit(self, snake_id: SnakeId, event: str, now: float | None = None) -> bool:
+        if event in LAG_ADMITTED_EVENTS and self.loop_lag.overloaded():
+            self._refuse(snake_id, event, "overloaded", self.loop_lag.retry_after())
+            return False
+
+        limit = self.rate_limits.get(event)
+        if limit is None:
+            return True
+
+        now = time.monotonic() if now is None else now
+        snake_buckets = self.buckets.get(snake_id)
+        if snake_buckets is None:
+            snake_buckets = self.buckets[snake_id] = dict()
+        bucket = snake_buckets.get(event)
+        if bucket is None:
+            bucket = snake_buckets[event] = TokenBucket(*limit, now)
+
+        if bucket.take(now):
+            return True
+
+        if bucket.refusals == 1:
+            self._refuse(snake_id, event, "rate_limited", bucket.retry_after())
+        else:
+            ADMISSION_REFUSALS.inc(event, "rate_limited")
+        return False
+
+    def connect_retry_after(self) -> int | None:
+        """Seconds a connecting client should wait, None to let it in."""
+        if not self.loop_lag.overloaded():
+            return None
+
+        ADMISSION_REFUSALS.inc("connect", "overloaded")
+        return self.loop_lag.retry_after()
+
+    def forget(self, snake_id: SnakeId) -> None:
+        self.buckets.pop(snake_id, None)
+
+    def _refuse(self, snake_id: SnakeId, event: str, reason: str, retry_after):
+        ADMISSION_REFUSALS.inc(event, reason)
+        _logger.warning(
+            "Refused %s from %s: %s",
+            event,
+            snake_id,
+            reason,
+            extra={"event": "admission", "reason": reason},
+        )
+        self.emitter.emit(
+            "error",
+            {
+                "message": f"Refused {event}: {reason}",
+                "retry_after": round(retry_after, 3),
+            },
+            to=snake_id,
+        )
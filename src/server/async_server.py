@@ -0,0 +1,335 @@
+import asyncio
+import signal
+import time
+import uuid
+
+import socketio
+from aiohttp import web
+
+from server.admission import AdmissionControl, parse_rate_limits
+from server.capture import CaptureWriter
+from server.config import ServerConfig
+from server.emitter import AsyncSocketIOEmitter, PriorityEmitter
+from server.ice_batcher import IceCandidateBatcher
+from server.logger import get_logger
+from server.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, instrumented, watch_world
+from server.model import World, create_world
+from server.negotiation_trace import NegotiationTracer
+from server.packets import (
+    PAYLOAD_REJECTED_EVENT,
+    RAW_SIGNALING_EVENTS,
+    parse_payload_limits,
+    signaling_packet_class,
+)
+from server.pit_manager import SnakePitManager
+from server.reaper import Reaper
+from server.sdp_compression import SDP_DICTIONARY
+from server.sharding import WorkerShard
+from server.snapshot import WorldSnapshot, snapshot_path_for, write_snapshot
+from server.validation import (
+    parse_capabilities,
+    parse_ice_candidate,
+    parse_pit_id,
+    parse_resume_token,
+    parse_session_description,
+    parse_snake_id,
+)
+from server.webrtc_manager import WebRtcManager
+
+_logger = get_logger(__name__)
+PIT_MANAGER = web.AppKey("pit_manager", SnakePitManager)
+SNAPSHOT_PATH = web.AppKey("snapshot_path", str)
+
+
+def create_app(config: ServerConfig, shard: WorkerShard | None = None) -> web.Application:
+    """Same events as server.server, served by a native asyncio socket.io server."""
+    if config.world_store is not None:
+        # SharedWorld uses a blocking Redis client, which would stall the loop
+        raise ValueError("SSS_WORLD_STORE is not supported by the asyncio runtime")
+
+    client_manager = None
+    if config.message_queue is not None:
+        client_manager = socketio.AsyncRedisManager(config.message_queue)
+
+    payload_limits = parse_payload_limits(config.payload_limits)
+    sio = socketio.AsyncServer(
+        async_mode="aiohttp",
+        cors_allowed_origins="*",
+        client_manager=client_manager,
+        serializer=signaling_packet_class(
+            payload_limits,
+            RAW_SIGNALING_EVENTS if config.raw_signaling else (),
+            config.serializer,
+        ),
+        max_http_buffer_size=2 * max(payload_limits.values()),
+    )
+    app = web.Application()
+    sio.attach(app)
+
+    world = create_world()
+    socket_emitter = AsyncSocketIOEmitter(sio)
+    emitter = socket_emitter
+    outbound_lanes = None
+    if config.outbound_lanes:
+        emitter = outbound_lanes = PriorityEmitter(
+            socket_emitter, config.outbound_lane_depth
+        )
+    pit_manager = SnakePitManager(
+        world,
+        emitter,
+        shard,
+        name_scope=config.name_scope,
+        quick_join_pit_size=config.quick_join_pit_size,
+        max_pit_size=config.max_pit_size,
+        pit_overflow=config.pit_overflow,
+        resume_grace=config.resume_grace,
+    )
+    pit_manager.reaper = Reaper(
+        pit_manager,
+        empty_pit_ttl=config.empty_pit_ttl,
+        pit_idle_ttl=config.pit_idle_ttl,
+        snake_idle_ttl=config.snake_idle_ttl,
+    )
+    admission = AdmissionControl(
+        emitter, parse_rate_limits(config.rate_limits), config.max_loop_lag
+    )
+    if config.negotiation_tracing:
+        pit_manager.tracer = NegotiationTracer()
+    web_rtc_manager = WebRtcManager(
+        world,
+        emitter,
+        IceCandidateBatcher(config.ice_batch_window)
+        if config.ice_batch_window > 0
+        else None,
+        enforce_mesh_plan=config.enforce_mesh_plan,
+        tracer=pit_manager.tracer,
+    )
+
+    app[PIT_MANAGER] = pit_manager
+
+    # hardcode a pit for testing
+    world.create_pit(uuid.UUID("697d8c94-cee3-4a99-a3b6-b7cced7927fc"))
+    watch_world(world)
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            body=REGISTRY.render().encode(),
+            headers={"Content-Type": PROMETHEUS_CONTENT_TYPE},
+        )
+
+    async def sdp_dictionary(request: web.Request) -> web.Response:
+        return web.Response(
+            body=SDP_DICTIONARY, content_type="application/octet-stream"
+        )
+
+    async def negotiations(request: web.Request) -> web.Response:
+        if pit_manager.tracer is None:
+            raise web.HTTPNotFound(text="Negotiation tracing is off")
+        return web.json_response(pit_manager.tracer.summary())
+
+    app.router.add_get("/metrics", metrics)
+    app.router.add_get("/sdp-dictionary", sdp_dictionary)
+    app.router.add_get("/negotiations", negotiations)
+
+    snapshot_path = None
+    if config.snapshot_path is not None:
+        snapshot_path = app[SNAPSHOT_PATH] = snapshot_path_for(
+            config.snapshot_path, shard
+        )
+        snapshot = WorldSnapshot.open(snapshot_path)
+        if snapshot is not None:
+            pit_manager.load_snapshot(snapshot)
+
+    capture = None
+    if config.capture_path is not None:
+        capture = CaptureWriter(
+            snapshot_path_for(config.capture_path, shard), config.capture_bodies
+        )
+
+    async def run_housekeeping():
+        next_snapshot = time.monotonic() + config.snapshot_interval
+        while True:
+            slept_at = time.monotonic()
+            await asyncio.sleep(config.housekeeping_interval)
+            admission.loop_lag.record(
+                time.monotonic() - slept_at - config.housekeeping_interval
+            )
+            web_rtc_manager.flush_ice_candidates()
+            pit_manager.reaper.expire_due()
+            pit_manager.check_nodes()
+            if outbound_lanes is not None:
+                outbound_lanes.flush()
+            await socket_emitter.flush()
+            if capture is not None:
+                capture.flush()
+            # the snapshot taken before draining is the one to hand over
+            if (
+                snapshot_path
+                and config.snapshot_interval > 0
+                and not pit_manager.draining
+            ):
+                if time.monotonic() >= next_snapshot:
+                    save_snapshot(world, snapshot_path)
+                    next_snapshot = time.monotonic() + config.snapshot_interval
+
+    async def start_housekeeping(app: web.Application):
+        housekeeping = asyncio.create_task(run_housekeeping())
+        yield
+        housekeeping.cancel()
+        # stopped without draining, e.g. SIGINT, with sessions left to hand over
+        if (
+            snapshot_path is not None
+            and not pit_manager.draining
+            and world.summary()["snakes"] > 0
+        ):
+            save_snapshot(world, snapshot_path)
+        if capture is not None:
+            capture.close()
+
+    app.cleanup_ctx.append(start_housekeeping)
+
+    def on(event: str):
+        def register(handler):
+            handler = instrumented(event)(handler)
+
+            async def dispatch(sid, *args):
+                result = None
+                try:
+                    if admission.admit(sid, event):
+                        if capture is not None:
+                            # without the connect environ, as server.server has it
+                            captured_args = args[1:] if event == "connect" else args
+                            capture.record(event, sid, captured_args)
+                        result = handler(sid, *args)
+                except socketio.exceptions.ConnectionRefusedError:
+                    raise
+                except Exception as e:
+                    _logger.error(
+                        "Socket.IO error occurred: %s", e, extra={"event": "error"}
+                    )
+                    emitter.emit("error", {"message": str(e)}, to=sid)
+                await socket_emitter.flush()
+                return result
+
+            sio.on(event, dispatch)
+            return handler
+
+        return register
+
+    @on("connect")
+    def on_connect(sid, environ, auth=None):
+        retry_after = admission.connect_retry_after()
+        if retry_after is not None:
+            raise socketio.exceptions.ConnectionRefusedError(
+                {"message": "Server overloaded", "retry_after": retry_after}
+            )
+
+        return pit_manager.handle_connect(
+            sid, parse_capabilities(auth), parse_resume_token(auth)
+        )
+
+    @on("disconnect")
+    def on_disconnect(sid, reason=None):
+        _logger.info(
+            "Peer disconnected with reason: %s", reason, extra={"event": "disconnect"}
+        )
+        admission.forget(sid)
+        pit_manager.handle_disconnect(sid)
+
+    @on("create_snake_pit")
+    def on_create_pit(sid, pit_id):
+        pit_manager.handle_create_pit(sid, parse_pit_id(pit_id))
+
+    @on("join_snake_pit")
+    def on_join_pit(sid, pit_id):
+        pit_manager.handle_join_pit(sid, parse_pit_id(pit_id))
+
+    @on("quick_join")
+    def on_quick_join(sid):
+        pit_manager.handle_quick_join(sid)
+
+    @on("leave_snake_pit")
+    def on_leave_pit(sid):
+        pit_manager.handle_leave_pit(sid)
+
+    @on("send_offer")
+    def on_send_offer(sid, to_peer_id, offer):
+        web_rtc_manager.send_offer(
+            sid, parse_snake_id(to_peer_id), parse_session_description(offer, "offer")
+        )
+
+    @on("send_answer")
+    def on_send_answer(sid, to_peer_id, answer):
+        web_rtc_manager.send_answer(
+            sid,
+            parse_snake_id(to_peer_id),
+            parse_session_description(answer, "answer", "pranswer"),
+        )
+
+    @on("send_ice_candidate")
+    def on_send_ice_candidate(sid, to_peer_id, ice_candidate):
+        web_rtc_manager.send_ice_candidate(
+            sid, parse_snake_id(to_peer_id), parse_ice_candidate(ice_candidate)
+        )
+
+    @on("peer_connected")
+    def on_peer_connected(sid, to_peer_id):
+        web_rtc_manager.peer_connected(sid, parse_snake_id(to_peer_id))
+
+    @on(PAYLOAD_REJECTED_EVENT)
+    def on_payload_rejected(sid, event):
+        emitter.emit("error", {"message": f"Payload too large for {event}"}, to=sid)
+
+    return app
+
+
+def run(host: str, port: int, shard: WorkerShard | None = None):
+    asyncio.run(serve_until_drained(ServerConfig.from_env(), host, port, shard))
+
+
+async def serve_until_drained(
+    config: ServerConfig, host: str, port: int, shard: WorkerShard | None = None
+):
+    """Same drain on SIGTERM as server.server.serve_until_drained."""
+    app = create_app(config, shard)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port, reuse_port=True)
+    await site.start()
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    try:
+        await stop.wait()
+
+        # closes the listener, open connections keep being served
+        await site.stop()
+        await drain(app, config.drain_timeout)
+    finally:
+        await runner.cleanup()
+
+
+async def drain(app: web.Application, timeout: float):
+    """Write the snapshot, then drain the pits for up to `timeout` seconds.
+
+    Draining drops every session, so the snapshot the next process loads
+    is written first.
+    """
+    pit_manager = app[PIT_MANAGER]
+    if SNAPSHOT_PATH in app:
+        save_snapshot(pit_manager.world, app[SNAPSHOT_PATH])
+    pit_manager.start_draining(timeout)
+    while not pit_manager.drained():
+        await asyncio.sleep(0.1)
+    _logger.info("Drained", extra={"event": "drain"})
+
+
+def save_snapshot(world: World, snapshot_path: str):
+    sessions = write_snapshot(world, snapshot_path)
+    _logger.info(
+        "Wrote snapshot with %d sessions to %s",
+        sessions,
+        snapshot_path,
+        extra={"event": "snapshot_written"},
+    )
@@ -0,0 +1,169 @@
+import marshal
+import struct
+import time
+from collections.abc import Iterator
+from typing import NamedTuple
+
+from server.model import SnakeId
+from server.packets import RawJson
+from server.pit_manager import SnakePitManager
+from server.validation import (
+    parse_capabilities,
+    parse_ice_candidate,
+    parse_pit_id,
+    parse_resume_token,
+    parse_session_description,
+    parse_snake_id,
+)
+from server.webrtc_manager import WebRtcManager
+
+# magic, version, marshal version, capture start as a unix time
+HEADER = struct.Struct("<4sHHd")
+MAGIC = b"SSSC"
+VERSION = 1
+# seconds since the capture started, length of the marshalled event
+RECORD = struct.Struct("<dI")
+# events whose last argument is an SDP or ICE candidate, kept as its size
+# unless bodies are captured
+BODY_EVENTS = ("send_offer", "send_answer", "send_ice_candidate")
+WRITE_BUFFER_SIZE = 1 << 16
+
+
+class CapturedEvent(NamedTuple):
+    at: float
+    event: str
+    sid: SnakeId
+    args: tuple
+
+
+def _payload_size(body) -> int:
+    if isinstance(body, RawJson):
+        return len(body.text)
+    if isinstance(body, dict):
+        return sum(
+            len(value) for value in body.values() if isinstance(value, (str, bytes))
+        )
+    return 0
+
+
+class CaptureWriter:
+    """Appends inbound socket.io events to a binary log, for replay_capture.
+
+    Each event is a fixed size record header and its (event, sid, args)
+    marshalled, through a buffered file flushed by the housekeeping task.
+    Offers, answers and ICE candidates are written as their size unless
+    `bodies` is set.
+    """
+
+    def __init__(self, path: str, bodies: bool = False):
+        self.file = open(path, "wb", buffering=WRITE_BUFFER_SIZE)
+        self.bodies = bodies
+        self.started = time.monotonic()
+        self.file.write(HEADER.pack(MAGIC, VERSION, marshal.version, time.time()))
+
+    def record(self, event: str, sid: SnakeId, args: tuple, now: float | None = None):
+        if event in BODY_EVENTS and args:
+            body = args[-1]
+            if not self.bodies:
+                body = _payload_size(body)
+            elif isinstance(body, RawJson):
+                body = body.value
+            args = (*args[:-1], body)
+        try:
+            data = marshal.dumps((event, sid, args))
+        except ValueError:
+            # only what a socket.io parser decodes to can be marshalled
+            data = marshal.dumps((event, sid, ()))
+
+        now = time.monotonic() if now is None else now
+        self.file.write(RECORD.pack(now - self.started, len(data)))
+        self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def read_capture(path: str) -> Iterator[CapturedEvent]:
+    with open(path, "rb") as file:
+        header = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"Not a capture: {path}")
+        magic, version, marshal_version, _ = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a version {VERSION} capture: {path}")
+        if marshal_version != marshal.version:
+            raise ValueError(
+                f"Capture written with marshal version {marshal_version}, "
+                f"this Python has {marshal.version}"
+            )
+
+        while True:
+            record = file.read(RECORD.size)
+            # a capture cut short by a crash ends at its last whole event
+            if len(record) < RECORD.size:
+                return
+            at, length = RECORD.unpack(record)
+            data = file.read(length)
+            if len(data) < length:
+                return
+            event, sid, args = marshal.loads(data)
+            yield CapturedEvent(at, event, sid, args)
+
+
+def _synthetic_body(event: str, size: int) -> dict:
+    # bodies captured as their size, padded to it
+    if event == "send_ice_candidate":
+        return {"candidate": "c" * min(size, 1024), "sdpMid": "0"}
+    kind = "offer" if event == "send_offer" else "answer"
+    return {"type": kind, "sdp": "v=0\r\n".ljust(size, "a")}
+
+
+def replay_event(
+    pit_manager: SnakePitManager,
+    web_rtc_manager: WebRtcManager,
+    captured: CapturedEvent,
+):
+    """Run a captured event through the handlers, as server.server does."""
+    event, sid, args = captured.event, captured.sid, captured.args
+    if event in BODY_EVENTS and args and isinstance(args[-1], int):
+        args = (*args[:-1], _synthetic_body(event, args[-1]))
+
+    if event == "connect":
+        auth = args[0] if args else None
+        pit_manager.handle_connect(
+            sid, parse_capabilities(auth), parse_resume_token(auth)
+        )
+    elif event == "disconnect":
+        pit_manager.handle_disconnect(sid)
+    elif event == "create_snake_pit":
+        pit_manager.handle_create_pit(sid, parse_pit_id(*args))
+    elif event == "join_snake_pit":
+        pit_manager.handle_join_pit(sid, parse_pit_id(*args))
+    elif event == "quick_join":
+        pit_manager.handle_quick_join(sid)
+    elif event == "leave_snake_pit":
+        pit_manager.handle_leave_pit(sid)
+    elif event == "send_offer":
+        to_peer_id, offer = args
+        web_rtc_manager.send_offer(
+            sid, parse_snake_id(to_peer_id), parse_session_description(offer, "offer")
+        )
+    elif event == "send_answer":
+        to_peer_id, answer = args
+        web_rtc_manager.send_answer(
+            sid,
+            parse_snake_id(to_peer_id),
+            parse_session_description(answer, "answer", "pranswer"),
+        )
+    elif event == "send_ice_candidate":
+        to_peer_id, ice_candidate = args
+        web_rtc_manager.send_ice_candidate(
+            sid, parse_snake_id(to_peer_id), parse_ice_candidate(ice_candidate)
+        )
+    elif event == "peer_connected":
+        web_rtc_manager.peer_connected(sid, parse_snake_id(*args))
+    else:
+        raise ValueError(f"Unknown captured event: {event}")
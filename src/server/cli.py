@@ -0,0 +1,75 @@
+"""Entry point of `serve`, which picks the runtime before importing it.
+
+eventlet has to monkey patch the standard library before anything else
+creates sockets, locks or threads, or the Redis clients behind
+SSS_MESSAGE_QUEUE and SSS_WORLD_STORE block the hub. So this module imports
+nothing of the server until it has patched, and only for the eventlet
+runtime: the --workers router and the asyncio runtime run unpatched.
+"""
+
+import argparse
+
+BANNER = """
+ _____  _____  _____  _____
+/  ___|/  ___|/  ___|/  ___|
+\\ `--. \\ `--. \\ `--. \\ `--.   ___  _ __ __   __ ___  _ __
+ `--. \\ `--. \\ `--. \\ `--. \\ / _ \\| '__|\\ \\ / // _ \\| '__|
+/\\__/ //\\__/ //\\__/ //\\__/ /|  __/| |    \\ V /|  __/| |
+\\____/ \\____/ \\____/ \\____/  \\___||_|     \\_/  \\___||_|
+Initializing server...
+"""
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--debug", action="store_true", help="Enable debug mode")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5678)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes, pits are sharded between them",
+    )
+    parser.add_argument("--worker-index", type=int, help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--runtime",
+        choices=["eventlet", "asyncio"],
+        default="eventlet",
+        help="Event loop serving socket.io, asyncio needs the asyncio extra",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    if args.worker_index is None:
+        print(BANNER)
+
+    if args.workers > 1 and args.worker_index is None:
+        from server.sharding import run_workers
+
+        run_workers(args.workers, args.host, args.port, args.debug, args.runtime)
+        return
+
+    if args.runtime == "asyncio":
+        from server.async_server import run
+        from server.sharding import WorkerShard
+
+        shard = None
+        if args.worker_index is not None:
+            shard = WorkerShard(args.worker_index, args.workers)
+        run(args.host, args.port, shard)
+        return
+
+    import eventlet
+
+    eventlet.monkey_patch()
+
+    from server.server import run
+
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+from dataclasses import dataclass
+
+
+def _env_str(name: str) -> str | None:
+    return os.environ.get(name) or None
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_bool(name: str) -> bool:
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+@dataclass(frozen=True)
+class ServerConfig:
+    # socket.io message queue (e.g. redis://host:6379/0) shared by all nodes
+    message_queue: str | None = None
+    # Redis url for the shared World, in-process dicts when unset
+    world_store: str | None = None
+    # how long ICE candidates are held for batching, 0 disables batching
+    ice_batch_window: float = 0.025
+    # period of the background task flushing batches and other timers
+    housekeeping_interval: float = 0.01
+    # display names are unique "global"ly or per "pit"
+    name_scope: str = "global"
+    # members quick_join fills a pit up to before opening a new one
+    quick_join_pit_size: int = 6
+    # joins to a pit with this many members are refused, None for no limit
+    max_pit_size: int | None = None
+    # send joins to a full pit to a linked overflow pit instead of refusing
+    pit_overflow: bool = False
+    # seconds before the reaper deletes an empty pit, closes a pit without
+    # activity and disconnects a snake idling outside of pits, 0 disables
+    empty_pit_ttl: float = 300
+    pit_idle_ttl: float = 0
+    snake_idle_ttl: float = 900
+    # seconds a disconnected snake is held for a reconnect, 0 disables it
+    resume_grace: float = 0
+    # file the in-process world is written to on shutdown, and every
+    # `snapshot_interval` seconds unless 0, so sessions survive a restart
+    snapshot_path: str | None = None
+    snapshot_interval: float = 0
+    # seconds a SIGTERM'd process keeps relaying for the pits it still has
+    drain_timeout: float = 30
+    # per snake limits over server.admission.DEFAULT_RATE_LIMITS, e.g.
+    # "send_ice_candidate=50/100" for 50 a second with bursts of 100
+    rate_limits: str | None = None
+    # event loop lag above which connects and joins are refused, 0 disables
+    max_loop_lag: float = 0.1
+    # hold ICE and presence events for the housekeeping flush, behind
+    # offers and answers, in lanes of at most this many events per recipient
+    outbound_lanes: bool = False
+    outbound_lane_depth: int = 256
+    # longest packet per event over server.packets.DEFAULT_PAYLOAD_LIMITS,
+    # e.g. "send_offer=32768,*=512" with "*" for every other event
+    payload_limits: str | None = None
+    # relay offer and answer bodies as the text they came in as, instead of
+    # decoding them into dicts and encoding them again
+    raw_signaling: bool = False
+    # "json", or "msgpack" for clients using a msgpack socket.io parser
+    serializer: str = "json"
+    # refuse offers from the earlier of two members, see SnakePit.offers_to
+    enforce_mesh_plan: bool = False
+    # time each pair's negotiation and the pits' time to a full mesh, served
+    # at /negotiations, see server.negotiation_trace
+    negotiation_tracing: bool = False
+    # append every inbound event to this file, see server.capture and
+    # benchmarks/replay_capture.py, with SDPs and ICE candidates when
+    # capture_bodies is set and only their size otherwise
+    capture_path: str | None = None
+    capture_bodies: bool = False
+
+    @classmethod
+    def from_env(cls) -> "ServerConfig":
+        return cls(
+            message_queue=_env_str("SSS_MESSAGE_QUEUE"),
+            world_store=_env_str("SSS_WORLD_STORE"),
+            ice_batch_window=_env_float("SSS_ICE_BATCH_WINDOW_MS", 25) / 1000,
+            housekeeping_interval=_env_float("SSS_HOUSEKEEPING_INTERVAL_MS", 10)
+            / 1000,
+            name_scope=_env_str("SSS_NAME_SCOPE") or "global",
+            quick_join_pit_size=_env_int("SSS_QUICK_JOIN_PIT_SIZE", 6),
+            max_pit_size=_env_int("SSS_MAX_PIT_SIZE", 0) or None,
+            pit_overflow=_env_bool("SSS_PIT_OVERFLOW"),
+            empty_pit_ttl=_env_float("SSS_EMPTY_PIT_TTL_SECONDS", 300),
+            pit_idle_ttl=_env_float("SSS_PIT_IDLE_TTL_SECONDS", 0),
+            snake_idle_ttl=_env_float("SSS_SNAKE_IDLE_TTL_SECONDS", 900),
+            resume_grace=_env_float("SSS_RESUME_GRACE_SECONDS", 0),
+            snapshot_path=_env_str("SSS_SNAPSHOT_PATH"),
+            snapshot_interval=_env_float("SSS_SNAPSHOT_INTERVAL_SECONDS", 0),
+            drain_timeout=_env_float("SSS_DRAIN_TIMEOUT_SECONDS", 30),
+            rate_limits=_env_str("SSS_RATE_LIMITS"),
+            max_loop_lag=_env_float("SSS_MAX_LOOP_LAG_MS", 100) / 1000,
+            outbound_lanes=_env_bool("SSS_OUTBOUND_LANES"),
+            outbound_lane_depth=_env_int("SSS_OUTBOUND_LANE_DEPTH", 256),
+            payload_limits=_env_str("SSS_PAYLOAD_LIMITS"),
+            raw_signaling=_env_bool("SSS_RAW_SIGNALING"),
+            serializer=_env_str("SSS_SERIALIZER") or "json",
+            enforce_mesh_plan=_env_bool("SSS_ENFORCE_MESH_PLAN"),
+            negotiation_tracing=_env_bool("SSS_NEGOTIATION_TRACING"),
+            capture_path=_env_str("SSS_CAPTURE_PATH"),
+            capture_bodies=_env_bool("SSS_CAPTURE_BODIES"),
+        )
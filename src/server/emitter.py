@@ -0,0 +1,199 @@
+import asyncio
+from collections import deque
+from typing import Any, Protocol
+
+from server.metrics import OUTBOUND_DROPPED
+
+SocketId = str
+
+# queued outbound lanes, flushed in this order. Events in neither lane
+# (offers, answers and direct replies) are never held back.
+ICE_LANE = ("new_ice_candidate", "new_ice_candidates")
+PRESENCE_LANE = ("new_room_member", "room_member_left")
+
+
+class Emitter(Protocol):
+    """Outbound side of the managers, independent of the runtime serving them."""
+
+    def emit(
+        self,
+        event: str,
+        data: Any,
+        to: str,
+        skip_sid: SocketId | list[SocketId] | None = None,
+    ) -> None: ...
+
+    def enter_room(self, sid: SocketId, room: str) -> None: ...
+
+    def leave_room(self, sid: SocketId, room: str) -> None: ...
+
+    def disconnect(self, sid: SocketId) -> None: ...
+
+
+class SocketIOEmitter:
+    """Sends right away through a flask_socketio.SocketIO (eventlet runtime)."""
+
+    def __init__(self, socketio):
+        self.socketio = socketio
+
+    def emit(self, event: str, data: Any, to: str, skip_sid: SocketId | None = None):
+        self.socketio.emit(event, data, to=to, skip_sid=skip_sid)
+
+    def enter_room(self, sid: SocketId, room: str):
+        self.socketio.server.enter_room(sid, room, namespace="/")
+
+    def leave_room(self, sid: SocketId, room: str):
+        self.socketio.server.leave_room(sid, room, namespace="/")
+
+    def disconnect(self, sid: SocketId):
+        self.socketio.server.disconnect(sid, namespace="/")
+
+
+class AsyncSocketIOEmitter:
+    """Queues operations for a socketio.AsyncServer.
+
+    Managers stay synchronous, the asyncio handlers await `flush` once the
+    manager call returns. Flushes are serialized so operations go out in the
+    order the managers issued them.
+    """
+
+    def __init__(self, sio):
+        self.sio = sio
+        self._pending: deque[tuple] = deque()
+        self._flush_lock = asyncio.Lock()
+
+    def emit(self, event: str, data: Any, to: str, skip_sid: SocketId | None = None):
+        self._pending.append(("emit", event, data, to, skip_sid))
+
+    def enter_room(self, sid: SocketId, room: str):
+        self._pending.append(("enter_room", sid, room))
+
+    def leave_room(self, sid: SocketId, room: str):
+        self._pending.append(("leave_room", sid, room))
+
+    def disconnect(self, sid: SocketId):
+        self._pending.append(("disconnect", sid))
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._pending:
+                operation, *args = self._pending.popleft()
+                if operation == "emit":
+                    event, data, to, skip_sid = args
+                    await self.sio.emit(event, data, to=to, skip_sid=skip_sid)
+                elif operation == "enter_room":
+                    await self.sio.enter_room(*args)
+                elif operation == "leave_room":
+                    await self.sio.leave_room(*args)
+                else:
+                    await self.sio.disconnect(*args)
+
+
+class _Queued:
+    __slots__ = ("event", "data", "skip_sids")
+
+    def __init__(self, event: str, data: Any, skip_sids: list[SocketId]):
+        self.event = event
+        self.data = data
+        self.skip_sids = skip_sids
+
+
+class PriorityEmitter:
+    """Holds ICE and presence events back until `flush`, in bounded lanes.
+
+    Offers, answers and replies go straight to `emitter`, ahead of anything
+    queued. On flush the ICE lane goes out before the presence lane. Each
+    lane keeps at most `max_depth` events per recipient, dropping the
+    oldest, and a member joining then leaving a room between two flushes
+    costs its peers nothing, as long as none of them could know of it yet:
+    once an offer, answer or ICE candidate from it went out, or a snake got
+    it in its `pit_roster`, both the join and the leave are sent.
+
+    Snakes entering a room after an event to it was queued are skipped, so
+    nobody hears of a join they already got in their `pit_roster`.
+    """
+
+    def __init__(self, emitter: Emitter, max_depth: int = 256):
+        self.emitter = emitter
+        self.max_depth = max_depth
+        self.ice: dict[str, deque[_Queued]] = dict()
+        self.presence: dict[str, deque[_Queued]] = dict()
+        # members whose queued new_room_member nobody can know of yet, by room
+        self.unseen_joins: dict[str, set[SocketId]] = dict()
+
+    def emit(self, event: str, data: Any, to: str, skip_sid: SocketId | None = None):
+        if event in ICE_LANE:
+            lane = self.ice
+            self._seen(data)
+        elif event in PRESENCE_LANE:
+            lane = self.presence
+            if event == "new_room_member":
+                self.unseen_joins.setdefault(to, set()).add(data["new_peer_id"])
+            elif self._cancel_join(to, data):
+                return
+        else:
+            self._seen(data)
+            self.emitter.emit(event, data, to=to, skip_sid=skip_sid)
+            return
+
+        queue = lane.get(to)
+        if queue is None:
+            queue = lane[to] = deque(maxlen=self.max_depth)
+        elif len(queue) == self.max_depth:
+            OUTBOUND_DROPPED.inc(event, "overflow")
+        queue.append(_Queued(event, data, [] if skip_sid is None else [skip_sid]))
+
+    def enter_room(self, sid: SocketId, room: str):
+        for lane in (self.ice, self.presence):
+            for queued in lane.get(room, ()):
+                queued.skip_sids.append(sid)
+        # the newcomer's pit_roster names every member
+        self.unseen_joins.pop(room, None)
+        self.emitter.enter_room(sid, room)
+
+    def leave_room(self, sid: SocketId, room: str):
+        self.emitter.leave_room(sid, room)
+
+    def disconnect(self, sid: SocketId):
+        self.ice.pop(sid, None)
+        self.presence.pop(sid, None)
+        self.emitter.disconnect(sid)
+
+    def flush(self):
+        for lane in (self.ice, self.presence):
+            for to, queue in lane.items():
+                for queued in queue:
+                    self.emitter.emit(
+                        queued.event,
+                        queued.data,
+                        to=to,
+                        skip_sid=queued.skip_sids or None,
+                    )
+            lane.clear()
+        self.unseen_joins.clear()
+
+    def _seen(self, data: Any):
+        # signaling from a member tells its recipient about it
+        if self.unseen_joins and isinstance(data, dict):
+            from_peer_id = data.get("fromPeerId")
+            for members in self.unseen_joins.values():
+                members.discard(from_peer_id)
+
+    def _cancel_join(self, room: str, left: dict) -> bool:
+        leaving_peer_id = left["leaving_peer_id"]
+        unseen = self.unseen_joins.get(room)
+        if not unseen or leaving_peer_id not in unseen:
+            return False
+
+        unseen.discard(leaving_peer_id)
+        queue = self.presence[room]
+        for queued in queue:
+            if (
+                queued.event == "new_room_member"
+                and queued.data["new_peer_id"] == leaving_peer_id
+            ):
+                queue.remove(queued)
+                OUTBOUND_DROPPED.inc("new_room_member", "coalesced")
+                OUTBOUND_DROPPED.inc("room_member_left", "coalesced")
+                return True
+        return False
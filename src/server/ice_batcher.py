@@ -0,0 +1,87 @@
+from collections import deque
+from typing import Any
+
+from server.model import SnakeId
+
+PeerPair = tuple[SnakeId, SnakeId]
+
+
+def is_end_of_candidates(ice_candidate: Any) -> bool:
+    # browsers signal the end of trickling with a null or empty candidate
+    return ice_candidate is None or (
+        isinstance(ice_candidate, dict) and not ice_candidate.get("candidate")
+    )
+
+
+def _candidate_key(ice_candidate: Any):
+    if isinstance(ice_candidate, dict):
+        return (
+            ice_candidate.get("candidate"),
+            ice_candidate.get("sdpMid"),
+            ice_candidate.get("sdpMLineIndex"),
+        )
+    return repr(ice_candidate)
+
+
+class _PendingBatch:
+    __slots__ = ("candidates", "seen", "deadline")
+
+    def __init__(self, deadline: float):
+        self.candidates: list[Any] = []
+        self.seen: set = set()
+        self.deadline = deadline
+
+
+class IceCandidateBatcher:
+    """Buffers trickled ICE candidates per (from, to) pair for `window` seconds.
+
+    Exact duplicates are dropped and an end-of-candidates marker flushes the
+    pair right away. Since the window is fixed, deadlines come in insertion
+    order and `flush_due` only looks at the pairs that are actually due.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._pending: dict[PeerPair, _PendingBatch] = {}
+        self._deadlines: deque[tuple[float, PeerPair]] = deque()
+
+    def add(
+        self, from_peer_id: SnakeId, to_peer_id: SnakeId, ice_candidate: Any, now: float
+    ) -> list[Any] | None:
+        """Buffer a candidate, returns the batch to send if it must go out now."""
+        pair = (from_peer_id, to_peer_id)
+        batch = self._pending.get(pair)
+
+        if is_end_of_candidates(ice_candidate):
+            candidates = self._pop(pair).candidates if batch is not None else []
+            candidates.append(ice_candidate)
+            return candidates
+
+        if batch is None:
+            batch = self._pending[pair] = _PendingBatch(now + self.window)
+            self._deadlines.append((batch.deadline, pair))
+
+        key = _candidate_key(ice_candidate)
+        if key not in batch.seen:
+            batch.seen.add(key)
+            batch.candidates.append(ice_candidate)
+
+        return None
+
+    def flush_due(self, now: float) -> list[tuple[SnakeId, SnakeId, list[Any]]]:
+        due = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            deadline, pair = self._deadlines.popleft()
+            batch = self._pending.get(pair)
+            # the pair may have been flushed early and buffered again since
+            if batch is not None and batch.deadline == deadline:
+                del self._pending[pair]
+                due.append((*pair, batch.candidates))
+        return due
+
+    def _pop(self, pair: PeerPair) -> _PendingBatch:
+        # its deadline entry stays queued and is skipped once due
+        return self._pending.pop(pair)
+
+    def __len__(self):
+        return len(self._pending)
@@ -1,5 +1,112 @@
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# attributes every LogRecord has, anything else was passed through `extra`
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime", "taskName"}
+
+_queue: queue.SimpleQueue = queue.SimpleQueue()
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with `extra` fields as top level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps 1 in N records per `event`, events without a rate are all kept.
+
+    Sampling is counter based rather than random so it costs one dict lookup
+    and one increment per record.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.every = {
+            event: max(1, round(1 / rate)) for event, rate in rates.items() if rate > 0
+        }
+        self.dropped_events = {event for event, rate in rates.items() if rate <= 0}
+        self.seen: dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if event is None:
+            return True
+        if event in self.dropped_events:
+            return False
+
+        every = self.every.get(event)
+        if every is None:
+            return True
+
+        seen = self.seen.get(event, 0)
+        self.seen[event] = seen + 1
+        return seen % every == 0
+
+
+class LazyQueueHandler(QueueHandler):
+    """Enqueues the record untouched, formatting happens on the listener thread.
+
+    The stock QueueHandler formats in the caller so records can be pickled,
+    which is not needed for an in-process queue.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_sample_rates(spec: str | None) -> dict[str, float]:
+    # "send_ice_candidate=0.01,send_offer=0.1"
+    rates = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            event, rate = item.split("=", 1)
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+def _output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    if os.environ.get("SSS_LOG_FORMAT", "json") == "text":
+        handler.setFormatter(
+            logging.Formatter(
+                "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                datefmt="%Y-%m-%d %H:%M:%S",
+            )
+        )
+    else:
+        handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def _start_listener() -> None:
+    global _listener
+    if _listener is not None:
+        return
+
+    _listener = QueueListener(_queue, _output_handler(), respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
 
 
 def setup_logger(name: str, level: int | str = logging.INFO) -> logging.Logger:
@@ -8,18 +115,14 @@ def setup_logger(name: str, level: int | str = logging.INFO) -> logging.Logger:
     if logger.handlers:
         return logger
 
-    logger.setLevel(level)
+    logger.setLevel(os.environ.get("SSS_LOG_LEVEL", level))
 
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setLevel(level)
-
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
+    handler = LazyQueueHandler(_queue)
+    handler.addFilter(
+        SamplingFilter(parse_sample_rates(os.environ.get("SSS_LOG_SAMPLE")))
     )
-
-    handler.setFormatter(formatter)
     logger.addHandler(handler)
+    _start_listener()
 
     return logger
 
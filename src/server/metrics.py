@@ -0,0 +1,264 @@
+import functools
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+LabelValues = tuple[str, ...]
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# handler latencies, from 50us to 1s
+LATENCY_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self.values.get(labels, 0)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Metric):
+    """Gauge read from a callback at scrape time, the callback must be O(1)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.function: Callable[[], float | dict[LabelValues, float]] = lambda: 0
+
+    def set_function(self, function: Callable[[], float | dict[LabelValues, float]]):
+        self.function = function
+
+    def samples(self) -> list[str]:
+        value = self.function()
+        if not isinstance(value, dict):
+            return [f"{self.name} {_format_value(value)}"]
+
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}"
+            for labels, v in value.items()
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # per label set: non-cumulative bucket counts (last one is +Inf) and sum
+        self.counts: dict[LabelValues, list[int]] = {}
+        self.sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *labels: str):
+        counts = self.counts.get(labels)
+        if counts is None:
+            counts = self.counts[labels] = [0] * (len(self.buckets) + 1)
+            self.sums[labels] = 0.0
+
+        counts[bisect_left(self.buckets, value)] += 1
+        self.sums[labels] += value
+
+    def count(self, *labels: str) -> int:
+        return sum(self.counts.get(labels, ()))
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labels, counts in self.counts.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(
+                    (*self.labelnames, "le"), (*labels, _format_value(bound))
+                )
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(
+                f"{self.name}_sum{label_text} {_format_value(self.sums[labels])}"
+            )
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HANDLER_CALLS = REGISTRY.register(
+    Counter("sss_socketio_events_total", "Socket.IO events handled", ("event",))
+)
+HANDLER_ERRORS = REGISTRY.register(
+    Counter(
+        "sss_socketio_handler_errors_total",
+        "Socket.IO handlers that raised",
+        ("event",),
+    )
+)
+HANDLER_LATENCY = REGISTRY.register(
+    Histogram(
+        "sss_socketio_handler_duration_seconds",
+        "Time spent in Socket.IO handlers",
+        ("event",),
+    )
+)
+RELAY_ERRORS = REGISTRY.register(
+    Counter(
+        "sss_relay_errors_total",
+        "Signaling messages refused by the pit check",
+        ("reason",),
+    )
+)
+ADMISSION_REFUSALS = REGISTRY.register(
+    Counter(
+        "sss_admission_refusals_total",
+        "Events refused before reaching their handler",
+        ("event", "reason"),
+    )
+)
+OUTBOUND_DROPPED = REGISTRY.register(
+    Counter(
+        "sss_outbound_dropped_total",
+        "Queued events dropped by the outbound lanes",
+        ("event", "reason"),
+    )
+)
+# negotiation milestones, from 10ms to 30s
+NEGOTIATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+OFFER_TO_ANSWER = REGISTRY.register(
+    Histogram(
+        "sss_negotiation_offer_to_answer_seconds",
+        "First offer to first answer relayed between two peers",
+        ("pit_size",),
+        NEGOTIATION_BUCKETS,
+    )
+)
+OFFER_TO_CONNECTED = REGISTRY.register(
+    Histogram(
+        "sss_negotiation_offer_to_connected_seconds",
+        "First offer to the first peer_connected ack of a pair",
+        ("pit_size",),
+        NEGOTIATION_BUCKETS,
+    )
+)
+JOIN_TO_FULL_MESH = REGISTRY.register(
+    Histogram(
+        "sss_negotiation_join_to_full_mesh_seconds",
+        "Join to every pair of the pit having answered",
+        ("pit_size",),
+        NEGOTIATION_BUCKETS,
+    )
+)
+WORLD_PITS = REGISTRY.register(Gauge("sss_world_pits", "Pits in the world"))
+WORLD_SNAKES = REGISTRY.register(Gauge("sss_world_snakes", "Connected snakes"))
+WORLD_PITS_BY_SIZE = REGISTRY.register(
+    Gauge("sss_world_pits_by_size", "Pits per member count", ("size",))
+)
+
+
+def instrumented(event: str):
+    """Count calls, errors and latency of a Socket.IO handler."""
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            HANDLER_CALLS.inc(event)
+            started_at = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.inc(event)
+                raise
+            finally:
+                HANDLER_LATENCY.observe(time.perf_counter() - started_at, event)
+
+        return wrapper
+
+    return decorator
+
+
+def watch_world(world) -> None:
+    """Point the world gauges at `world`, every read is a len() or dict copy."""
+    WORLD_PITS.set_function(lambda: len(world.pits))
+    WORLD_SNAKES.set_function(lambda: len(world.snakes))
+    WORLD_PITS_BY_SIZE.set_function(
+        lambda: {(str(size),): count for size, count in world.pit_sizes.items()}
+    )
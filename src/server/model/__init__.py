@@ -1,5 +1,16 @@
 from server.model.snake_pit import SnakePitId, SnakePit
 from server.model.snake import Snake, SnakeId
-from server.model.world import World
+from server.model.world import World, create_world
+from server.model.name_allocator import NameAllocator
+from server.model.pit_index import FreeCapacityIndex
 
-__all__ = ["SnakePitId", "SnakePit", "Snake", "SnakeId", "World"]
+__all__ = [
+    "SnakePitId",
+    "SnakePit",
+    "Snake",
+    "SnakeId",
+    "World",
+    "create_world",
+    "NameAllocator",
+    "FreeCapacityIndex",
+]
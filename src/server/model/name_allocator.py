@@ -0,0 +1,105 @@
+from random import randrange
+
+from server.model.snake import NAME_SPACE_SIZE
+
+
+class NameAllocator:
+    """Hands out unique name indexes in O(1), see `name_from_index`.
+
+    Free indexes are kept as a sparse Fisher-Yates shuffle: positions below
+    `free` hold the free indexes, and a position absent from `moved` holds
+    `generation_start + position`. Allocating swaps a random free position
+    with the last one, releasing appends to the end. Memory grows with the
+    positions moved since the allocator was last empty, not with the name
+    space, so an allocator per pit stays small.
+
+    Once every name is taken a new generation of NAME_SPACE_SIZE indexes is
+    opened, which render with a numeric suffix ("glossy-nile-boa-2").
+    `positions` maps each moved index back to its position, so `reserve`
+    can take a given index out of the free region.
+    """
+
+    __slots__ = (
+        "size",
+        "free",
+        "moved",
+        "positions",
+        "generation_start",
+        "capacity",
+    )
+
+    def __init__(self, size: int = NAME_SPACE_SIZE):
+        self.size = size
+        self._reset()
+
+    def allocate(self) -> int:
+        if self.free == 0:
+            self._open_generation()
+        return self._take(randrange(self.free))
+
+    def reserve(self, index: int) -> bool:
+        """Take a given index, as a restored snake keeps its name.
+
+        False if it is already handed out.
+        """
+        while index >= self.capacity:
+            self._open_generation()
+
+        position = self.positions.get(index)
+        if position is None:
+            position = index - self.generation_start
+            if not 0 <= position < self.free or position in self.moved:
+                return False
+        self._take(position)
+        return True
+
+    def release(self, index: int) -> None:
+        """Return an index handed out by `allocate`, each one exactly once."""
+        if self.free + 1 == self.capacity:
+            # last name back, drop the shuffle state and any extra generations
+            self._reset()
+            return
+
+        self.moved[self.free] = index
+        self.positions[index] = self.free
+        self.free += 1
+
+    def __len__(self):
+        # indexes currently handed out
+        return self.capacity - self.free
+
+    def _reset(self) -> None:
+        self.free = self.size
+        self.moved: dict[int, int] = {}
+        self.positions: dict[int, int] = {}
+        self.generation_start = 0
+        self.capacity = self.size
+
+    def _index_at(self, position: int) -> int:
+        return self.moved.get(position, self.generation_start + position)
+
+    def _take(self, position: int) -> int:
+        # swap the last free position into the one taken
+        last = self.free - 1
+        index = self._index_at(position)
+        if position != last:
+            last_index = self._index_at(last)
+            self.moved[position] = last_index
+            self.positions[last_index] = position
+        self.moved.pop(last, None)
+        self.positions.pop(index, None)
+        self.free = last
+        return index
+
+    def _open_generation(self) -> None:
+        # a reserve past the capacity opens one before the free region is
+        # empty, its positions are pinned to the indexes they hold so the
+        # new generation can start right after them
+        for position in range(self.free):
+            if position not in self.moved:
+                index = self.generation_start + position
+                self.moved[position] = index
+                self.positions[index] = position
+        self.generation_start = self.capacity - self.free
+        self.capacity += self.size
+        self.free += self.size
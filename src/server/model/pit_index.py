@@ -0,0 +1,56 @@
+from server.model.snake_pit import SnakePitId
+
+
+class FreeCapacityIndex:
+    """Pits open to quick join, bucketed by how many seats they have left.
+
+    `buckets[n]` holds the tracked pits with n free seats (dicts are used as
+    ordered sets), so full pits sit in `buckets[0]`, which is never picked
+    from. Updates are O(1) and a pick looks at most `capacity` buckets.
+    """
+
+    __slots__ = ("capacity", "buckets", "sizes")
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("Quick join pit size must be at least 1")
+
+        self.capacity = capacity
+        self.buckets: list[dict[SnakePitId, None]] = [
+            dict() for _ in range(capacity + 1)
+        ]
+        self.sizes: dict[SnakePitId, int] = dict()
+
+    def track(self, pit_id: SnakePitId, size: int = 0) -> None:
+        self.sizes[pit_id] = size
+        self._bucket_for(size)[pit_id] = None
+
+    def update(self, pit_id: SnakePitId, size: int) -> None:
+        """Move a tracked pit to the bucket for its new size, others are ignored."""
+        old_size = self.sizes.get(pit_id)
+        if old_size is None or old_size == size:
+            return
+
+        self._bucket_for(old_size).pop(pit_id, None)
+        self.track(pit_id, size)
+
+    def discard(self, pit_id: SnakePitId) -> None:
+        size = self.sizes.pop(pit_id, None)
+        if size is not None:
+            self._bucket_for(size).pop(pit_id, None)
+
+    def pick(self) -> SnakePitId | None:
+        """The fullest pit with a free seat, so pits fill up before new ones open."""
+        for bucket in self.buckets[1:]:
+            if bucket:
+                return next(iter(bucket))
+        return None
+
+    def __contains__(self, pit_id: SnakePitId):
+        return pit_id in self.sizes
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def _bucket_for(self, size: int) -> dict[SnakePitId, None]:
+        return self.buckets[max(0, self.capacity - size)]
@@ -0,0 +1,255 @@
+import time
+import uuid
+
+import redis
+from redis.exceptions import WatchError
+
+from server.model.snake import Snake, SnakeId
+from server.model.snake_pit import SnakePit, SnakePitId
+from server.model.world import SnakePitState, World
+
+
+class SharedWorld(World):
+    """World whose pits and memberships live in Redis, so every node sees them.
+
+    Snakes connected to this node are kept as local objects, exactly like the
+    in-memory `World`. Peers connected to other nodes are materialized from
+    their Redis record when looked up.
+
+    Keys (all under `prefix`):
+      - `pits`: set of pit ids
+      - `pit:<pit_id>`: set of member snake ids
+      - `snake:<snake_id>`: hash with `display_name` and `pit_id` ("" if none)
+      - `nodes`: set of node ids
+      - `node:<node_id>`: liveness key, expires `node_ttl` after the last
+        heartbeat
+      - `node:<node_id>:snakes`, `node:<node_id>:pits`: snakes connected to
+        and pits created on the node, cleaned up by the other nodes once its
+        liveness key expired
+    """
+
+    __slots__ = ("client", "prefix", "node_id", "node_ttl", "next_heartbeat")
+
+    def __init__(self, client, prefix: str = "sss", node_ttl: float = 15):
+        super().__init__()
+        # client must be created with decode_responses=True
+        self.client = client
+        self.prefix = prefix
+        self.node_id = uuid.uuid4().hex
+        self.node_ttl = node_ttl
+        self.next_heartbeat = 0.0
+        self._beat()
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "sss") -> "SharedWorld":
+        return cls(redis.Redis.from_url(url, decode_responses=True), prefix)
+
+    def add_snake(self, snake: Snake) -> None:
+        super().add_snake(snake)
+        pipe = self.client.pipeline()
+        pipe.hset(
+            self._snake_key(snake.id),
+            mapping={"display_name": snake.display_name, "pit_id": ""},
+        )
+        pipe.sadd(self._node_snakes_key(self.node_id), snake.id)
+        pipe.execute()
+
+    def remove_snake(self, snake_id: SnakeId) -> None:
+        super().remove_snake(snake_id)
+        pipe = self.client.pipeline()
+        pipe.delete(self._snake_key(snake_id))
+        pipe.srem(self._node_snakes_key(self.node_id), snake_id)
+        pipe.execute()
+
+    def rebind_snake(self, snake: Snake, new_snake_id: SnakeId) -> None:
+        old_snake_id = snake.id
+        super().rebind_snake(snake, new_snake_id)
+        pipe = self.client.pipeline()
+        pipe.rename(self._snake_key(old_snake_id), self._snake_key(new_snake_id))
+        pipe.srem(self._node_snakes_key(self.node_id), old_snake_id)
+        pipe.sadd(self._node_snakes_key(self.node_id), new_snake_id)
+        if snake.pit is not None:
+            pipe.srem(self._pit_key(snake.pit.id), old_snake_id)
+            pipe.sadd(self._pit_key(snake.pit.id), new_snake_id)
+        pipe.execute()
+
+    def has_snake(self, snake_id: SnakeId) -> bool:
+        return super().has_snake(snake_id) or bool(
+            self.client.exists(self._snake_key(snake_id))
+        )
+
+    def get_snake_state(self, snake_id: SnakeId) -> SnakePitState | None:
+        local_state = super().get_snake_state(snake_id)
+        if local_state is not None:
+            return local_state
+
+        record = self.client.hgetall(self._snake_key(snake_id))
+        if not record:
+            return None
+
+        snake = Snake(snake_id, display_name=record["display_name"])
+        pit_id = record.get("pit_id")
+        if not pit_id:
+            return snake, None
+
+        pit_id = SnakePitId(pit_id)
+        # not `or`, an empty pit is falsy
+        pit = self.pits.get(pit_id)
+        if pit is None:
+            pit = SnakePit(pit_id)
+        return snake, pit
+
+    def add_snake_to_pit(self, snake: Snake, pit: SnakePit) -> None:
+        super().add_snake_to_pit(snake, pit)
+        pipe = self.client.pipeline()
+        pipe.sadd(self._pit_key(pit.id), snake.id)
+        pipe.hset(
+            self._snake_key(snake.id),
+            mapping={"pit_id": str(pit.id), "display_name": snake.display_name},
+        )
+        pipe.execute()
+
+    def remove_snake_from_pit(self, snake: Snake, pit: SnakePit) -> None:
+        super().remove_snake_from_pit(snake, pit)
+        pipe = self.client.pipeline()
+        pipe.srem(self._pit_key(pit.id), snake.id)
+        pipe.hset(self._snake_key(snake.id), "pit_id", "")
+        pipe.execute()
+
+        # the local view is only needed while this node has members in it
+        if len(pit) == 0:
+            self._drop_pit_view(pit)
+
+    def pit_size(self, pit: SnakePit) -> int:
+        return self.client.scard(self._pit_key(pit.id))
+
+    def pit_roster(self, pit: SnakePit) -> list[dict[str, str]]:
+        # members on other nodes are not in the local pit, and Redis sets do not
+        # keep join order
+        member_ids = sorted(self.client.smembers(self._pit_key(pit.id)))
+        pipe = self.client.pipeline()
+        for member_id in member_ids:
+            pipe.hget(self._snake_key(member_id), "display_name")
+        return [
+            {"peer_id": member_id, "display_name": display_name}
+            for member_id, display_name in zip(member_ids, pipe.execute())
+            if display_name is not None
+        ]
+
+    def create_pit(self, pit_id: SnakePitId) -> SnakePit:
+        new_pit = super().create_pit(pit_id)
+        pipe = self.client.pipeline()
+        pipe.sadd(self._pits_key(), str(pit_id))
+        pipe.sadd(self._node_pits_key(self.node_id), str(pit_id))
+        pipe.execute()
+        return new_pit
+
+    def destroy_pit(self, pit: SnakePit) -> None:
+        if len(pit) == 0:
+            self._drop_pit_view(pit)
+
+        self._delete_pit_if_empty(str(pit.id), self.node_id)
+
+    def heartbeat(self, now: float | None = None) -> list[tuple[SnakeId, SnakePitId]]:
+        """Keep this node alive and clean up after nodes that are not.
+
+        Returns the (snake id, pit id) memberships of dead nodes' snakes, so
+        their peers can be told. Does nothing until `node_ttl / 3` after the
+        previous heartbeat.
+        """
+        now = time.monotonic() if now is None else now
+        if now < self.next_heartbeat:
+            return []
+        self.next_heartbeat = now + self.node_ttl / 3
+        self._beat()
+
+        departed = []
+        for node_id in self.client.smembers(self._nodes_key()):
+            if node_id == self.node_id or self.client.exists(self._node_key(node_id)):
+                continue
+            # whichever node takes it out of the set cleans up after it
+            if self.client.srem(self._nodes_key(), node_id):
+                departed += self._remove_node(node_id)
+        return departed
+
+    def get_pit(self, requested_pit_id: SnakePitId) -> SnakePit | None:
+        local_pit = super().get_pit(requested_pit_id)
+        if local_pit is not None:
+            return local_pit
+
+        if not self.client.sismember(self._pits_key(), str(requested_pit_id)):
+            return None
+
+        return self._pit_view(requested_pit_id)
+
+    def _pit_view(self, pit_id: SnakePitId) -> SnakePit:
+        # local pit object holding this node's members of a shared pit
+        if pit_id not in self.pits:
+            self.pits[pit_id] = SnakePit(pit_id)
+            self._count_pit_size(None, 0)
+        return self.pits[pit_id]
+
+    def _drop_pit_view(self, pit: SnakePit) -> None:
+        if self.pits.get(pit.id) is pit:
+            del self.pits[pit.id]
+            self._count_pit_size(0, None)
+
+    def _beat(self) -> None:
+        pipe = self.client.pipeline()
+        pipe.set(self._node_key(self.node_id), "", px=int(self.node_ttl * 1000))
+        pipe.sadd(self._nodes_key(), self.node_id)
+        pipe.execute()
+
+    def _remove_node(self, node_id: str) -> list[tuple[SnakeId, SnakePitId]]:
+        departed = []
+        pit_ids = set(self.client.smembers(self._node_pits_key(node_id)))
+        for snake_id in self.client.smembers(self._node_snakes_key(node_id)):
+            pit_id = self.client.hget(self._snake_key(snake_id), "pit_id")
+            if pit_id:
+                self.client.srem(self._pit_key(pit_id), snake_id)
+                pit_ids.add(pit_id)
+                departed.append((snake_id, SnakePitId(pit_id)))
+            self.client.delete(self._snake_key(snake_id))
+
+        # pits its reaper would have deleted, or that only it had members in
+        for pit_id in pit_ids:
+            self._delete_pit_if_empty(pit_id, node_id)
+        self.client.delete(self._node_snakes_key(node_id), self._node_pits_key(node_id))
+        return departed
+
+    def _delete_pit_if_empty(self, pit_id: str, node_id: str) -> None:
+        members_key = self._pit_key(pit_id)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(members_key)
+                if pipe.scard(members_key) != 0:
+                    return
+                pipe.multi()
+                pipe.srem(self._pits_key(), pit_id)
+                pipe.delete(members_key)
+                pipe.srem(self._node_pits_key(node_id), pit_id)
+                pipe.execute()
+            except WatchError:
+                # someone joined on another node in the meantime, keep the pit
+                return
+
+    def _nodes_key(self) -> str:
+        return f"{self.prefix}:nodes"
+
+    def _node_key(self, node_id: str) -> str:
+        return f"{self.prefix}:node:{node_id}"
+
+    def _node_snakes_key(self, node_id: str) -> str:
+        return f"{self.prefix}:node:{node_id}:snakes"
+
+    def _node_pits_key(self, node_id: str) -> str:
+        return f"{self.prefix}:node:{node_id}:pits"
+
+    def _pits_key(self) -> str:
+        return f"{self.prefix}:pits"
+
+    def _pit_key(self, pit_id: SnakePitId) -> str:
+        return f"{self.prefix}:pit:{pit_id}"
+
+    def _snake_key(self, snake_id: SnakeId) -> str:
+        return f"{self.prefix}:snake:{snake_id}"
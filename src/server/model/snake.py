@@ -1,78 +1,167 @@
-from random import choice
+import time
+from random import randrange
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from server.model.snake_pit import SnakePit
 
 SnakeId = str
 
+# display names are "<visual trait>-<region>-<species>"
+VISUAL_TRAITS = (
+    "striped",
+    "spotted",
+    "glossy",
+    "coiled",
+    "slim",
+    "fat",
+    "amber",
+    "silver",
+    "dusky",
+    "crimson",
+    "iridescent",
+    "shadow",
+    "long",
+    "short",
+    "broad",
+    "mottled",
+    "banded",
+    "ghost",
+)
+
+REGION_IDENTIFIERS = (
+    "sahara",
+    "andes",
+    "balkan",
+    "nile",
+    "amazon",
+    "indus",
+    "texas",
+    "mongol",
+    "iberian",
+    "tundra",
+    "burmese",
+    "caspian",
+    "aussie",
+    "nordic",
+    "sinai",
+    "sumatran",
+    "haitian",
+    "celtic",
+)
+
+SPECIES_TYPES = (
+    "cobra",
+    "adder",
+    "viper",
+    "python",
+    "krait",
+    "mamba",
+    "boa",
+    "taipan",
+    "kingsnake",
+    "hognose",
+    "rattler",
+    "anaconda",
+    "coral",
+    "milksnake",
+    "bushmaster",
+    "boomslang",
+    "whip",
+    "treeviper",
+)
+
+_TRAIT_INDEX = {trait: i for i, trait in enumerate(VISUAL_TRAITS)}
+_REGION_INDEX = {region: i for i, region in enumerate(REGION_IDENTIFIERS)}
+_SPECIES_INDEX = {species: i for i, species in enumerate(SPECIES_TYPES)}
+
+NAME_SPACE_SIZE = len(VISUAL_TRAITS) * len(REGION_IDENTIFIERS) * len(SPECIES_TYPES)
+
+
+def name_from_index(index: int) -> str:
+    # indexes past the name space come from NameAllocator generations
+    generation, index = divmod(index, NAME_SPACE_SIZE)
+    index, species = divmod(index, len(SPECIES_TYPES))
+    trait, region = divmod(index, len(REGION_IDENTIFIERS))
+    name = (
+        f"{VISUAL_TRAITS[trait]}-{REGION_IDENTIFIERS[region]}-{SPECIES_TYPES[species]}"
+    )
+    return f"{name}-{generation + 1}" if generation else name
+
+
+def index_from_name(name: str) -> int | None:
+    """Inverse of `name_from_index`, None for names outside the name tables."""
+    parts = name.split("-")
+    generation = 0
+    if len(parts) == 4 and parts[3].isdigit() and int(parts[3]) > 1:
+        generation = int(parts.pop()) - 1
+    if len(parts) != 3:
+        return None
+
+    trait = _TRAIT_INDEX.get(parts[0])
+    region = _REGION_INDEX.get(parts[1])
+    species = _SPECIES_INDEX.get(parts[2])
+    if trait is None or region is None or species is None:
+        return None
+    index = (trait * len(REGION_IDENTIFIERS) + region) * len(SPECIES_TYPES) + species
+    return generation * NAME_SPACE_SIZE + index
+
 
 class Snake:
-    def __init__(self, id):
+    # one of these per connection, so no per instance __dict__
+    __slots__ = (
+        "id",
+        "capabilities",
+        "pit",
+        "join_order",
+        "last_active",
+        "resume_token",
+        "_name",
+    )
+
+    def __init__(
+        self,
+        id,
+        display_name: str | None = None,
+        capabilities: frozenset[str] = frozenset(),
+        name_index: int | None = None,
+    ):
         self.id: SnakeId = id
-        self.display_name: str = self._generate_random_name()
-
-    def _generate_random_name(self) -> str:
-        visual_traits = [
-            "striped",
-            "spotted",
-            "glossy",
-            "coiled",
-            "slim",
-            "fat",
-            "amber",
-            "silver",
-            "dusky",
-            "crimson",
-            "iridescent",
-            "shadow",
-            "long",
-            "short",
-            "broad",
-            "mottled",
-            "banded",
-            "ghost",
-        ]
-
-        region_identifiers = [
-            "sahara",
-            "andes",
-            "balkan",
-            "nile",
-            "amazon",
-            "indus",
-            "texas",
-            "mongol",
-            "iberian",
-            "tundra",
-            "burmese",
-            "caspian",
-            "aussie",
-            "nordic",
-            "sinai",
-            "sumatran",
-            "haitian",
-            "celtic",
-        ]
-
-        species_types = [
-            "cobra",
-            "adder",
-            "viper",
-            "python",
-            "krait",
-            "mamba",
-            "boa",
-            "taipan",
-            "kingsnake",
-            "hognose",
-            "rattler",
-            "anaconda",
-            "coral",
-            "milksnake",
-            "bushmaster",
-            "boomslang",
-            "whip",
-            "treeviper",
-        ]
-
-        return f"{choice(visual_traits)}-{choice(region_identifiers)}-{choice(species_types)}"
+        # optional protocol features the client opted into at connect
+        self.capabilities: frozenset[str] = capabilities
+        # pit the snake is in, maintained by World
+        self.pit: "SnakePit | None" = None
+        # when the snake last joined a pit, maintained by SnakePit
+        self.join_order: int = 0
+        # time.monotonic() of the last join, leave or signaling message
+        self.last_active: float = time.monotonic()
+        # set when session resumption is on, see SnakePitManager
+        self.resume_token: str | None = None
+
+        # index into the name tables, rendered on access; names from outside
+        # the tables are kept as strings
+        self._name: int | str
+        if name_index is not None:
+            self._name = name_index
+        elif display_name is None:
+            self._name = randrange(NAME_SPACE_SIZE)
+        else:
+            index = index_from_name(display_name)
+            self._name = display_name if index is None else index
+
+    @property
+    def display_name(self) -> str:
+        if isinstance(self._name, str):
+            return self._name
+        return name_from_index(self._name)
+
+    @property
+    def name_index(self) -> int | None:
+        return self._name if isinstance(self._name, int) else None
+
+    @name_index.setter
+    def name_index(self, index: int):
+        self._name = index
 
     def __str__(self):
         return f"SnakePitMember(id={self.id}, display_name={self.display_name})"
@@ -1,24 +1,64 @@
+import itertools
+import time
 import uuid
 
 from server.model.snake import Snake, SnakeId
 
 SnakePitId = uuid.UUID
 
+# increasing across pits, so members compare by when they joined
+_join_orders = itertools.count(1)
+
 
 class SnakePit:
-    def __init__(self, id=uuid.uuid4()):
-        self.id: SnakePitId = id
+    __slots__ = ("id", "snakes", "roster", "last_active")
+
+    def __init__(self, id: SnakePitId | None = None):
+        self.id: SnakePitId = id if id is not None else uuid.uuid4()
         self.snakes: dict[SnakeId, Snake] = dict()
+        # join payload entry per member, kept in step with `snakes`
+        self.roster: dict[SnakeId, dict[str, str]] = dict()
+        # time.monotonic() of the last join, leave or signaling message
+        self.last_active: float = time.monotonic()
 
     def add_snake(self, new_snake: Snake):
+        new_snake.join_order = next(_join_orders)
         self.snakes[new_snake.id] = new_snake
+        self.roster[new_snake.id] = {
+            "peer_id": new_snake.id,
+            "display_name": new_snake.display_name,
+        }
 
     def remove_snake(self, snake: Snake):
         try:
             del self.snakes[snake.id]
+            del self.roster[snake.id]
         except KeyError as e:
             return None
 
+    def rebind_snake(self, snake: Snake, new_snake_id: SnakeId):
+        """Move a member to a new id, keeping its place in the roster."""
+        old_snake_id = snake.id
+        # dicts only append, so both are rebuilt with the key swapped
+        self.snakes = {
+            new_snake_id if snake_id == old_snake_id else snake_id: member
+            for snake_id, member in self.snakes.items()
+        }
+        roster = {}
+        for snake_id, entry in self.roster.items():
+            if snake_id == old_snake_id:
+                snake_id, entry = new_snake_id, {**entry, "peer_id": new_snake_id}
+            roster[snake_id] = entry
+        self.roster = roster
+
+    def offers_to(self, from_snake: Snake, to_snake: Snake) -> bool:
+        """Whether the mesh plan has `from_snake` offer to `to_snake`.
+
+        The later of two members to join offers, so a newcomer offers to
+        every member and waits for nobody.
+        """
+        return from_snake.join_order > to_snake.join_order
+
     def get_snake(self, snake_or_id: Snake | SnakeId) -> Snake | None:
         """Get a snake by Snake object or SnakeId."""
         if isinstance(snake_or_id, Snake):
@@ -1,4 +1,4 @@
-from server.model.snake import Snake, Snake, SnakeId
+from server.model.snake import Snake, SnakeId
 from server.model.snake_pit import SnakePit, SnakePitId
 from typing import Tuple
 
@@ -6,35 +6,138 @@ SnakePitState = Tuple[Snake, SnakePit | None]
 
 
 class World:
+    """In-process world storage.
+
+    Managers only go through the methods below, so a networked backend
+    (see `SharedWorld`) can replace the dicts without touching them.
+    """
+
+    __slots__ = ("pits", "snakes", "pit_sizes")
+
     def __init__(self):
         self.pits: dict[SnakePitId, SnakePit] = dict()
-        self.snakes: dict[SnakeId, SnakePitState] = dict()
+        # a snake's pit is kept on `snake.pit`
+        self.snakes: dict[SnakeId, Snake] = dict()
+        # number of pits per member count, kept up to date on every change
+        self.pit_sizes: dict[int, int] = dict()
+
+    def add_snake(self, snake: Snake) -> None:
+        snake.pit = None
+        self.snakes[snake.id] = snake
+
+    def remove_snake(self, snake_id: SnakeId) -> None:
+        self.snakes.pop(snake_id, None)
+
+    def has_snake(self, snake_id: SnakeId) -> bool:
+        return snake_id in self.snakes
+
+    def get_snake_state(self, snake_id: SnakeId) -> SnakePitState | None:
+        snake = self.snakes.get(snake_id)
+        if snake is None:
+            return None
+        return snake, snake.pit
+
+    def rebind_snake(self, snake: Snake, new_snake_id: SnakeId) -> None:
+        """Move a snake to a new id, keeping its pit membership."""
+        if snake.pit is not None:
+            # its peer connections survive, and so does who offered on them
+            snake.pit.rebind_snake(snake, new_snake_id)
+        del self.snakes[snake.id]
+
+        snake.id = new_snake_id
+        self.snakes[new_snake_id] = snake
+
+    def add_snake_to_pit(self, snake: Snake, pit: SnakePit) -> None:
+        size_before = len(pit)
+        pit.add_snake(snake)
+        self._count_pit_size(size_before, len(pit))
+        snake.pit = pit
+
+    def remove_snake_from_pit(self, snake: Snake, pit: SnakePit) -> None:
+        size_before = len(pit)
+        pit.remove_snake(snake)
+        self._count_pit_size(size_before, len(pit))
+        snake.pit = None
+
+    def pit_size(self, pit: SnakePit) -> int:
+        return len(pit)
+
+    def pit_roster(self, pit: SnakePit) -> list[dict[str, str]]:
+        """Id and display name of every member, in join order."""
+        return list(pit.roster.values())
+
+    def create_pit(self, pit_id: SnakePitId) -> SnakePit:
+        replaced_pit = self.pits.get(pit_id)
+        if replaced_pit is not None:
+            self._count_pit_size(len(replaced_pit), None)
 
-    def create_pit(self, pit_id: SnakePitId) -> None:
         new_pit = SnakePit(pit_id)
         self.pits[pit_id] = new_pit
+        self._count_pit_size(None, 0)
+        return new_pit
 
     def destroy_pit(self, pit: SnakePit) -> None:
         if pit.id in self.pits and len(pit) == 0:
             del self.pits[pit.id]
+            self._count_pit_size(0, None)
 
     def get_pit(self, requested_pit_id: SnakePitId) -> SnakePit | None:
         return self.pits.get(requested_pit_id)
 
+    def _count_pit_size(self, old_size: int | None, new_size: int | None) -> None:
+        if old_size == new_size:
+            return
+
+        if old_size is not None:
+            remaining = self.pit_sizes[old_size] - 1
+            if remaining:
+                self.pit_sizes[old_size] = remaining
+            else:
+                del self.pit_sizes[old_size]
+
+        if new_size is not None:
+            self.pit_sizes[new_size] = self.pit_sizes.get(new_size, 0) + 1
+
+    def summary(self, pit: SnakePit | None = None) -> dict:
+        """Constant size description for logs, unlike `str(world)`."""
+        summary = {"pits": len(self.pits), "snakes": len(self.snakes)}
+        if pit is not None:
+            summary["pit_id"] = str(pit.id)
+            summary["pit_size"] = len(pit)
+        return summary
+
     def __str__(self):
         return (
             f"World(pits="
             + str([str(pit) for pit in self.pits.values()])
             + ", snakes="
-            + str([f"{snake.id}: {str(pit)}" for snake, pit in self.snakes.values()])
+            + str([f"{snake.id}: {str(snake.pit)}" for snake in self.snakes.values()])
             + ")"
         )
 
+    def heartbeat(self, now: float | None = None) -> list[tuple[SnakeId, SnakePitId]]:
+        """Memberships lost with another node, see `SharedWorld.heartbeat`."""
+        return []
+
     def each_pit(self):
         return iter(self.pits.values())
 
+    def each_snake(self):
+        """Snakes connected to this process."""
+        return iter(self.snakes.values())
+
     def __len__(self):
         return len(self.pits)
 
     def __contains__(self, pit_id: SnakePitId):
-        return pit_id in self.pits
+        return self.get_pit(pit_id) is not None
+
+
+def create_world(store_url: str | None = None) -> World:
+    """In-process World, or a SharedWorld when given a Redis url."""
+    if store_url is None:
+        return World()
+
+    from server.model.shared_world import SharedWorld
+
+    return SharedWorld.from_url(store_url)
@@ -0,0 +1,187 @@
+import time
+from collections import deque
+
+from server.metrics import (
+    JOIN_TO_FULL_MESH,
+    OFFER_TO_ANSWER,
+    OFFER_TO_CONNECTED,
+    Histogram,
+)
+from server.model import Snake, SnakePit, SnakePitId
+
+# pairs traced per pit, a pit of 46 has 1035
+MAX_TRACED_PAIRS = 1024
+# larger pits share one pit_size label
+MAX_LABELLED_PIT_SIZE = 32
+# latest samples kept per distribution and pit size, for /negotiations
+RECENT_SAMPLES = 1000
+
+# join orders of the earlier and the later member, kept through a reattach
+PeerPair = tuple[int, int]
+
+
+class PairTrace:
+    __slots__ = ("offer_at", "answer_at", "first_ice_at", "last_ice_at", "connected_at")
+
+    def __init__(self):
+        self.offer_at: float | None = None
+        self.answer_at: float | None = None
+        self.first_ice_at: float | None = None
+        self.last_ice_at: float | None = None
+        self.connected_at: float | None = None
+
+
+class PitTrace:
+    __slots__ = ("pairs", "answered", "mesh_started_at", "overflowed")
+
+    def __init__(self):
+        self.pairs: dict[PeerPair, PairTrace] = dict()
+        # pairs of current members that have answered
+        self.answered = 0
+        # first join since the mesh was last complete
+        self.mesh_started_at: float | None = None
+        # pairs went over MAX_TRACED_PAIRS, the mesh is no longer timed
+        self.overflowed = False
+
+
+class NegotiationTracer:
+    """Negotiation milestones per pair of pit members.
+
+    WebRtcManager reports offers, answers, ICE candidates and peer_connected
+    acks, SnakePitManager joins and leaves. Each pit's trace is dropped with
+    the pit and holds at most `max_pairs` pairs. Completed milestones go to
+    the negotiation histograms, labelled with the pit size.
+    """
+
+    def __init__(self, max_pairs: int = MAX_TRACED_PAIRS):
+        self.max_pairs = max_pairs
+        self.pits: dict[SnakePitId, PitTrace] = dict()
+        self.recent: dict[tuple[str, str], deque[float]] = dict()
+
+    def joined(self, pit: SnakePit, now: float | None = None):
+        trace = self._pit_trace(pit)
+        if trace.mesh_started_at is None and len(pit) > 1:
+            trace.mesh_started_at = time.monotonic() if now is None else now
+
+    def left(self, pit: SnakePit, snake: Snake, now: float | None = None):
+        trace = self.pits.get(pit.id)
+        if trace is None:
+            return
+
+        order = snake.join_order
+        for pair in [pair for pair in trace.pairs if order in pair]:
+            if trace.pairs.pop(pair).answer_at is not None:
+                trace.answered -= 1
+        # the members left may be the ones that had all answered
+        self._check_mesh(pit, trace, time.monotonic() if now is None else now)
+
+    def forget(self, pit: SnakePit):
+        self.pits.pop(pit.id, None)
+
+    def offer(self, from_snake: Snake, to_snake: Snake, now: float | None = None):
+        pair = self._pair(from_snake, to_snake)
+        if pair is not None and pair.offer_at is None:
+            pair.offer_at = time.monotonic() if now is None else now
+
+    def answer(self, from_snake: Snake, to_snake: Snake, now: float | None = None):
+        pair = self._pair(from_snake, to_snake)
+        if pair is None or pair.offer_at is None or pair.answer_at is not None:
+            return
+
+        pit = from_snake.pit
+        pair.answer_at = now = time.monotonic() if now is None else now
+        self._observe(OFFER_TO_ANSWER, now - pair.offer_at, len(pit))
+        trace = self.pits[pit.id]
+        trace.answered += 1
+        self._check_mesh(pit, trace, now)
+
+    def ice_candidate(
+        self, from_snake: Snake, to_snake: Snake, now: float | None = None
+    ):
+        pair = self._pair(from_snake, to_snake)
+        if pair is None:
+            return
+
+        pair.last_ice_at = time.monotonic() if now is None else now
+        if pair.first_ice_at is None:
+            pair.first_ice_at = pair.last_ice_at
+
+    def connected(self, from_snake: Snake, to_snake: Snake, now: float | None = None):
+        pair = self._pair(from_snake, to_snake)
+        if pair is None or pair.offer_at is None or pair.connected_at is not None:
+            return
+
+        pair.connected_at = time.monotonic() if now is None else now
+        self._observe(
+            OFFER_TO_CONNECTED, pair.connected_at - pair.offer_at, len(from_snake.pit)
+        )
+
+    def summary(self) -> dict:
+        """Recent samples per distribution and pit size, and what is in flight."""
+        distributions: dict[str, dict] = dict()
+        for (name, pit_size), samples in sorted(self.recent.items()):
+            ordered = sorted(samples)
+            distributions.setdefault(name, {})[pit_size] = {
+                "samples": len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p95": ordered[int(len(ordered) * 0.95)],
+                "max": ordered[-1],
+            }
+        return {
+            "distributions": distributions,
+            "pits_meshing": sum(
+                1 for trace in self.pits.values() if trace.mesh_started_at is not None
+            ),
+            "pairs_awaiting_answer": sum(
+                len(trace.pairs) - trace.answered for trace in self.pits.values()
+            ),
+        }
+
+    def _pit_trace(self, pit: SnakePit) -> PitTrace:
+        trace = self.pits.get(pit.id)
+        if trace is None:
+            trace = self.pits[pit.id] = PitTrace()
+        return trace
+
+    def _pair(self, from_snake: Snake, to_snake: Snake) -> PairTrace | None:
+        pit = from_snake.pit
+        # peers on another node are not in the local pit
+        if pit is None or to_snake.pit is not pit:
+            return None
+
+        trace = self._pit_trace(pit)
+        orders = from_snake.join_order, to_snake.join_order
+        key = (min(orders), max(orders))
+        pair = trace.pairs.get(key)
+        if pair is None:
+            if len(trace.pairs) >= self.max_pairs:
+                trace.overflowed = True
+                return None
+            pair = trace.pairs[key] = PairTrace()
+        return pair
+
+    def _check_mesh(self, pit: SnakePit, trace: PitTrace, now: float):
+        size = len(pit)
+        if (
+            trace.mesh_started_at is None
+            or trace.overflowed
+            or trace.answered < size * (size - 1) // 2
+        ):
+            return
+
+        if size > 1:
+            self._observe(JOIN_TO_FULL_MESH, now - trace.mesh_started_at, size)
+        trace.mesh_started_at = None
+
+    def _observe(self, histogram: Histogram, seconds: float, pit_size: int):
+        label = (
+            str(pit_size)
+            if pit_size <= MAX_LABELLED_PIT_SIZE
+            else f">{MAX_LABELLED_PIT_SIZE}"
+        )
+        histogram.observe(seconds, label)
+
+        recent = self.recent.get((histogram.name, label))
+        if recent is None:
+            recent = self.recent[(histogram.name, label)] = deque(maxlen=RECENT_SAMPLES)
+        recent.append(seconds)
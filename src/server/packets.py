@@ -0,0 +1,210 @@
+import json
+import re
+
+from socketio.packet import BINARY_ACK, BINARY_EVENT, EVENT, Packet
+
+from server.metrics import ADMISSION_REFUSALS
+
+# longest encoded socket.io packet accepted per event, "*" for the others
+DEFAULT_PAYLOAD_LIMITS = {
+    "send_offer": 64 * 1024,
+    "send_answer": 64 * 1024,
+    "send_ice_candidate": 2 * 1024,
+    "*": 1024,
+}
+# what an event over its limit is delivered as, with the event name
+PAYLOAD_REJECTED_EVENT = "payload_rejected"
+# events whose body can be relayed as it was received, see RawJson
+RAW_SIGNALING_EVENTS = ("send_offer", "send_answer")
+# what the socket.io packets are encoded as, for every client of a server
+SERIALIZERS = ("json", "msgpack")
+
+# type digit, attachment count of a binary packet, optional namespace and ack id
+PACKET_HEAD = re.compile(r"\d?(?:\d{1,10}-)?(?:/[^,]{0,64},)?\d{0,20}")
+# the head of an event or binary event, then the event name
+EVENT_HEAD = re.compile(
+    r'([25](?:\d{1,10}-)?(?:/[^,]{0,64},)?\d{0,20})\["([^"\\]{1,64})"'
+)
+# first character of the packets followed by binary attachments
+BINARY_TYPES = (str(BINARY_EVENT), str(BINARY_ACK))
+# the target peer id following the event name of a relayed event
+RELAYED_HEAD = re.compile(r',"([^"\\]{1,64})",')
+
+
+class RawJson:
+    """A JSON value kept as the text it was received as.
+
+    `value` is the decoded value, for validation. Packets from
+    `signaling_packet_class` encode it by splicing `text` back in, so a
+    relayed body is never encoded again.
+    """
+
+    __slots__ = ("text", "value")
+
+    def __init__(self, text: str, value):
+        self.text = text
+        self.value = value
+
+    def __eq__(self, other):
+        if isinstance(other, RawJson):
+            return self.value == other.value
+        return self.value == other
+
+    def __repr__(self):
+        return f"RawJson({self.text[:32]!r})"
+
+
+class RawJsonCodec:
+    """Stands in for the json module of a packet class, splicing RawJson in."""
+
+    loads = staticmethod(json.loads)
+
+    @staticmethod
+    def dumps(obj, **kwargs) -> str:
+        texts = []
+
+        def placeholder(o):
+            if not isinstance(o, RawJson):
+                raise TypeError(f"{type(o).__name__} is not JSON serializable")
+            texts.append(o.text)
+            return f"\0{len(texts) - 1}"
+
+        encoded = json.dumps(obj, default=placeholder, **kwargs)
+        for n, text in enumerate(texts):
+            encoded = encoded.replace(f'"\\u0000{n}"', text, 1)
+        return encoded
+
+
+def parse_payload_limits(spec: str | None) -> dict[str, int]:
+    # "send_offer=32768,*=512", over the defaults
+    limits = dict(DEFAULT_PAYLOAD_LIMITS)
+    for item in (spec or "").split(","):
+        if "=" in item:
+            event, limit = item.split("=", 1)
+            limits[event.strip()] = int(limit)
+    return limits
+
+
+def signaling_packet_class(
+    limits: dict[str, int],
+    raw_events: tuple[str, ...] = (),
+    serializer: str = "json",
+) -> type[Packet]:
+    """A socket.io packet class reading what it can off the head of a packet.
+
+    - events over their limit in `limits` are not decoded, but handed to the
+      `PAYLOAD_REJECTED_EVENT` handler as `(event,)`. The binary attachments
+      of a packet count towards its limit, and are not kept past it
+    - `(to_peer_id, body)` events in `raw_events` get their body as a
+      RawJson, which is spliced as is into the packets relaying it
+
+    With the msgpack serializer, packets are decoded before their limit is
+    checked and `raw_events` does not apply.
+    """
+    if serializer not in SERIALIZERS:
+        raise ValueError(f"Unknown serializer: {serializer}")
+
+    default_limit = limits.get("*", DEFAULT_PAYLOAD_LIMITS["*"])
+    smallest_limit = min(limits.values())
+
+    if serializer == "msgpack":
+        return _msgpack_packet_class(limits, default_limit, smallest_limit)
+
+    class SignalingPacket(Packet):
+        if raw_events:
+            json = RawJsonCodec
+        # bytes received for the packet so far, attachments included
+        size = 0
+        limit = default_limit
+        event = None
+
+        def decode(self, encoded_packet):
+            if not isinstance(encoded_packet, str) or (
+                not raw_events
+                and len(encoded_packet) <= smallest_limit
+                and encoded_packet[:1] not in BINARY_TYPES
+            ):
+                return super().decode(encoded_packet)
+
+            head = EVENT_HEAD.match(encoded_packet)
+            event = None
+            if head is None:
+                # the type, attachment count, namespace and ack id
+                prefix = PACKET_HEAD.match(encoded_packet).group()
+            else:
+                prefix, event = head.groups()
+                self.event, self.limit = event, limits.get(event, default_limit)
+            self.size = len(encoded_packet)
+            if self.size > self.limit:
+                return self._reject(prefix, event)
+
+            if (
+                event in raw_events
+                and encoded_packet[0] == "2"
+                and encoded_packet[-1] == "]"
+            ):
+                relayed = RELAYED_HEAD.match(encoded_packet, head.end())
+                if relayed is not None:
+                    text = encoded_packet[relayed.end() : -1]
+                    try:
+                        # still parsed, a broken body must not reach the peer
+                        value = json.loads(text)
+                    except ValueError:
+                        return super().decode(encoded_packet)
+
+                    attachments = super().decode(prefix)
+                    self.data = [event, relayed.group(1), RawJson(text, value)]
+                    return attachments
+
+            return super().decode(encoded_packet)
+
+        def add_attachment(self, attachment):
+            rejected = self.size > self.limit
+            self.size += len(attachment)
+            if self.size > self.limit:
+                # still taken, or the next attachment reads as a packet
+                attachment = b""
+            complete = super().add_attachment(attachment)
+            if complete and self.size > self.limit and not rejected:
+                self._refuse(self.event)
+            return complete
+
+        def _reject(self, prefix: str, event: str | None) -> int:
+            attachments = super().decode(prefix)
+            self._refuse(event)
+            return attachments
+
+        def _refuse(self, event: str | None):
+            ADMISSION_REFUSALS.inc(event if event in limits else "*", "too_large")
+            self.data = [PAYLOAD_REJECTED_EVENT, event]
+
+    return SignalingPacket
+
+
+def _msgpack_packet_class(
+    limits: dict[str, int], default_limit: int, smallest_limit: int
+) -> type[Packet]:
+    # msgpack is an optional dependency, only imported when configured
+    from socketio.msgpack_packet import MsgPackPacket
+
+    class SignalingMsgPackPacket(MsgPackPacket):
+        def decode(self, encoded_packet):
+            # unpacking a msgpack packet is mostly copying, so it is done
+            # first and the event name read off the result
+            super().decode(encoded_packet)
+            if (
+                len(encoded_packet) <= smallest_limit
+                or self.packet_type != EVENT
+                or not isinstance(self.data, list)
+            ):
+                return 0
+
+            event = self.data[0] if self.data else None
+            if not isinstance(event, str):
+                event = None
+            if len(encoded_packet) > limits.get(event, default_limit):
+                ADMISSION_REFUSALS.inc(event if event in limits else "*", "too_large")
+                self.data = [PAYLOAD_REJECTED_EVENT, event]
+            return 0
+
+    return SignalingMsgPackPacket
@@ -1,118 +1,627 @@
-from flask_socketio import emit, join_room, leave_room
-from server.model import SnakePit, SnakePitId, Snake, SnakeId, World
+import secrets
+import time
+import uuid
+from typing import TYPE_CHECKING
+
+from server.emitter import Emitter
+from server.model import (
+    FreeCapacityIndex,
+    NameAllocator,
+    SnakePit,
+    SnakePitId,
+    Snake,
+    SnakeId,
+    World,
+)
 from server.logger import get_logger
+from server.sharding import WorkerShard
+
+if TYPE_CHECKING:
+    from server.negotiation_trace import NegotiationTracer
+    from server.reaper import Reaper
+    from server.snapshot import WorldSnapshot
 
 _logger = get_logger(__name__)
 
+# display names are unique among all connected snakes, or only within a pit
+NAME_SCOPES = ("global", "pit")
+
 
 class SnakePitManager:
-    def __init__(self, world: World):
+    def __init__(
+        self,
+        world: World,
+        emitter: Emitter,
+        shard: WorkerShard | None = None,
+        name_scope: str = "global",
+        quick_join_pit_size: int = 6,
+        max_pit_size: int | None = None,
+        pit_overflow: bool = False,
+        resume_grace: float = 0,
+    ):
+        if name_scope not in NAME_SCOPES:
+            raise ValueError(f"Unknown name scope: {name_scope}")
+
         self.world = world
+        self.emitter = emitter
+        # set when running as one of several workers, see server.sharding
+        self.shard = shard
+        self.name_scope = name_scope
+        self.names = NameAllocator()
+        self.pit_names: dict[SnakePitId, NameAllocator] = dict()
+        # None means pits are unbounded
+        self.max_pit_size = max_pit_size
+        # pits opened by quick_join, which strangers may be matched into
+        self.open_pits = FreeCapacityIndex(
+            min(quick_join_pit_size, max_pit_size or quick_join_pit_size)
+        )
+        # joins to a full pit spill over into linked pits sharing a lobby id,
+        # the id of the pit that filled up first
+        self.pit_overflow = pit_overflow
+        self.lobbies: dict[SnakePitId, FreeCapacityIndex] = dict()
+        self.pit_lobby: dict[SnakePitId, SnakePitId] = dict()
+        # expires idle pits and snakes when set, see server.reaper
+        self.reaper: "Reaper | None" = None
+        # shared with WebRtcManager when negotiations are traced
+        self.tracer: "NegotiationTracer | None" = None
+        # seconds a disconnected snake keeps its pit and name for a reconnect
+        # with its resume token, needs the reaper to end
+        self.resume_grace = resume_grace
+        self.sessions: dict[str, Snake] = dict()
+        # tokens of the sessions held after a disconnect
+        self.detached: set[str] = set()
+        # the previous process's world, see load_snapshot
+        self.snapshot: "WorldSnapshot | None" = None
+        self.snapshot_deadline = 0.0
+        self.restored_tokens: set[str] = set()
+        # set on shutdown, see start_draining
+        self.draining = False
+        self.drain_deadline = 0.0
+
+    def load_snapshot(self, snapshot: "WorldSnapshot"):
+        """Let the sessions of a snapshot resume for the next `resume_grace` seconds.
+
+        Their pits come back when a member reattaches or someone joins them.
+        """
+        self.snapshot = snapshot
+        self.snapshot_deadline = time.monotonic() + self.resume_grace
+        _logger.info(
+            "Loaded snapshot with %d sessions",
+            len(snapshot),
+            extra={"event": "snapshot_loaded"},
+        )
+
+    def start_draining(self, timeout: float):
+        """Stop taking snakes in, while members keep signaling in their pits.
+
+        Snakes outside of a pit are disconnected right away and members as
+        they leave, so they reconnect to the process taking over. `drained`
+        turns true once the last one is gone, or `timeout` seconds from now.
+        """
+        self.draining = True
+        self.drain_deadline = time.monotonic() + timeout
+        _logger.info(
+            "Draining for up to %s seconds",
+            timeout,
+            extra={"event": "drain", **self.world.summary()},
+        )
+
+        for pit in self.world.each_pit():
+            self.emitter.emit("server_draining", {}, to=str(pit.id))
+        for snake in list(self.world.each_snake()):
+            if snake.pit is None:
+                self.emitter.disconnect(snake.id)
+
+    def drained(self, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return self.world.summary()["snakes"] == 0 or now >= self.drain_deadline
 
-    def handle_connect(self, new_snake_id: SnakeId):
-        if new_snake_id in self.world.snakes:
-            self._emit_error("Connection already established")
+    def handle_connect(
+        self,
+        new_snake_id: SnakeId,
+        capabilities: frozenset[str] = frozenset(),
+        resume_token: str | None = None,
+    ) -> bool | None:
+        """Returns False to refuse the connection."""
+        if self.draining:
+            return False
+
+        if self.world.has_snake(new_snake_id):
+            self._emit_error(new_snake_id, "Connection already established")
+            return
+
+        if resume_token is not None and resume_token in self.detached:
+            self._resume_session(new_snake_id, resume_token, capabilities)
             return
 
-        new_snake = Snake(new_snake_id)
+        if resume_token is not None and self._restore_session(
+            new_snake_id, resume_token, capabilities
+        ):
+            return
+
+        name_index = self.names.allocate() if self.name_scope == "global" else None
+        new_snake = Snake(
+            new_snake_id, capabilities=capabilities, name_index=name_index
+        )
         self._add_snake_to_world(new_snake)
-        emit("connected", {"display_name": new_snake.display_name})
+        if self.reaper is not None:
+            self.reaper.watch_snake(new_snake)
 
-    def handle_create_pit(self, pit_id: SnakePitId):
-        self.world.create_pit(pit_id)
-        emit("pit_created", {"pit_id": str(pit_id)})
-        _logger.info(f"Pit {pit_id} created")
+        connected = {"display_name": new_snake.display_name}
+        if self._resumable():
+            connected["resume_token"] = self._open_session(new_snake)
+        self.emitter.emit("connected", connected, to=new_snake_id)
+
+    def handle_create_pit(self, snake_id: SnakeId, pit_id: SnakePitId):
+        if self._refuse_draining(snake_id):
+            return
+
+        if not self._owns_pit(pit_id):
+            self._emit_redirect(snake_id, pit_id)
+            return
+
+        self._create_pit(pit_id)
+        self.emitter.emit("pit_created", {"pit_id": str(pit_id)}, to=snake_id)
+        _logger.info("Pit %s created", pit_id, extra={"event": "create_snake_pit"})
 
     def handle_join_pit(self, snake_id: SnakeId, pit_id: SnakePitId):
-        if snake_id not in self.world.snakes:
-            self._emit_error("Peer either already in a room or somehow not connected")
+        if self._refuse_draining(snake_id):
+            return
+
+        snake_state = self.world.get_snake_state(snake_id)
+        if snake_state is None:
+            self._emit_error(
+                snake_id, "Peer either already in a room or somehow not connected"
+            )
+            return
+
+        if not self._owns_pit(pit_id):
+            self._emit_redirect(snake_id, pit_id)
             return
 
-        if pit_id not in self.world.pits:
-            self._emit_error("Pit does not exist")
+        pit = self.world.get_pit(pit_id)
+        if pit is None and pit_id in self.lobbies:
+            # the first pit of a lobby emptied out, its overflow pits remain
+            pit = self._overflow_pit(pit_id)
+        if pit is None and self._snapshot_has_pit(pit_id):
+            pit = self._create_pit(pit_id)
+        if pit is None:
+            self._emit_error(snake_id, "Pit does not exist")
             return
 
-        snake, maybe_pit = self.world.snakes[snake_id]
+        snake, maybe_pit = snake_state
 
         if maybe_pit is not None:
-            self._emit_error(f"Snake is already in pit with id {maybe_pit.id}")
+            self._emit_error(
+                snake_id, f"Snake is already in pit with id {maybe_pit.id}"
+            )
             return
 
-        pit = self.world.pits[pit_id]  # read
+        if self._is_full(pit):
+            if not self.pit_overflow:
+                self.emitter.emit(
+                    "pit_full",
+                    {"pit_id": str(pit_id), "max_pit_size": self.max_pit_size},
+                    to=snake_id,
+                )
+                return
+            pit = self._overflow_pit(pit.id)
+
+        self._join_pit(snake, pit)
 
-        _logger.info(f"Peer {snake.display_name} joining pit {pit_id}")
+    def handle_quick_join(self, snake_id: SnakeId):
+        if self._refuse_draining(snake_id):
+            return
+
+        snake_state = self.world.get_snake_state(snake_id)
+        if snake_state is None:
+            self._emit_error(snake_id, "Peer is not connected")
+            return
+
+        snake, maybe_pit = snake_state
+        if maybe_pit is not None:
+            self._emit_error(
+                snake_id, f"Snake is already in pit with id {maybe_pit.id}"
+            )
+            return
+
+        pit_id = self.open_pits.pick()
+        pit = self.world.get_pit(pit_id) if pit_id is not None else None
+        if pit is None:
+            if pit_id is not None:
+                # destroyed behind the manager's back
+                self.open_pits.discard(pit_id)
+            pit = self._create_pit(self._new_pit_id())
+            self.open_pits.track(pit.id)
+            _logger.info(
+                "Pit %s opened for quick join", pit.id, extra={"event": "quick_join"}
+            )
+
+        self._join_pit(snake, pit)
+
+    def _join_pit(self, snake: Snake, pit: SnakePit):
+        pit_id = pit.id
+        # members before the newcomer, so it can offer to all of them at once
+        roster = self.world.pit_roster(pit)
         self._add_snake_to_pit(snake, pit)
 
         try:
             room_id = str(pit_id)
-            join_room(room_id)
+            self.emitter.enter_room(snake.id, room_id)
 
-            # Send confirmation to the joining peer
-            emit("pit_joined", {"pit_id": str(pit_id)})
+            # Send confirmation to the joining peer, which offers to every
+            # member before it (SnakePit.offers_to)
+            joined = {
+                "pit_id": str(pit_id),
+                "display_name": snake.display_name,
+                "pit_roster": roster,
+                "offer_to": [member["peer_id"] for member in roster],
+            }
+            if pit_id in self.pit_lobby:
+                joined["lobby_id"] = str(self.pit_lobby[pit_id])
+            self.emitter.emit("pit_joined", joined, to=snake.id)
 
-            # Notify other peers in the room
-            emit(
+            # Notify other peers in the room, which wait for its offer
+            self.emitter.emit(
                 "new_room_member",
-                {"new_peer_id": snake.id, "new_peer_display_name": snake.display_name},
+                {
+                    "new_peer_id": snake.id,
+                    "new_peer_display_name": snake.display_name,
+                    "await_offer": True,
+                },
                 to=room_id,
-                include_self=False,
+                skip_sid=snake.id,
             )
         except Exception as e:
-            _logger.error(f"Error joining room: {str(e)}")
+            _logger.error(
+                "Error joining room: %s", e, extra={"event": "join_snake_pit"}
+            )
             self._remove_snake_from_pit(snake, pit)
-            self._emit_error(f"Error joining room: {str(e)}")
+            self._emit_error(snake.id, f"Error joining room: {str(e)}")
 
-        _logger.info(f"World state after join: {str(self.world)}")
+        _logger.info(
+            "Peer %s joined pit %s",
+            snake.display_name,
+            pit_id,
+            extra={"event": "join_snake_pit", **self.world.summary(pit)},
+        )
 
     def handle_leave_pit(self, snake_id: SnakeId):
-        if snake_id not in self.world.snakes:
-            self._emit_error("Peer is not connected")
+        snake_state = self.world.get_snake_state(snake_id)
+        if snake_state is None:
+            self._emit_error(snake_id, "Peer is not connected")
             return
 
-        snake, maybe_pit = self.world.snakes[snake_id]
+        snake, maybe_pit = snake_state
 
         if maybe_pit is None:
-            self._emit_error("Peer is not in a pit")
+            self._emit_error(snake_id, "Peer is not in a pit")
             return
 
         self._remove_snake_from_pit(snake, maybe_pit)
+        if self.draining:
+            self.emitter.disconnect(snake_id)
 
     def handle_disconnect(self, snake_id: SnakeId):
-        if not snake_id in self.world.snakes:
+        snake_state = self.world.get_snake_state(snake_id)
+        if snake_state is None:
             return None
 
-        snake, maybe_pit = self.world.snakes[snake_id]
-        _logger.info(f"Peer {snake.display_name} with id {snake.id} disconnected")
+        snake, maybe_pit = snake_state
+        _logger.info(
+            "Peer %s with id %s disconnected",
+            snake.display_name,
+            snake.id,
+            extra={"event": "disconnect"},
+        )
+
+        if (
+            snake.resume_token in self.sessions
+            and self._resumable()
+            and not self.draining
+        ):
+            # peers hear nothing unless the grace period runs out
+            self.detached.add(snake.resume_token)
+            self.reaper.watch_session(
+                snake.resume_token, time.monotonic() + self.resume_grace
+            )
+            return
+
+        self._drop_snake(snake, maybe_pit)
+
+    def expire_session(self, resume_token: str):
+        """End a session held since its disconnect, as the disconnect would have."""
+        if resume_token not in self.detached:
+            return
+
+        snake = self.sessions[resume_token]
+        _logger.info(
+            "Session of peer %s with id %s expired",
+            snake.display_name,
+            snake.id,
+            extra={"event": "session_expired"},
+        )
+        self._drop_snake(snake, snake.pit)
+
+    def _drop_snake(self, snake: Snake, maybe_pit: SnakePit | None):
+        snake_id = snake.id
+        self.sessions.pop(snake.resume_token, None)
+        self.detached.discard(snake.resume_token)
 
         if maybe_pit is not None:
             self._remove_snake_from_pit(snake, maybe_pit)
 
         # peer is disconnected, remove them from the world
-        del self.world.snakes[snake_id]
+        self.world.remove_snake(snake_id)
+        if self.name_scope == "global":
+            self.names.release(snake.name_index)
+
+        _logger.debug(
+            "World after disconnect",
+            extra={"event": "disconnect", **self.world.summary()},
+        )
+
+    def check_nodes(self, now: float | None = None):
+        """Announce the members of nodes that stopped, called by housekeeping."""
+        for snake_id, pit_id in self.world.heartbeat(now):
+            _logger.warning(
+                "Peer %s left with its node",
+                snake_id,
+                extra={"event": "node_lost"},
+            )
+            self.emitter.emit(
+                "room_member_left", {"leaving_peer_id": snake_id}, to=str(pit_id)
+            )
+
+    def expire_pit(self, pit: SnakePit):
+        """Close a pit that outlived its TTL, its members stay connected."""
+        _logger.info("Pit %s expired", pit.id, extra={"event": "pit_expired"})
+        self.emitter.emit("pit_expired", {"pit_id": str(pit.id)}, to=str(pit.id))
+        for snake in list(pit):
+            self._remove_snake_from_pit(snake, pit)
+            if self.draining:
+                self.emitter.disconnect(snake.id)
+        if self.world.get_pit(pit.id) is pit:
+            self._destroy_pit(pit)
+
+    def expire_snake(self, snake: Snake):
+        _logger.info(
+            "Peer %s with id %s expired",
+            snake.display_name,
+            snake.id,
+            extra={"event": "snake_expired"},
+        )
+        self._drop_snake(snake, snake.pit)
+        self.emitter.disconnect(snake.id)
+
+    def _refuse_draining(self, snake_id: SnakeId) -> bool:
+        if not self.draining:
+            return False
+
+        self.emitter.emit("server_draining", {}, to=snake_id)
+        snake_state = self.world.get_snake_state(snake_id)
+        if snake_state is not None and snake_state[1] is None:
+            self.emitter.disconnect(snake_id)
+        return True
+
+    def _resumable(self) -> bool:
+        return self.resume_grace > 0 and self.reaper is not None
+
+    def _open_session(self, snake: Snake) -> str:
+        snake.resume_token = secrets.token_urlsafe(16)
+        self.sessions[snake.resume_token] = snake
+        return snake.resume_token
+
+    def _resume_session(
+        self, new_snake_id: SnakeId, resume_token: str, capabilities: frozenset[str]
+    ):
+        snake = self.sessions.pop(resume_token)
+        self.detached.discard(resume_token)
+        old_snake_id = snake.id
+
+        self.world.rebind_snake(snake, new_snake_id)
+        snake.capabilities = capabilities
+        snake.last_active = time.monotonic()
+        self._reattach(snake, old_snake_id)
+
+    def _restore_session(
+        self, new_snake_id: SnakeId, resume_token: str, capabilities: frozenset[str]
+    ) -> bool:
+        """Reattach a snake of the snapshot, False if the token is not in it."""
+        snapshot = self._current_snapshot()
+        if snapshot is None or resume_token in self.restored_tokens:
+            return False
+
+        session = snapshot.find_session(resume_token)
+        if session is None:
+            return False
+        self.restored_tokens.add(resume_token)
+
+        pit = self.world.get_pit(session.pit_id)
+        if pit is None:
+            pit = self._create_pit(session.pit_id)
+        names = self.names if self.name_scope == "global" else self._pit_names(pit)
+        # keeps the name it had, unless a snake drew it since the restart
+        name_index = session.name_index
+        if name_index is None or not names.reserve(name_index):
+            name_index = names.allocate()
+        snake = Snake(new_snake_id, capabilities=capabilities, name_index=name_index)
+        self._add_snake_to_world(snake)
+
+        self.world.add_snake_to_pit(snake, pit)
+        self._update_pit_indexes(pit)
+        pit.last_active = snake.last_active
+        if self.reaper is not None:
+            self.reaper.watch_pit(pit)
+        if self.tracer is not None:
+            self.tracer.joined(pit)
+
+        self._reattach(snake, session.old_snake_id)
+        return True
+
+    def _reattach(self, snake: Snake, old_snake_id: SnakeId):
+        new_snake_id = snake.id
+        _logger.info(
+            "Peer %s reattached as %s",
+            old_snake_id,
+            new_snake_id,
+            extra={"event": "peer_reattached"},
+        )
+
+        # tokens are single use
+        connected = {
+            "display_name": snake.display_name,
+            "resume_token": self._open_session(snake),
+        }
+        if snake.pit is None:
+            self.reaper.watch_snake(snake)
+        else:
+            room_id = str(snake.pit.id)
+            connected["pit_id"] = room_id
+            self.emitter.enter_room(new_snake_id, room_id)
+            self.emitter.emit(
+                "peer_reattached",
+                {"old_peer_id": old_snake_id, "new_peer_id": new_snake_id},
+                to=room_id,
+                skip_sid=new_snake_id,
+            )
+        self.emitter.emit("connected", connected, to=new_snake_id)
 
-        _logger.debug(f"World state after disconnect: {str(self.world)}")
+    def _current_snapshot(self) -> "WorldSnapshot | None":
+        if self.snapshot is not None and time.monotonic() > self.snapshot_deadline:
+            self.snapshot.close()
+            self.snapshot = None
+            self.restored_tokens.clear()
+        return self.snapshot
+
+    def _snapshot_has_pit(self, pit_id: SnakePitId) -> bool:
+        snapshot = self._current_snapshot()
+        return snapshot is not None and snapshot.has_pit(pit_id)
 
     def _add_snake_to_world(self, snake: Snake):
-        self.world.snakes[snake.id] = (snake, None)
+        self.world.add_snake(snake)
+
+    def _create_pit(self, pit_id: SnakePitId) -> SnakePit:
+        pit = self.world.create_pit(pit_id)
+        if self.reaper is not None:
+            self.reaper.watch_pit(pit)
+        return pit
+
+    def _destroy_pit(self, pit: SnakePit):
+        self.world.destroy_pit(pit)
+        if self.tracer is not None:
+            self.tracer.forget(pit)
+        self.pit_names.pop(pit.id, None)
+        self.open_pits.discard(pit.id)
+        self._leave_lobby(pit.id)
 
     def _add_snake_to_pit(self, snake: Snake, pit: SnakePit):
-        pit.add_snake(snake)
-        self.world.snakes[snake.id] = (snake, pit)
+        if self.name_scope == "pit":
+            snake.name_index = self._pit_names(pit).allocate()
+
+        self.world.add_snake_to_pit(snake, pit)
+        self._update_pit_indexes(pit)
+        snake.last_active = pit.last_active = time.monotonic()
+        if self.reaper is not None:
+            self.reaper.watch_pit(pit)
+        if self.tracer is not None:
+            self.tracer.joined(pit)
+
+    def _pit_names(self, pit: SnakePit) -> NameAllocator:
+        pit_names = self.pit_names.get(pit.id)
+        if pit_names is None:
+            pit_names = self.pit_names[pit.id] = NameAllocator()
+        return pit_names
 
     def _remove_snake_from_pit(self, snake: Snake, pit: SnakePit):
-        pit.remove_snake(snake)
-        self.world.snakes[snake.id] = (snake, None)
+        self.world.remove_snake_from_pit(snake, pit)
+        self._update_pit_indexes(pit)
+        if self.tracer is not None:
+            self.tracer.left(pit, snake)
+        if self.name_scope == "pit" and pit.id in self.pit_names:
+            self.pit_names[pit.id].release(snake.name_index)
+        snake.last_active = pit.last_active = time.monotonic()
+        if self.reaper is not None:
+            self.reaper.watch_snake(snake)
 
         room_id = str(pit.id)
-        leave_room(room_id)
-        emit("room_member_left", {"leaving_peer_id": snake.id}, to=room_id)
+        self.emitter.leave_room(snake.id, room_id)
+        self.emitter.emit("room_member_left", {"leaving_peer_id": snake.id}, to=room_id)
+
+        if self.world.pit_size(pit) == 0:
+            _logger.info(
+                "Pit %s is empty, deleting", pit.id, extra={"event": "pit_deleted"}
+            )
+            self._destroy_pit(pit)
+
+    def _is_full(self, pit: SnakePit) -> bool:
+        return (
+            self.max_pit_size is not None
+            and self.world.pit_size(pit) >= self.max_pit_size
+        )
+
+    def _overflow_pit(self, pit_id: SnakePitId) -> SnakePit:
+        """A pit with a free seat in `pit_id`'s lobby, opened if there is none."""
+        lobby_id = self.pit_lobby.get(pit_id, pit_id)
+        lobby = self.lobbies.get(lobby_id)
+        if lobby is None:
+            lobby = self.lobbies[lobby_id] = FreeCapacityIndex(self.max_pit_size)
+            first_pit = self.world.get_pit(pit_id)
+            lobby.track(pit_id, self.world.pit_size(first_pit))
+            self.pit_lobby[pit_id] = lobby_id
+
+        open_pit_id = lobby.pick()
+        if open_pit_id is not None:
+            return self.world.get_pit(open_pit_id)
+
+        pit = self._create_pit(self._new_pit_id())
+        lobby.track(pit.id)
+        self.pit_lobby[pit.id] = lobby_id
+        _logger.info(
+            "Pit %s opened as overflow of %s",
+            pit.id,
+            lobby_id,
+            extra={"event": "pit_overflow", "lobby_pits": len(lobby)},
+        )
+        return pit
+
+    def _leave_lobby(self, pit_id: SnakePitId):
+        lobby_id = self.pit_lobby.pop(pit_id, None)
+        if lobby_id is None:
+            return
+
+        lobby = self.lobbies[lobby_id]
+        lobby.discard(pit_id)
+        if len(lobby) == 0:
+            del self.lobbies[lobby_id]
+
+    def _update_pit_indexes(self, pit: SnakePit):
+        in_lobby = pit.id in self.pit_lobby
+        if not in_lobby and pit.id not in self.open_pits:
+            return
+
+        size = self.world.pit_size(pit)
+        self.open_pits.update(pit.id, size)
+        if in_lobby:
+            self.lobbies[self.pit_lobby[pit.id]].update(pit.id, size)
+
+    def _new_pit_id(self) -> SnakePitId:
+        # draw until the id hashes to this worker, `workers` draws on average
+        while True:
+            pit_id = uuid.uuid4()
+            if self._owns_pit(pit_id):
+                return pit_id
+
+    def _owns_pit(self, pit_id: SnakePitId) -> bool:
+        return self.shard is None or self.shard.owns(pit_id)
 
-        if len(pit) == 0:
-            _logger.info(f"Pit {pit.id} is empty, deleting")
-            del self.world.pits[pit.id]
+    def _emit_redirect(self, snake_id: SnakeId, pit_id: SnakePitId):
+        # the client reconnects with ?pit_id=... so the router pins it to the owner
+        self.emitter.emit("pit_redirect", {"pit_id": str(pit_id)}, to=snake_id)
 
-    def _emit_error(self, error_message: str):
-        emit(
+    def _emit_error(self, snake_id: SnakeId, error_message: str):
+        self.emitter.emit(
             "error",
             {"message": error_message},
+            to=snake_id,
         )
@@ -0,0 +1,113 @@
+import time
+
+from server.model import Snake, SnakeId, SnakePit, SnakePitId
+from server.pit_manager import SnakePitManager
+from server.timing_wheel import TimingWheel
+
+# resolution of the TTLs, they are all in the seconds to minutes range
+TICK = 1.0
+
+
+class Reaper:
+    """Expires pits and snakes that outlived their TTL, 0 disables a TTL.
+
+    - empty pits, whether nobody ever joined them or they were left behind,
+      after `empty_pit_ttl`
+    - pits without a join, leave or signaling message for `pit_idle_ttl`
+    - snakes outside of any pit without activity for `snake_idle_ttl`
+    - sessions held after a disconnect, see `SnakePitManager.resume_grace`
+
+    Only watched pits and snakes are in the wheel, and activity only updates
+    their `last_active`: an entry coming due is checked against it and
+    scheduled again if it moved, so there is no per message wheel work and
+    never a scan of the world.
+    """
+
+    def __init__(
+        self,
+        pit_manager: SnakePitManager,
+        empty_pit_ttl: float = 0,
+        pit_idle_ttl: float = 0,
+        snake_idle_ttl: float = 0,
+        now: float | None = None,
+    ):
+        self.pit_manager = pit_manager
+        self.empty_pit_ttl = empty_pit_ttl
+        self.pit_idle_ttl = pit_idle_ttl
+        self.snake_idle_ttl = snake_idle_ttl
+        self.wheel = TimingWheel(TICK, time.monotonic() if now is None else now)
+        # earliest deadline of each key in the wheel, so watching twice
+        # schedules once unless the deadline moved closer
+        self.scheduled: dict[tuple[str, SnakePitId | SnakeId], float] = {}
+
+    def watch_pit(self, pit: SnakePit) -> None:
+        deadline = self._pit_deadline(pit)
+        if deadline is not None:
+            self._schedule(("pit", pit.id), deadline)
+
+    def watch_snake(self, snake: Snake) -> None:
+        if self.snake_idle_ttl and snake.pit is None:
+            self._schedule(("snake", snake.id), snake.last_active + self.snake_idle_ttl)
+
+    def watch_session(self, resume_token: str, deadline: float) -> None:
+        self._schedule(("session", resume_token), deadline)
+
+    def expire_due(self, now: float | None = None) -> None:
+        """Called from the housekeeping task."""
+        now = time.monotonic() if now is None else now
+        for key in self.wheel.advance(now):
+            self.scheduled.pop(key, None)
+            kind, id = key
+            if kind == "pit":
+                self._check_pit(id, now)
+            elif kind == "snake":
+                self._check_snake(id, now)
+            else:
+                self.pit_manager.expire_session(id)
+
+    def _check_pit(self, pit_id: SnakePitId, now: float) -> None:
+        pit = self.pit_manager.world.get_pit(pit_id)
+        if pit is None:
+            return
+
+        deadline = self._pit_deadline(pit)
+        if deadline is None:
+            # occupied without an idle TTL, it is deleted once the last one leaves
+            return
+        if deadline > now:
+            self._schedule(("pit", pit_id), deadline)
+            return
+
+        self.pit_manager.expire_pit(pit)
+
+    def _check_snake(self, snake_id: SnakeId, now: float) -> None:
+        snake_state = self.pit_manager.world.get_snake_state(snake_id)
+        if snake_state is None:
+            return
+
+        snake, maybe_pit = snake_state
+        if maybe_pit is not None:
+            # watched again when it leaves
+            return
+
+        deadline = snake.last_active + self.snake_idle_ttl
+        if deadline > now:
+            self._schedule(("snake", snake_id), deadline)
+            return
+
+        self.pit_manager.expire_snake(snake)
+
+    def _pit_deadline(self, pit: SnakePit) -> float | None:
+        if self.pit_manager.world.pit_size(pit) == 0:
+            ttl = self.empty_pit_ttl
+        else:
+            ttl = self.pit_idle_ttl
+        return pit.last_active + ttl if ttl else None
+
+    def _schedule(self, key: tuple[str, SnakePitId | SnakeId], deadline: float):
+        # an earlier deadline, e.g. a pit that just emptied, gets an entry of
+        # its own, the later one is checked as usual when it comes due
+        scheduled = self.scheduled.get(key)
+        if scheduled is None or deadline < scheduled:
+            self.scheduled[key] = deadline
+            self.wheel.schedule(key, deadline)
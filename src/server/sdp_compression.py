@@ -0,0 +1,115 @@
+import zlib
+
+# capability a client announces at connect to send and receive deflated SDPs
+SDP_DEFLATE_CAPABILITY = "sdp_deflate"
+# largest SDP a deflated one may inflate to, same as the send_offer limit
+MAX_INFLATED_SDP = 64 * 1024
+
+# preset dictionary for deflating SDPs, lines browsers put in every offer and
+# answer. Deflate reaches further back for matches near the end, so the most
+# repeated lines come last. Clients fetch it from GET /sdp-dictionary, and a
+# deflated SDP's zlib header carries its Adler-32 (DICTIONARY_ID).
+SDP_DICTIONARY = "\r\n".join(
+    [
+        "a=extmap:9 urn:ietf:params:rtp-hdrext:sdes:rtp-stream-id",
+        "a=extmap:10 urn:ietf:params:rtp-hdrext:sdes:repaired-rtp-stream-id",
+        "a=extmap:13 urn:3gpp:video-orientation",
+        "a=extmap:14 urn:ietf:params:rtp-hdrext:toffset",
+        "a=extmap:12 http://www.webrtc.org/experiments/rtp-hdrext/playout-delay",
+        "a=extmap:11 http://www.webrtc.org/experiments/rtp-hdrext/video-content-type",
+        "a=extmap:7 http://www.webrtc.org/experiments/rtp-hdrext/video-timing",
+        "a=extmap:8 http://www.webrtc.org/experiments/rtp-hdrext/color-space",
+        "a=rtpmap:96 VP8/90000",
+        "a=rtpmap:97 rtx/90000",
+        "a=rtpmap:98 VP9/90000",
+        "a=rtpmap:102 H264/90000",
+        "a=rtpmap:45 AV1/90000",
+        "a=rtcp-fb:96 goog-remb",
+        "a=rtcp-fb:96 ccm fir",
+        "a=rtcp-fb:96 nack",
+        "a=rtcp-fb:96 nack pli",
+        "a=fmtp:97 apt=96",
+        "a=fmtp:102 level-asymmetry-allowed=1;packetization-mode=1;"
+        "profile-level-id=42001f",
+        "a=rtpmap:63 red/48000/2",
+        "a=rtpmap:9 G722/8000",
+        "a=rtpmap:0 PCMU/8000",
+        "a=rtpmap:8 PCMA/8000",
+        "a=rtpmap:13 CN/8000",
+        "a=rtpmap:110 telephone-event/48000",
+        "a=rtpmap:126 telephone-event/8000",
+        "a=fmtp:63 111/111",
+        "a=ssrc-group:FID ",
+        "a=rtcp-rsize",
+        "a=rtcp-mux",
+        "a=extmap:1 urn:ietf:params:rtp-hdrext:ssrc-audio-level",
+        "a=extmap:2 http://www.webrtc.org/experiments/rtp-hdrext/abs-send-time",
+        "a=extmap:3 http://www.ietf.org/id/"
+        "draft-holmer-rmcat-transport-wide-cc-extensions-01",
+        "a=extmap:4 urn:ietf:params:rtp-hdrext:sdes:mid",
+        "a=rtpmap:111 opus/48000/2",
+        "a=rtcp-fb:111 transport-cc",
+        "a=fmtp:111 minptime=10;useinbandfec=1",
+        "m=video 9 UDP/TLS/RTP/SAVPF 96 97 98 99 100 101 102 45",
+        "m=audio 9 UDP/TLS/RTP/SAVPF 111 63 9 0 8 13 110 126",
+        "m=application 9 UDP/DTLS/SCTP webrtc-datachannel",
+        "a=sctp-port:5000",
+        "a=max-message-size:262144",
+        "v=0",
+        "o=- ",
+        " 2 IN IP4 127.0.0.1",
+        "s=-",
+        "t=0 0",
+        "a=group:BUNDLE 0 1",
+        "a=extmap-allow-mixed",
+        "a=msid-semantic: WMS",
+        "a=candidate:",
+        " 1 udp 2122260223 ",
+        " typ host generation 0 network-id 1",
+        "a=setup:actpass",
+        "a=setup:active",
+        "a=sendrecv",
+        "a=recvonly",
+        "a=msid:",
+        "a=ssrc:",
+        " cname:",
+        "a=ice-options:trickle",
+        "a=fingerprint:sha-256 ",
+        "a=ice-ufrag:",
+        "a=ice-pwd:",
+        "c=IN IP4 0.0.0.0",
+        "a=rtcp:9 IN IP4 0.0.0.0",
+        "a=mid:",
+        "",
+    ]
+).encode()
+DICTIONARY_ID = zlib.adler32(SDP_DICTIONARY)
+
+
+def deflate_sdp(sdp: str) -> bytes:
+    compressor = zlib.compressobj(zdict=SDP_DICTIONARY)
+    return compressor.compress(sdp.encode()) + compressor.flush()
+
+
+def inflate_sdp(deflated: bytes) -> str:
+    decompressor = zlib.decompressobj(zdict=SDP_DICTIONARY)
+    try:
+        sdp = decompressor.decompress(deflated, MAX_INFLATED_SDP)
+    except zlib.error:
+        raise ValueError("Invalid deflated SDP")
+    # a truncated stream, or one inflating past the limit
+    if not decompressor.eof:
+        raise ValueError("Invalid deflated SDP")
+
+    return sdp.decode()
+
+
+def inflate_description(description: dict) -> dict:
+    """The same session description with its `sdp_deflate` inflated to `sdp`."""
+    inflated = {k: v for k, v in description.items() if k != "sdp_deflate"}
+    inflated["sdp"] = inflate_sdp(description["sdp_deflate"])
+    return inflated
+
+
+def is_deflated(description) -> bool:
+    return isinstance(description, dict) and "sdp_deflate" in description
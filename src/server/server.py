@@ -1,130 +1,382 @@
 import uuid
 import argparse
-from flask import Flask, Request, request
+import json
+import functools
+import signal
+import time
+import eventlet
+import eventlet.wsgi
+from flask import Flask, Request, Response, request
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
-
-from server.model import SnakePit, World
-from server.model.snake import SnakeId
+from flask_socketio import ConnectionRefusedError, SocketIO, emit
+
+from server.admission import AdmissionControl, parse_rate_limits
+from server.capture import CaptureWriter
+from server.config import ServerConfig
+from server.emitter import PriorityEmitter, SocketIOEmitter
+from server.ice_batcher import IceCandidateBatcher
+from server.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, instrumented, watch_world
+from server.model import create_world
+from server.negotiation_trace import NegotiationTracer
+from server.packets import (
+    PAYLOAD_REJECTED_EVENT,
+    RAW_SIGNALING_EVENTS,
+    parse_payload_limits,
+    signaling_packet_class,
+)
 from server.pit_manager import SnakePitManager
+from server.reaper import Reaper
+from server.sdp_compression import SDP_DICTIONARY
+from server.sharding import WorkerShard
+from server.snapshot import WorldSnapshot, snapshot_path_for, write_snapshot
+from server.validation import (
+    parse_capabilities,
+    parse_ice_candidate,
+    parse_pit_id,
+    parse_resume_token,
+    parse_session_description,
+    parse_snake_id,
+)
 from server.webrtc_manager import WebRtcManager
 from server.logger import get_logger
 
 _logger = get_logger(__name__)
+config = ServerConfig.from_env()
+if (
+    config.message_queue is not None or config.world_store is not None
+) and not eventlet.patcher.is_monkey_patched("socket"):
+    # the Redis clients would block the hub, or refuse to start at all
+    raise ValueError(
+        "SSS_MESSAGE_QUEUE and SSS_WORLD_STORE need a monkey patched eventlet, "
+        "start the server with `serve` or `python -m server.cli`"
+    )
 app = Flask(__name__)
 CORS(app, resources=r"/*", origins="*")
-socketio = SocketIO(app, cors_allowed_origins="*")
+payload_limits = parse_payload_limits(config.payload_limits)
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    message_queue=config.message_queue,
+    serializer=signaling_packet_class(
+        payload_limits,
+        RAW_SIGNALING_EVENTS if config.raw_signaling else (),
+        config.serializer,
+    ),
+    # room for a polling request batching a few packets
+    max_http_buffer_size=2 * max(payload_limits.values()),
+)
 
 SocketId = str
-world = World()
-pit_manager = SnakePitManager(world)
-web_rtc_manager = WebRtcManager(world)
+world = create_world(config.world_store)
+emitter = SocketIOEmitter(socketio)
+outbound_lanes = None
+if config.outbound_lanes:
+    emitter = outbound_lanes = PriorityEmitter(emitter, config.outbound_lane_depth)
+pit_manager = SnakePitManager(
+    world,
+    emitter,
+    name_scope=config.name_scope,
+    quick_join_pit_size=config.quick_join_pit_size,
+    max_pit_size=config.max_pit_size,
+    pit_overflow=config.pit_overflow,
+    resume_grace=config.resume_grace,
+)
+pit_manager.reaper = Reaper(
+    pit_manager,
+    empty_pit_ttl=config.empty_pit_ttl,
+    pit_idle_ttl=config.pit_idle_ttl,
+    snake_idle_ttl=config.snake_idle_ttl,
+)
+admission = AdmissionControl(
+    emitter, parse_rate_limits(config.rate_limits), config.max_loop_lag
+)
+if config.negotiation_tracing:
+    pit_manager.tracer = NegotiationTracer()
+web_rtc_manager = WebRtcManager(
+    world,
+    emitter,
+    IceCandidateBatcher(config.ice_batch_window)
+    if config.ice_batch_window > 0
+    else None,
+    enforce_mesh_plan=config.enforce_mesh_plan,
+    tracer=pit_manager.tracer,
+)
 
 # hardcode a pit for testing
-pit = SnakePit(uuid.UUID("697d8c94-cee3-4a99-a3b6-b7cced7927fc"))
-world.pits[pit.id] = pit
+world.create_pit(uuid.UUID("697d8c94-cee3-4a99-a3b6-b7cced7927fc"))
+watch_world(world)
+# inbound events are written here when SSS_CAPTURE_PATH is set, see main
+capture: CaptureWriter | None = None
 
 
 def get_connection_id(request: Request) -> SocketId:
     return request.sid  # type: ignore
 
 
-def parse_pit_id(pit_id: str) -> uuid.UUID:
-    try:
-        return uuid.UUID(pit_id)
-    except ValueError:
-        raise ValueError("Invalid pit ID")
+def admitted(event: str):
+    """Drop the event before the handler runs if admission control refuses it."""
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args):
+            if admission.admit(get_connection_id(request), event):
+                return handler(*args)
+
+        return wrapper
+
+    return decorator
+
+
+def captured(event: str):
+    """Append the event to the capture log, when there is one."""
 
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args):
+            if capture is not None:
+                capture.record(event, get_connection_id(request), args)
+            return handler(*args)
 
-def parse_snake_id(snake_id: str) -> SnakeId:
-    # socket.io sids are alphanumeric outside of - and _ characters
-    if (
-        not snake_id
-        or not snake_id.replace("-", "").replace("_", "").isalnum()
-    ):
-        raise ValueError("Invalid snake ID")
+        return wrapper
 
-    return SnakeId(snake_id)
+    return decorator
+
+
+@app.route("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.route("/sdp-dictionary")
+def sdp_dictionary():
+    return Response(SDP_DICTIONARY, content_type="application/octet-stream")
+
+
+@app.route("/negotiations")
+def negotiations():
+    if pit_manager.tracer is None:
+        return Response("Negotiation tracing is off", status=404)
+    return Response(
+        json.dumps(pit_manager.tracer.summary()), content_type="application/json"
+    )
 
 
 @socketio.on_error()
 def error_handler(e):
-    _logger.error(f"Socket.IO error occurred: {str(e)}")
+    _logger.error("Socket.IO error occurred: %s", e, extra={"event": "error"})
     emit("error", {"message": str(e)})
 
 
+def run_housekeeping(snapshot_path: str | None = None):
+    next_snapshot = time.monotonic() + config.snapshot_interval
+    while True:
+        slept_at = time.monotonic()
+        socketio.sleep(config.housekeeping_interval)
+        # oversleeping is time the loop spent on other greenlets
+        admission.loop_lag.record(
+            time.monotonic() - slept_at - config.housekeeping_interval
+        )
+        web_rtc_manager.flush_ice_candidates()
+        pit_manager.reaper.expire_due()
+        pit_manager.check_nodes()
+        if outbound_lanes is not None:
+            outbound_lanes.flush()
+        if capture is not None:
+            capture.flush()
+        # the snapshot taken before draining is the one to hand over
+        if snapshot_path and config.snapshot_interval > 0 and not pit_manager.draining:
+            if time.monotonic() >= next_snapshot:
+                save_snapshot(snapshot_path)
+                next_snapshot = time.monotonic() + config.snapshot_interval
+
+
+def save_snapshot(snapshot_path: str):
+    sessions = write_snapshot(world, snapshot_path)
+    _logger.info(
+        "Wrote snapshot with %d sessions to %s",
+        sessions,
+        snapshot_path,
+        extra={"event": "snapshot_written"},
+    )
+
+
+def load_snapshot(snapshot_path: str):
+    snapshot = WorldSnapshot.open(snapshot_path)
+    if snapshot is not None:
+        pit_manager.load_snapshot(snapshot)
+
+
 @socketio.on("connect")
-def on_connect():
-    pit_manager.handle_connect(get_connection_id(request))
+@captured("connect")
+@instrumented("connect")
+def on_connect(auth=None):
+    retry_after = admission.connect_retry_after()
+    if retry_after is not None:
+        raise ConnectionRefusedError(
+            {"message": "Server overloaded", "retry_after": retry_after}
+        )
+
+    return pit_manager.handle_connect(
+        get_connection_id(request),
+        parse_capabilities(auth),
+        parse_resume_token(auth),
+    )
 
 
 @socketio.on("disconnect")
+@captured("disconnect")
+@instrumented("disconnect")
 def on_disconnect(reason):
-    _logger.info(f"Peer disconnected with reason: {reason}")
+    _logger.info(
+        "Peer disconnected with reason: %s", reason, extra={"event": "disconnect"}
+    )
+    admission.forget(get_connection_id(request))
     pit_manager.handle_disconnect(get_connection_id(request))
 
 
 @socketio.on("create_snake_pit")
+@admitted("create_snake_pit")
+@captured("create_snake_pit")
+@instrumented("create_snake_pit")
 def on_create_pit(pit_id):
     pit_id = parse_pit_id(pit_id)
-    pit_manager.handle_create_pit(pit_id)
+    pit_manager.handle_create_pit(get_connection_id(request), pit_id)
 
 
 @socketio.on("join_snake_pit")
+@admitted("join_snake_pit")
+@captured("join_snake_pit")
+@instrumented("join_snake_pit")
 def on_join_pit(pit_id):
     pit_id = parse_pit_id(pit_id)
     pit_manager.handle_join_pit(get_connection_id(request), pit_id)
 
 
+@socketio.on("quick_join")
+@admitted("quick_join")
+@captured("quick_join")
+@instrumented("quick_join")
+def on_quick_join():
+    pit_manager.handle_quick_join(get_connection_id(request))
+
+
 @socketio.on("leave_snake_pit")
+@admitted("leave_snake_pit")
+@captured("leave_snake_pit")
+@instrumented("leave_snake_pit")
 def on_leave_pit():
     pit_manager.handle_leave_pit(get_connection_id(request))
 
 
 @socketio.on("send_offer")
+@admitted("send_offer")
+@captured("send_offer")
+@instrumented("send_offer")
 def on_send_offer(to_peer_id, offer):
     from_peer_id = get_connection_id(request)
     to_peer_id = parse_snake_id(to_peer_id)
+    offer = parse_session_description(offer, "offer")
     web_rtc_manager.send_offer(from_peer_id, to_peer_id, offer)
 
 
 @socketio.on("send_answer")
+@admitted("send_answer")
+@captured("send_answer")
+@instrumented("send_answer")
 def on_send_answer(to_peer_id, answer):
     from_peer_id = get_connection_id(request)
     to_peer_id = parse_snake_id(to_peer_id)
+    answer = parse_session_description(answer, "answer", "pranswer")
     web_rtc_manager.send_answer(from_peer_id, to_peer_id, answer)
 
 
 @socketio.on("send_ice_candidate")
+@admitted("send_ice_candidate")
+@captured("send_ice_candidate")
+@instrumented("send_ice_candidate")
 def on_send_ice_candidate(to_peer_id, ice_candidate):
     from_peer_id = get_connection_id(request)
     to_peer_id = parse_snake_id(to_peer_id)
+    ice_candidate = parse_ice_candidate(ice_candidate)
     web_rtc_manager.send_ice_candidate(from_peer_id, to_peer_id, ice_candidate)
 
 
-def print_server_init_header():
-    print(
-        """
- _____  _____  _____  _____                               
-/  ___|/  ___|/  ___|/  ___|                              
-\\ `--. \\ `--. \\ `--. \\ `--.   ___  _ __ __   __ ___  _ __ 
- `--. \\ `--. \\ `--. \\ `--. \\ / _ \\| '__|\\ \\ / // _ \\| '__|
-/\\__/ //\\__/ //\\__/ //\\__/ /|  __/| |    \\ V /|  __/| |   
-\\____/ \\____/ \\____/ \\____/  \\___||_|     \\_/  \\___||_|   
-Initializing server...
-"""
-    )
-    _logger.info(f"Server initialized with world state: {str(world)}")
-
-
-def main(debug=False, host="0.0.0.0", port=5678):
-    print_server_init_header()
-    socketio.run(app, debug=debug, host=host, port=port)
-
-
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--debug", action="store_true", help="Enable debug mode")
-    args = parser.parse_args()
+@socketio.on("peer_connected")
+@admitted("peer_connected")
+@captured("peer_connected")
+@instrumented("peer_connected")
+def on_peer_connected(to_peer_id):
+    from_peer_id = get_connection_id(request)
+    web_rtc_manager.peer_connected(from_peer_id, parse_snake_id(to_peer_id))
+
+
+@socketio.on(PAYLOAD_REJECTED_EVENT)
+def on_payload_rejected(event):
+    emit("error", {"message": f"Payload too large for {event}"})
+
+
+def run(args: argparse.Namespace):
+    """Serve with the arguments of server.cli, which has monkey patched already."""
+    global capture
+    shard = None
+    if args.worker_index is not None:
+        shard = WorkerShard(args.worker_index, args.workers)
+    _logger.info("Server initialized", extra=world.summary())
+
+    pit_manager.shard = shard
+    snapshot_path = None
+    if config.snapshot_path is not None and config.world_store is None:
+        # a SharedWorld already outlives the process
+        snapshot_path = snapshot_path_for(config.snapshot_path, shard)
+        load_snapshot(snapshot_path)
+    if config.capture_path is not None:
+        capture = CaptureWriter(
+            snapshot_path_for(config.capture_path, shard), config.capture_bodies
+        )
+
+    socketio.start_background_task(run_housekeeping, snapshot_path)
+    try:
+        serve_until_drained(args.host, args.port, args.debug, snapshot_path)
+    finally:
+        # stopped without draining, e.g. SIGINT, with sessions left to hand over
+        if (
+            snapshot_path is not None
+            and not pit_manager.draining
+            and world.summary()["snakes"] > 0
+        ):
+            save_snapshot(snapshot_path)
+        if capture is not None:
+            capture.close()
+
+
+def serve_until_drained(
+    host: str, port: int, debug: bool = False, snapshot_path: str | None = None
+):
+    """Serve until SIGTERM, then drain until the pits empty out.
+
+    The port is bound with SO_REUSEPORT, so the next process can listen
+    alongside this one. On SIGTERM this process closes its listener, leaving
+    new connections to the next one, writes the snapshot the next one loads
+    on startup, and keeps relaying for the pits it has until they are empty
+    or `SSS_DRAIN_TIMEOUT_SECONDS` pass. SIGINT stops it right away.
+    """
+    app.debug = debug
+    listener = eventlet.listen((host, port), reuse_port=True)
+    server = eventlet.spawn(eventlet.wsgi.server, listener, app, log_output=debug)
+
+    signals = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: signals.append(signum))
+    while not signals:
+        socketio.sleep(0.1)
+
+    # the server stops accepting but keeps serving its open connections
+    server.kill(SystemExit)
+    listener.close()
+    # draining drops every session, so they are written out first
+    if snapshot_path is not None:
+        save_snapshot(snapshot_path)
+    pit_manager.start_draining(config.drain_timeout)
+    while not pit_manager.drained():
+        socketio.sleep(0.1)
+    _logger.info("Drained", extra={"event": "drain", **world.summary()})
 
-    main(args.debug)
@@ -0,0 +1,189 @@
+import asyncio
+import signal
+import subprocess
+import sys
+import uuid
+import zlib
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+from urllib.parse import parse_qs, urlsplit
+
+from server.model import SnakePitId
+from server.logger import get_logger
+
+_logger = get_logger(__name__)
+
+# upper bound on the request head we buffer before picking a worker
+MAX_REQUEST_HEAD_BYTES = 16 * 1024
+PIPE_CHUNK_BYTES = 64 * 1024
+
+
+def shard_for_pit(pit_id: SnakePitId, workers: int) -> int:
+    # crc32 rather than hash() so every process agrees on the owner
+    return zlib.crc32(pit_id.bytes) % workers
+
+
+def shard_for_address(address: str, workers: int) -> int:
+    return zlib.crc32(address.encode()) % workers
+
+
+@dataclass(frozen=True)
+class WorkerShard:
+    index: int
+    workers: int
+
+    def owns(self, pit_id: SnakePitId) -> bool:
+        return shard_for_pit(pit_id, self.workers) == self.index
+
+
+def pick_worker(request_head: bytes, client_address: str, workers: int) -> int:
+    """Pick the worker for a connection from its first HTTP request.
+
+    Clients pass `pit_id` in the socket.io connection query so they land on
+    the worker owning their pit. Without it, the client address is hashed so
+    every polling request of one session still reaches the same worker.
+    """
+    request_line = request_head.split(b"\r\n", 1)[0].decode("latin-1")
+    parts = request_line.split(" ")
+    if len(parts) == 3:
+        query = parse_qs(urlsplit(parts[1]).query)
+        for raw_pit_id in query.get("pit_id", []):
+            try:
+                return shard_for_pit(uuid.UUID(raw_pit_id), workers)
+            except ValueError:
+                break
+
+    return shard_for_address(client_address, workers)
+
+
+class PitRouter:
+    """TCP front door pinning each connection to the worker owning its pit.
+
+    The router only reads the request head, every byte after that is piped
+    untouched, so websocket upgrades work as-is.
+    """
+
+    def __init__(self, worker_addresses: list[tuple[str, int]]):
+        self.worker_addresses = worker_addresses
+
+    async def serve(
+        self,
+        host: str,
+        port: int,
+        drain: Callable[[], Awaitable[None]] | None = None,
+    ):
+        """Route until SIGTERM, then close the listener and await `drain()`.
+
+        Connections already piped to a worker stay open meanwhile, and the
+        port is bound with SO_REUSEPORT so the next router can take over.
+        """
+        server = await asyncio.start_server(
+            self._handle_client, host, port, reuse_port=True
+        )
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+
+        await stop.wait()
+        server.close()
+        if drain is not None:
+            await drain()
+
+    async def _handle_client(
+        self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter
+    ):
+        try:
+            request_head = await client_reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            client_writer.close()
+            return
+
+        if len(request_head) > MAX_REQUEST_HEAD_BYTES:
+            client_writer.close()
+            return
+
+        client_address = client_writer.get_extra_info("peername")[0]
+        worker = pick_worker(request_head, client_address, len(self.worker_addresses))
+
+        try:
+            worker_reader, worker_writer = await asyncio.open_connection(
+                *self.worker_addresses[worker]
+            )
+        except OSError as e:
+            _logger.error(
+                "Worker %d unreachable: %s",
+                worker,
+                e,
+                extra={"event": "worker_unreachable"},
+            )
+            client_writer.close()
+            return
+
+        worker_writer.write(request_head)
+        await asyncio.gather(
+            self._pipe(client_reader, worker_writer),
+            self._pipe(worker_reader, client_writer),
+        )
+
+    async def _pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while chunk := await reader.read(PIPE_CHUNK_BYTES):
+                writer.write(chunk)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def run_workers(
+    workers: int, host: str, port: int, debug: bool = False, runtime: str = "eventlet"
+):
+    """Run `workers` server processes on loopback ports behind a PitRouter."""
+    worker_addresses = [("127.0.0.1", port + 1 + index) for index in range(workers)]
+    processes = []
+
+    for index, (worker_host, worker_port) in enumerate(worker_addresses):
+        command = [
+            sys.executable,
+            "-m",
+            "server.cli",
+            "--host",
+            worker_host,
+            "--port",
+            str(worker_port),
+            "--workers",
+            str(workers),
+            "--worker-index",
+            str(index),
+            "--runtime",
+            runtime,
+        ]
+        if debug:
+            command.append("--debug")
+        processes.append(subprocess.Popen(command))
+
+    async def drain_workers():
+        # each worker drains its own pits, see server.serve_until_drained
+        for process in processes:
+            process.send_signal(signal.SIGTERM)
+        await asyncio.gather(
+            *(asyncio.to_thread(process.wait) for process in processes)
+        )
+
+    _logger.info(
+        "Routing %s:%d to %d workers",
+        host,
+        port,
+        workers,
+        extra={"event": "router_started"},
+    )
+    try:
+        asyncio.run(PitRouter(worker_addresses).serve(host, port, drain_workers))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # drained workers are gone already, the rest stop without draining
+        for process in processes:
+            process.send_signal(signal.SIGINT)
+        for process in processes:
+            process.wait()
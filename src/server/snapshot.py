@@ -0,0 +1,144 @@
+import base64
+import binascii
+import mmap
+import os
+import struct
+import uuid
+from typing import NamedTuple
+
+from server.model import SnakeId, SnakePitId, World
+from server.sharding import WorkerShard
+
+# magic, version, pit count, session count
+HEADER = struct.Struct("<4sHxxII")
+MAGIC = b"SSSW"
+VERSION = 1
+PIT = struct.Struct("<16s")
+# resume token, snake id, pit number in the pit table, name index
+SESSION = struct.Struct("<16s24sII")
+NO_NAME = 0xFFFFFFFF
+
+
+class SnapshotSession(NamedTuple):
+    old_snake_id: SnakeId
+    pit_id: SnakePitId
+    name_index: int | None
+
+
+def _token_bytes(resume_token: str) -> bytes | None:
+    # tokens are secrets.token_urlsafe(16), i.e. 16 random bytes
+    try:
+        raw = base64.urlsafe_b64decode(resume_token + "==")
+    except (binascii.Error, ValueError):
+        return None
+    return raw if len(raw) == 16 else None
+
+
+def snapshot_path_for(path: str, shard: WorkerShard | None) -> str:
+    # every worker owns different pits, so each keeps its own file
+    return path if shard is None else f"{path}.{shard.index}"
+
+
+def write_snapshot(world: World, path: str) -> int:
+    """Write every pit, and every member with a resume token, to `path`.
+
+    Pits and sessions are fixed size records sorted by pit id and token, so
+    `WorldSnapshot` looks them up with a binary search over the mapped file
+    instead of parsing it. Returns the number of sessions written.
+    """
+    pit_ids = sorted(pit_id.bytes for pit_id in world.pits)
+    pit_numbers = {pit_id: number for number, pit_id in enumerate(pit_ids)}
+
+    sessions = []
+    for pit in world.each_pit():
+        pit_number = pit_numbers[pit.id.bytes]
+        for snake in pit:
+            token = snake.resume_token and _token_bytes(snake.resume_token)
+            snake_id = snake.id.encode()
+            if not token or len(snake_id) > 24:
+                continue
+            name_index = snake.name_index
+            sessions.append(
+                SESSION.pack(
+                    token,
+                    snake_id,
+                    pit_number,
+                    NO_NAME if name_index is None else name_index,
+                )
+            )
+    sessions.sort()
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as snapshot:
+        snapshot.write(HEADER.pack(MAGIC, VERSION, len(pit_ids), len(sessions)))
+        snapshot.write(b"".join(pit_ids))
+        snapshot.write(b"".join(sessions))
+    os.replace(temporary_path, path)
+    return len(sessions)
+
+
+class WorldSnapshot:
+    """Read side of `write_snapshot`, opening it costs the same at any size."""
+
+    def __init__(self, data: mmap.mmap):
+        self.data = data
+        magic, version, self.pit_count, self.session_count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a world snapshot")
+
+        self.pits_offset = HEADER.size
+        self.sessions_offset = self.pits_offset + self.pit_count * PIT.size
+
+    @classmethod
+    def open(cls, path: str) -> "WorldSnapshot | None":
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+            return None
+
+        with open(path, "rb") as snapshot:
+            return cls(mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def has_pit(self, pit_id: SnakePitId) -> bool:
+        number = self._search(pit_id.bytes, self.pits_offset, PIT.size, self.pit_count)
+        return number is not None
+
+    def find_session(self, resume_token: str) -> SnapshotSession | None:
+        token = _token_bytes(resume_token)
+        if token is None:
+            return None
+
+        number = self._search(
+            token, self.sessions_offset, SESSION.size, self.session_count
+        )
+        if number is None:
+            return None
+
+        _, snake_id, pit_number, name_index = SESSION.unpack_from(
+            self.data, self.sessions_offset + number * SESSION.size
+        )
+        pit_offset = self.pits_offset + pit_number * PIT.size
+        return SnapshotSession(
+            snake_id.rstrip(b"\0").decode(),
+            uuid.UUID(bytes=self.data[pit_offset : pit_offset + PIT.size]),
+            None if name_index == NO_NAME else name_index,
+        )
+
+    def close(self) -> None:
+        self.data.close()
+
+    def __len__(self):
+        return self.session_count
+
+    def _search(self, key: bytes, offset: int, size: int, count: int) -> int | None:
+        # records start with their 16 byte key
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            start = offset + middle * size
+            if self.data[start : start + 16] < key:
+                low = middle + 1
+            else:
+                high = middle
+        start = offset + low * size
+        if low < count and self.data[start : start + 16] == key:
+            return low
+        return None
@@ -0,0 +1,90 @@
+import math
+from typing import Any
+
+
+class TimingWheel:
+    """Hierarchical timing wheel with `levels` wheels of `slots` slots each.
+
+    Level 0 slots are one `tick` wide, each level up is `slots` times
+    coarser. An entry sits in the lowest level whose current rotation
+    contains its deadline, and moves down a level when that slot comes up,
+    so scheduling is O(1) and every entry is touched at most `levels` times
+    before it expires. Deadlines past the last rotation of the top level
+    wait there and are placed again when it comes around.
+
+    Entries cannot be cancelled: callers check whether an expired entry
+    still applies, and schedule it again if its deadline moved.
+    """
+
+    def __init__(self, tick: float, now: float, slots: int = 64, levels: int = 4):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        # ticks covered by one slot of each level, and by a whole level
+        self.slot_spans = [slots**level for level in range(levels)]
+        self.wheel_spans = [slots ** (level + 1) for level in range(levels)]
+        self.wheels: list[list[list[tuple[int, Any]]]] = [
+            [[] for _ in range(slots)] for _ in range(levels)
+        ]
+        self.current = int(now // tick)
+        self.size = 0
+
+    def schedule(self, item: Any, deadline: float) -> None:
+        due = max(math.ceil(deadline / self.tick), self.current + 1)
+        self._place(due, item)
+        self.size += 1
+
+    def advance(self, now: float) -> list[Any]:
+        """Move the wheel to `now`, returns the items whose deadline passed."""
+        target = int(now // self.tick)
+        if self.size == 0:
+            self.current = max(self.current, target)
+            return []
+
+        expired = []
+        while self.current < target and self.size > len(expired):
+            self.current += 1
+
+            # bring down the slots starting at this tick, coarsest first
+            top = 0
+            while (
+                top + 1 < self.levels and self.current % self.slot_spans[top + 1] == 0
+            ):
+                top += 1
+            for level in range(top, 0, -1):
+                index = (self.current // self.slot_spans[level]) % self.slots
+                entries = self.wheels[level][index]
+                self.wheels[level][index] = []
+                for due, item in entries:
+                    self._place(due, item)
+
+            index = self.current % self.slots
+            entries = self.wheels[0][index]
+            self.wheels[0][index] = []
+            for due, item in entries:
+                if due <= self.current:
+                    expired.append(item)
+                else:
+                    self._place(due, item)
+
+        self.current = max(self.current, target)
+        self.size -= len(expired)
+        return expired
+
+    def _place(self, due: int, item: Any) -> None:
+        for level in range(self.levels - 1):
+            if (
+                due // self.wheel_spans[level]
+                == self.current // self.wheel_spans[level]
+            ):
+                index = (due // self.slot_spans[level]) % self.slots
+                self.wheels[level][index].append((due, item))
+                return
+
+        # the top level wraps, park far deadlines in its last slot ahead
+        span = self.slot_spans[-1]
+        slot = min(due // span, self.current // span + self.slots - 1)
+        self.wheels[-1][slot % self.slots].append((due, item))
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,92 @@
+import functools
+import re
+import uuid
+
+from server.model import SnakeId, SnakePitId
+from server.packets import RawJson
+
+# socket.io sids are alphanumeric outside of - and _ characters
+SNAKE_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+# candidate lines are a couple hundred characters at most
+MAX_CANDIDATE_LENGTH = 1024
+
+# ids repeat for every message between two peers, so validated ones are kept
+VALIDATED_ID_CACHE_SIZE = 4096
+
+
+def parse_pit_id(pit_id: str) -> SnakePitId:
+    if not isinstance(pit_id, str):
+        raise ValueError("Invalid pit ID")
+    return _parse_pit_id(pit_id)
+
+
+@functools.lru_cache(maxsize=VALIDATED_ID_CACHE_SIZE)
+def _parse_pit_id(pit_id: str) -> SnakePitId:
+    try:
+        return uuid.UUID(pit_id)
+    except ValueError:
+        raise ValueError("Invalid pit ID")
+
+
+def parse_snake_id(snake_id: str) -> SnakeId:
+    if not isinstance(snake_id, str):
+        raise ValueError("Invalid snake ID")
+    return _parse_snake_id(snake_id)
+
+
+@functools.lru_cache(maxsize=VALIDATED_ID_CACHE_SIZE)
+def _parse_snake_id(snake_id: str) -> SnakeId:
+    # failures raise, so only valid ids are cached
+    if SNAKE_ID.fullmatch(snake_id) is None:
+        raise ValueError("Invalid snake ID")
+
+    return SnakeId(snake_id)
+
+
+def parse_session_description(description, *types: str):
+    # {"type": "offer", "sdp": "v=0..."}, as RTCSessionDescription.toJSON(),
+    # or with the SDP deflated in "sdp_deflate", see server.sdp_compression
+    value = description.value if isinstance(description, RawJson) else description
+    if not isinstance(value, dict) or value.get("type") not in types:
+        raise ValueError(f"Expected a session description of type {types[0]}")
+    if not isinstance(value.get("sdp", ""), str):
+        raise ValueError("Invalid SDP")
+    if not isinstance(value.get("sdp_deflate", b""), bytes):
+        raise ValueError("Invalid SDP")
+
+    return description
+
+
+def parse_ice_candidate(ice_candidate):
+    # RTCIceCandidate.toJSON(), or null for the end of candidates
+    if ice_candidate is None:
+        return None
+    if not isinstance(ice_candidate, dict):
+        raise ValueError("Invalid ICE candidate")
+
+    candidate = ice_candidate.get("candidate", "")
+    if not isinstance(candidate, str) or len(candidate) > MAX_CANDIDATE_LENGTH:
+        raise ValueError("Invalid ICE candidate")
+
+    return ice_candidate
+
+
+def parse_resume_token(auth) -> str | None:
+    # reconnecting clients send {"resume_token": "..."} from their `connected`
+    if not isinstance(auth, dict):
+        return None
+
+    resume_token = auth.get("resume_token")
+    return resume_token if isinstance(resume_token, str) else None
+
+
+def parse_capabilities(auth) -> frozenset[str]:
+    # clients opt into protocol features with {"capabilities": [...]} at connect
+    if not isinstance(auth, dict):
+        return frozenset()
+
+    capabilities = auth.get("capabilities")
+    if not isinstance(capabilities, list):
+        return frozenset()
+
+    return frozenset(c for c in capabilities if isinstance(c, str))
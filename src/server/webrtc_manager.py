@@ -1,62 +1,193 @@
-from flask_socketio import emit
+import time
 
+from server.emitter import Emitter
+from server.ice_batcher import IceCandidateBatcher
 from server.model import World
 from server.logger import get_logger
-from server.model.snake import SnakeId
+from server.metrics import RELAY_ERRORS
+from server.model.snake import Snake, SnakeId
+from server.negotiation_trace import NegotiationTracer
+from server.sdp_compression import (
+    SDP_DEFLATE_CAPABILITY,
+    inflate_description,
+    is_deflated,
+)
 
 _logger = get_logger(__name__)
 
+# capability a client announces at connect to receive new_ice_candidates batches
+ICE_BATCHING_CAPABILITY = "ice_candidate_batching"
+
 
 class WebRtcManager:
-    def __init__(self, world: World):
+    def __init__(
+        self,
+        world: World,
+        emitter: Emitter,
+        ice_batcher: IceCandidateBatcher | None = None,
+        enforce_mesh_plan: bool = False,
+        tracer: NegotiationTracer | None = None,
+    ):
         self.world = world
+        self.emitter = emitter
+        self.ice_batcher = ice_batcher
+        # refuse offers from the member that should be answering
+        self.enforce_mesh_plan = enforce_mesh_plan
+        # times each pair's negotiation when set, see server.negotiation_trace
+        self.tracer = tracer
 
     def send_offer(self, from_peer_id: SnakeId, to_peer_id: SnakeId, offer):
         _logger.info(
-            f"Peer with id {from_peer_id} sending offer to peer with id {to_peer_id}"
+            "Peer with id %s sending offer to peer with id %s",
+            from_peer_id,
+            to_peer_id,
+            extra={"event": "send_offer"},
         )
 
-        self._assert_peers_in_same_pit(from_peer_id, to_peer_id)
-        emit("new_offer", {"fromPeerId": from_peer_id, "offer": offer}, to=to_peer_id)
+        from_snake, to_snake = self._assert_peers_in_same_pit(from_peer_id, to_peer_id)
+        if self.enforce_mesh_plan:
+            self._assert_planned_offer(from_snake, to_snake)
+        if self.tracer is not None:
+            self.tracer.offer(from_snake, to_snake)
+        offer = self._readable_by(to_snake, offer)
+        self.emitter.emit(
+            "new_offer", {"fromPeerId": from_peer_id, "offer": offer}, to=to_peer_id
+        )
 
     def send_answer(self, from_peer_id: SnakeId, to_peer_id: SnakeId, answer):
         _logger.info(
-            f"Peer with id {from_peer_id} sending answer to peer with id {to_peer_id}"
+            "Peer with id %s sending answer to peer with id %s",
+            from_peer_id,
+            to_peer_id,
+            extra={"event": "send_answer"},
         )
 
-        self._assert_peers_in_same_pit(from_peer_id, to_peer_id)
-        emit("new_answer", {"fromPeerId": from_peer_id, "answer": answer}, to=to_peer_id)
+        from_snake, to_snake = self._assert_peers_in_same_pit(from_peer_id, to_peer_id)
+        if self.tracer is not None:
+            self.tracer.answer(from_snake, to_snake)
+        answer = self._readable_by(to_snake, answer)
+        self.emitter.emit(
+            "new_answer", {"fromPeerId": from_peer_id, "answer": answer}, to=to_peer_id
+        )
 
     def send_ice_candidate(
         self, from_peer_id: SnakeId, to_peer_id: SnakeId, ice_candidate
     ):
-        _logger.info(
-            f"Peer with id {from_peer_id} sending ice candidate to peer with id {to_peer_id}"
+        _logger.debug(
+            "Peer with id %s sending ice candidate to peer with id %s",
+            from_peer_id,
+            to_peer_id,
+            extra={"event": "send_ice_candidate"},
+        )
+
+        from_snake, to_snake = self._assert_peers_in_same_pit(from_peer_id, to_peer_id)
+        if self.tracer is not None:
+            self.tracer.ice_candidate(from_snake, to_snake)
+
+        if (
+            self.ice_batcher is None
+            or ICE_BATCHING_CAPABILITY not in to_snake.capabilities
+        ):
+            self.emitter.emit(
+                "new_ice_candidate",
+                {"fromPeerId": from_peer_id, "newIceCandidate": ice_candidate},
+                to=to_peer_id,
+            )
+            return
+
+        batch = self.ice_batcher.add(
+            from_peer_id, to_peer_id, ice_candidate, time.monotonic()
+        )
+        if batch is not None:
+            self._emit_ice_candidates(from_peer_id, to_peer_id, batch)
+
+    def peer_connected(self, from_peer_id: SnakeId, to_peer_id: SnakeId):
+        """Optional ack from a client whose connection to `to_peer_id` is up."""
+        _logger.debug(
+            "Peer with id %s connected to peer with id %s",
+            from_peer_id,
+            to_peer_id,
+            extra={"event": "peer_connected"},
         )
 
-        self._assert_peers_in_same_pit(from_peer_id, to_peer_id)
-        emit(
-            "new_ice_candidate",
-            {"fromPeerId": from_peer_id, "newIceCandidate": ice_candidate},
+        from_snake, to_snake = self._assert_peers_in_same_pit(from_peer_id, to_peer_id)
+        if self.tracer is not None:
+            self.tracer.connected(from_snake, to_snake)
+
+    def flush_ice_candidates(self, now: float | None = None):
+        """Send the batches whose window is over, called periodically by the runtime."""
+        if self.ice_batcher is None:
+            return
+
+        if now is None:
+            now = time.monotonic()
+
+        for from_peer_id, to_peer_id, batch in self.ice_batcher.flush_due(now):
+            self._emit_ice_candidates(from_peer_id, to_peer_id, batch)
+
+    def _emit_ice_candidates(self, from_peer_id: SnakeId, to_peer_id: SnakeId, batch):
+        _logger.info(
+            "Peer with id %s sending %d ice candidates to peer with id %s",
+            from_peer_id,
+            len(batch),
+            to_peer_id,
+            extra={"event": "new_ice_candidates"},
+        )
+        self.emitter.emit(
+            "new_ice_candidates",
+            {"fromPeerId": from_peer_id, "newIceCandidates": batch},
             to=to_peer_id,
         )
 
-    def _assert_peers_in_same_pit(self, from_peer_id: SnakeId, to_peer_id: SnakeId):
-        if from_peer_id not in self.world.snakes:
+    def _assert_planned_offer(self, from_snake: Snake, to_snake: Snake):
+        pit = from_snake.pit
+        # peers on another node are not in the local pit, their order is unknown
+        if pit is None or to_snake.pit is not pit:
+            return
+
+        if not pit.offers_to(from_snake, to_snake):
+            RELAY_ERRORS.inc("against_plan")
+            raise ValueError(
+                f"Offer against the mesh plan: {to_snake.display_name} offers to {from_snake.display_name}"
+            )
+
+    def _readable_by(self, to_snake: Snake, description):
+        # deflated SDPs go as they are to peers that opted in, and are only
+        # inflated here for the others. Plain SDPs are never deflated here.
+        if not is_deflated(description):
+            return description
+        if SDP_DEFLATE_CAPABILITY in to_snake.capabilities:
+            return description
+        return inflate_description(description)
+
+    def _assert_peers_in_same_pit(
+        self, from_peer_id: SnakeId, to_peer_id: SnakeId
+    ) -> tuple[Snake, Snake]:
+        from_state = self.world.get_snake_state(from_peer_id)
+        if from_state is None:
+            RELAY_ERRORS.inc("source_not_found")
             raise ValueError("Source peer not found in world")
 
-        if to_peer_id not in self.world.snakes:
+        to_state = self.world.get_snake_state(to_peer_id)
+        if to_state is None:
+            RELAY_ERRORS.inc("target_not_found")
             raise ValueError("Target peer not found in world")
 
-        snake1, pit1 = self.world.snakes[from_peer_id]
-        snake2, pit2 = self.world.snakes[to_peer_id]
+        snake1, pit1 = from_state
+        snake2, pit2 = to_state
 
         if pit1 is None or pit2 is None:
+            RELAY_ERRORS.inc("not_in_pit")
             raise ValueError(
                 f"One or both peers not in a pit: {snake1.display_name} in {str(pit1)}, {snake2.display_name} in {str(pit2)}"
             )
 
-        if pit1 is not pit2:
+        # compare ids, a peer on another node comes with its own pit view
+        if pit1.id != pit2.id:
+            RELAY_ERRORS.inc("different_pits")
             raise ValueError(
                 f"Peers are in different pits: {snake1.display_name} in {str(pit1)}, {snake2.display_name} in {str(pit2)}"
             )
+
+        snake1.last_active = pit1.last_active = time.monotonic()
+        return snake1, snake2
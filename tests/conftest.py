@@ -0,0 +1,39 @@
+import pytest
+
+
+class RecordingEmitter:
+    """Stands in for the socket.io emitter of the managers, recording every call.
+
+    `emitted` holds the emits as (event, data, to), `operations` every call
+    in order, emits with their skip_sid.
+    """
+
+    def __init__(self):
+        self.emitted: list[tuple[str, dict, str]] = []
+        self.operations: list[tuple] = []
+        self.disconnected: list[str] = []
+
+    def emit(self, event, data, to, skip_sid=None):
+        self.emitted.append((event, data, to))
+        self.operations.append((event, data, to, skip_sid))
+
+    def events(self, name):
+        return [(data, to) for event, data, to in self.emitted if event == name]
+
+    def operation_names(self):
+        return [operation[0] for operation in self.operations]
+
+    def enter_room(self, sid, room):
+        self.operations.append(("enter_room", sid, room))
+
+    def leave_room(self, sid, room):
+        self.operations.append(("leave_room", sid, room))
+
+    def disconnect(self, sid):
+        self.disconnected.append(sid)
+        self.operations.append(("disconnect", sid))
+
+
+@pytest.fixture
+def emitter():
+    return RecordingEmitter()
@@ -0,0 +1,72 @@
+from server.model import NameAllocator, Snake
+from server.model.snake import NAME_SPACE_SIZE, index_from_name, name_from_index
+
+
+class TestNameAllocator:
+    def test_allocates_every_index_once(self):
+        names = NameAllocator(size=50)
+
+        allocated = [names.allocate() for _ in range(50)]
+
+        assert sorted(allocated) == list(range(50))
+        assert len(names) == 50
+
+    def test_released_indexes_are_handed_out_again(self):
+        names = NameAllocator(size=10)
+        allocated = [names.allocate() for _ in range(10)]
+
+        names.release(allocated[3])
+        names.release(allocated[7])
+
+        assert {names.allocate(), names.allocate()} == {allocated[3], allocated[7]}
+        assert len(names) == 10
+
+    def test_exhausted_space_opens_a_suffixed_generation(self):
+        names = NameAllocator()
+        allocated = {names.allocate() for _ in range(NAME_SPACE_SIZE + 5)}
+
+        assert len(allocated) == NAME_SPACE_SIZE + 5
+        overflow = sorted(allocated)[-1]
+        assert NAME_SPACE_SIZE <= overflow < 2 * NAME_SPACE_SIZE
+        assert name_from_index(overflow).endswith("-2")
+        assert index_from_name(name_from_index(overflow)) == overflow
+
+    def test_state_is_dropped_once_every_name_is_back(self):
+        names = NameAllocator(size=10)
+        allocated = [names.allocate() for _ in range(15)]
+
+        for index in allocated:
+            names.release(index)
+
+        assert names.moved == {}
+        assert names.capacity == 10
+        assert sorted(names.allocate() for _ in range(10)) == list(range(10))
+
+    def test_reserved_index_is_not_handed_out(self):
+        names = NameAllocator(size=10)
+        allocated = [names.allocate() for _ in range(3)]
+        free = next(index for index in range(10) if index not in allocated)
+
+        assert names.reserve(free)
+        assert not names.reserve(free)
+        assert not names.reserve(allocated[0])
+        assert len(names) == 4
+
+        rest = [names.allocate() for _ in range(6)]
+        assert sorted(allocated + rest + [free]) == list(range(10))
+
+    def test_reserve_past_capacity_opens_generations(self):
+        names = NameAllocator(size=10)
+        allocated = [names.allocate() for _ in range(4)]
+
+        assert names.reserve(25)
+        assert len(names) == 5
+
+        rest = {names.allocate() for _ in range(25)}
+        assert len(rest) == 25
+        assert rest.isdisjoint(allocated + [25])
+        assert sorted(rest | set(allocated) | {25}) == list(range(30))
+
+    def test_snake_renders_allocated_index(self):
+        snake = Snake("12", name_index=NAME_SPACE_SIZE)
+        assert snake.display_name == name_from_index(0) + "-2"
@@ -0,0 +1,41 @@
+import uuid
+
+import pytest
+
+from server.model import FreeCapacityIndex
+
+
+class TestFreeCapacityIndex:
+    def test_picks_fullest_pit_with_a_free_seat(self):
+        index = FreeCapacityIndex(capacity=4)
+        emptier, fuller, full = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        index.track(emptier, 1)
+        index.track(fuller, 3)
+        index.track(full, 4)
+
+        assert index.pick() == fuller
+
+        index.update(fuller, 4)
+        assert index.pick() == emptier
+
+    def test_untracked_pits_are_ignored(self):
+        index = FreeCapacityIndex(capacity=4)
+
+        index.update(uuid.uuid4(), 2)
+
+        assert index.pick() is None
+        assert len(index) == 0
+
+    def test_discarded_pit_is_not_picked(self):
+        index = FreeCapacityIndex(capacity=4)
+        pit_id = uuid.uuid4()
+        index.track(pit_id, 2)
+
+        index.discard(pit_id)
+
+        assert index.pick() is None
+        assert pit_id not in index
+
+    def test_capacity_must_be_positive(self):
+        with pytest.raises(ValueError):
+            FreeCapacityIndex(capacity=0)
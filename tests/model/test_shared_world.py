@@ -0,0 +1,173 @@
+import uuid
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from server.model import Snake
+from server.model.shared_world import SharedWorld
+from server.pit_manager import SnakePitManager
+
+
+class TestSharedWorld:
+    @pytest.fixture()
+    def broker(self):
+        return fakeredis.FakeServer()
+
+    def _node(self, broker):
+        return SharedWorld(fakeredis.FakeRedis(server=broker, decode_responses=True))
+
+    def test_pit_created_on_one_node_is_visible_on_another(self, broker):
+        node_a = self._node(broker)
+        node_b = self._node(broker)
+        pit_id = uuid.uuid4()
+
+        node_a.create_pit(pit_id)
+
+        assert node_b.get_pit(pit_id) is not None
+        assert pit_id in node_b
+        assert node_b.get_pit(uuid.uuid4()) is None
+
+    def test_peers_on_different_nodes_share_a_pit(self, broker):
+        node_a = self._node(broker)
+        node_b = self._node(broker)
+        pit_id = uuid.uuid4()
+        node_a.create_pit(pit_id)
+
+        snake_a = Snake("sid_a")
+        snake_b = Snake("sid_b")
+        node_a.add_snake(snake_a)
+        node_b.add_snake(snake_b)
+        node_a.add_snake_to_pit(snake_a, node_a.get_pit(pit_id))
+        node_b.add_snake_to_pit(snake_b, node_b.get_pit(pit_id))
+
+        remote_snake, remote_pit = node_a.get_snake_state("sid_b")
+        assert remote_snake.display_name == snake_b.display_name
+        assert remote_pit.id == pit_id
+        assert node_a.pit_size(node_a.get_pit(pit_id)) == 2
+        assert node_a.pit_roster(node_a.get_pit(pit_id)) == [
+            {"peer_id": "sid_a", "display_name": snake_a.display_name},
+            {"peer_id": "sid_b", "display_name": snake_b.display_name},
+        ]
+
+    def test_pit_destroyed_only_once_empty_on_every_node(self, broker):
+        node_a = self._node(broker)
+        node_b = self._node(broker)
+        pit_id = uuid.uuid4()
+        node_a.create_pit(pit_id)
+
+        snake_a = Snake("sid_a")
+        snake_b = Snake("sid_b")
+        node_a.add_snake(snake_a)
+        node_b.add_snake(snake_b)
+        pit_a = node_a.get_pit(pit_id)
+        pit_b = node_b.get_pit(pit_id)
+        node_a.add_snake_to_pit(snake_a, pit_a)
+        node_b.add_snake_to_pit(snake_b, pit_b)
+
+        node_a.remove_snake_from_pit(snake_a, pit_a)
+        node_a.destroy_pit(pit_a)
+        assert node_b.get_pit(pit_id) is not None
+
+        node_b.remove_snake_from_pit(snake_b, pit_b)
+        node_b.destroy_pit(pit_b)
+        assert node_a.get_pit(pit_id) is None
+
+    def test_removed_snake_is_gone_from_every_node(self, broker):
+        node_a = self._node(broker)
+        node_b = self._node(broker)
+
+        node_a.add_snake(Snake("sid_a"))
+        assert node_b.has_snake("sid_a")
+
+        node_a.remove_snake("sid_a")
+        assert not node_b.has_snake("sid_a")
+        assert node_b.get_snake_state("sid_a") is None
+
+    def test_rebound_snake_keeps_its_pit_on_every_node(self, broker):
+        node_a = self._node(broker)
+        node_b = self._node(broker)
+        pit_id = uuid.uuid4()
+        node_a.create_pit(pit_id)
+        snake = Snake("sid_old")
+        node_a.add_snake(snake)
+        node_a.add_snake_to_pit(snake, node_a.get_pit(pit_id))
+
+        node_a.rebind_snake(snake, "sid_new")
+
+        remote_snake, remote_pit = node_b.get_snake_state("sid_new")
+        assert remote_snake.display_name == snake.display_name
+        assert remote_pit.id == pit_id
+        assert node_b.get_snake_state("sid_old") is None
+        assert [m["peer_id"] for m in node_b.pit_roster(remote_pit)] == ["sid_new"]
+
+    def test_dead_node_is_cleaned_up_by_the_others(self, broker):
+        node_a = self._node(broker)
+        node_b = self._node(broker)
+        shared_pit_id = uuid.uuid4()
+        lonely_pit_id = uuid.uuid4()
+        node_a.create_pit(shared_pit_id)
+        node_a.create_pit(lonely_pit_id)
+        snake_a = Snake("sid_a")
+        snake_b = Snake("sid_b")
+        node_a.add_snake(snake_a)
+        node_b.add_snake(snake_b)
+        node_a.add_snake_to_pit(snake_a, node_a.get_pit(shared_pit_id))
+        node_b.add_snake_to_pit(snake_b, node_b.get_pit(shared_pit_id))
+
+        # node a crashes, its liveness key runs out
+        node_b.client.delete(node_b._node_key(node_a.node_id))
+
+        assert node_b.heartbeat(now=0) == [("sid_a", shared_pit_id)]
+        assert not node_b.has_snake("sid_a")
+        assert node_b.get_pit(lonely_pit_id) is None
+        pit = node_b.get_pit(shared_pit_id)
+        assert [m["peer_id"] for m in node_b.pit_roster(pit)] == ["sid_b"]
+        assert node_b.client.smembers(node_b._nodes_key()) == {node_b.node_id}
+
+        # a live node is left alone, and heartbeats are spaced out
+        node_c = self._node(broker)
+        assert node_b.heartbeat(now=1) == []
+        assert node_b.heartbeat(now=10) == []
+        assert node_c.node_id in node_b.client.smembers(node_b._nodes_key())
+
+    def test_remote_member_gets_the_local_pit_even_when_empty(self, broker):
+        node_a = self._node(broker)
+        node_b = self._node(broker)
+        pit_id = uuid.uuid4()
+        pit = node_a.create_pit(pit_id)
+        snake_b = Snake("sid_b")
+        node_b.add_snake(snake_b)
+        node_b.add_snake_to_pit(snake_b, node_b.get_pit(pit_id))
+
+        assert len(pit) == 0
+        assert node_a.get_snake_state("sid_b")[1] is pit
+
+    def test_heartbeat_refreshes_the_liveness_key(self, broker):
+        node = SharedWorld(
+            fakeredis.FakeRedis(server=broker, decode_responses=True), node_ttl=30
+        )
+        node.client.delete(node._node_key(node.node_id))
+
+        node.heartbeat(now=0)
+
+        assert 0 < node.client.pttl(node._node_key(node.node_id)) <= 30_000
+
+    def test_peers_are_told_about_members_of_a_dead_node(self, broker, emitter):
+        node_a = self._node(broker)
+        manager = SnakePitManager(self._node(broker), emitter)
+        pit_id = uuid.uuid4()
+        node_a.create_pit(pit_id)
+        snake_a = Snake("sid_a")
+        node_a.add_snake(snake_a)
+        node_a.add_snake_to_pit(snake_a, node_a.get_pit(pit_id))
+        manager.handle_connect("sid_b")
+        manager.handle_join_pit("sid_b", pit_id)
+
+        node_a.client.delete(node_a._node_key(node_a.node_id))
+        manager.check_nodes(now=0)
+
+        assert emitter.emitted[-1] == (
+            "room_member_left",
+            {"leaving_peer_id": "sid_a"},
+            str(pit_id),
+        )
@@ -1,4 +1,9 @@
-from server.model.snake import Snake
+from server.model.snake import (
+    NAME_SPACE_SIZE,
+    Snake,
+    index_from_name,
+    name_from_index,
+)
 
 
 class TestSnake:
@@ -13,3 +18,17 @@ class TestSnake:
             str(snake)
             == f"SnakePitMember(id={snake.id}, display_name={snake.display_name})"
         )
+
+    def test_display_name_from_name_tables_is_kept_as_index(self):
+        snake = Snake("12", display_name="glossy-nile-boa")
+        assert snake.display_name == "glossy-nile-boa"
+        assert snake._name == index_from_name("glossy-nile-boa")
+        assert name_from_index(snake._name) == "glossy-nile-boa"
+
+    def test_custom_display_name(self):
+        snake = Snake("12", display_name="not-a-snake-name")
+        assert snake.display_name == "not-a-snake-name"
+
+    def test_name_index_roundtrip(self):
+        for index in (0, 1, 17, 18, NAME_SPACE_SIZE - 1):
+            assert index_from_name(name_from_index(index)) == index
@@ -12,6 +12,9 @@ class TestSnakeSnakePit:
         assert isinstance(pit.id, uuid.UUID)
         assert pit.snakes == {}
 
+    def test_default_ids_are_unique(self):
+        assert SnakePit().id != SnakePit().id
+
     def test_init_custom_id(self):
         custom_id = uuid.uuid4()
         pit = SnakePit(custom_id)
@@ -42,6 +45,32 @@ class TestSnakeSnakePit:
         assert pit.get_snake(snake1.id) is None
         assert pit.get_snake(snake2.id) is snake2
 
+    def test_roster_follows_membership(self, pit):
+        snake1 = self._snake("id1")
+        snake2 = self._snake("id2")
+
+        pit.add_snake(snake1)
+        pit.add_snake(snake2)
+        pit.remove_snake(snake1)
+
+        assert list(pit.roster.values()) == [
+            {"peer_id": "id2", "display_name": snake2.display_name}
+        ]
+
+    def test_rebound_snake_keeps_its_place(self, pit):
+        snakes = [self._snake(f"id{n}") for n in range(3)]
+        for snake in snakes:
+            pit.add_snake(snake)
+        join_order = snakes[0].join_order
+
+        pit.rebind_snake(snakes[0], "id0b")
+        snakes[0].id = "id0b"
+
+        assert list(pit.snakes) == ["id0b", "id1", "id2"]
+        assert [entry["peer_id"] for entry in pit.roster.values()] == list(pit.snakes)
+        assert pit.get_snake("id0b") is snakes[0]
+        assert snakes[0].join_order == join_order
+
     def test_remove_nonexistent_snake_does_not_raise_key_error(self, pit):
         nonexistent_snake = Snake("nonexistent")
         pit.remove_snake(nonexistent_snake)  # Should not raise KeyError
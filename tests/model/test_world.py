@@ -0,0 +1,65 @@
+import uuid
+
+from server.model import Snake, World
+
+
+class TestWorld:
+    def test_pit_sizes_follow_membership_changes(self):
+        world = World()
+        pit = world.create_pit(uuid.uuid4())
+        other_pit = world.create_pit(uuid.uuid4())
+        snake1 = Snake("id1")
+        snake2 = Snake("id2")
+        world.add_snake(snake1)
+        world.add_snake(snake2)
+
+        assert world.pit_sizes == {0: 2}
+
+        world.add_snake_to_pit(snake1, pit)
+        world.add_snake_to_pit(snake2, pit)
+        assert world.pit_sizes == {0: 1, 2: 1}
+
+        world.remove_snake_from_pit(snake1, pit)
+        assert world.pit_sizes == {0: 1, 1: 1}
+
+        world.remove_snake_from_pit(snake2, pit)
+        world.destroy_pit(pit)
+        world.destroy_pit(other_pit)
+        assert world.pit_sizes == {}
+
+    def test_removing_a_snake_not_in_the_pit_keeps_sizes(self):
+        world = World()
+        pit = world.create_pit(uuid.uuid4())
+
+        world.remove_snake_from_pit(Snake("stranger"), pit)
+
+        assert world.pit_sizes == {0: 1}
+
+    def test_snake_state_follows_pit_membership(self):
+        world = World()
+        pit = world.create_pit(uuid.uuid4())
+        snake = Snake("id1")
+        world.add_snake(snake)
+
+        assert world.get_snake_state("id1") == (snake, None)
+
+        world.add_snake_to_pit(snake, pit)
+        assert world.get_snake_state("id1") == (snake, pit)
+
+        world.remove_snake_from_pit(snake, pit)
+        assert world.get_snake_state("id1") == (snake, None)
+        assert world.get_snake_state("unknown") is None
+
+    def test_rebound_snake_keeps_its_place_in_the_roster(self):
+        world = World()
+        pit = world.create_pit(uuid.uuid4())
+        for snake_id in ("id1", "id2"):
+            world.add_snake(Snake(snake_id))
+            world.add_snake_to_pit(world.snakes[snake_id], pit)
+
+        world.rebind_snake(world.snakes["id1"], "id1b")
+
+        assert world.get_snake_state("id1") is None
+        assert world.get_snake_state("id1b") == (world.snakes["id1b"], pit)
+        assert [entry["peer_id"] for entry in pit.roster.values()] == ["id1b", "id2"]
+        assert world.pit_sizes == {2: 1}
@@ -0,0 +1,75 @@
+from conftest import RecordingEmitter
+from server.admission import (
+    AdmissionControl,
+    LagMonitor,
+    TokenBucket,
+    parse_rate_limits,
+)
+
+
+class TestAdmission:
+    def test_token_bucket_refills_at_its_rate_up_to_its_burst(self):
+        bucket = TokenBucket(rate=2, burst=3, now=0)
+
+        assert [bucket.take(0) for _ in range(4)] == [True, True, True, False]
+        assert bucket.retry_after() == 0.5
+        assert bucket.take(0.5)
+        assert not bucket.take(0.5)
+
+        # idle time never banks more than the burst
+        assert [bucket.take(100) for _ in range(4)] == [True, True, True, False]
+
+    def test_flood_is_refused_with_a_single_error(self):
+        emitter = RecordingEmitter()
+        admission = AdmissionControl(emitter, {"send_ice_candidate": (10, 5)})
+
+        admitted = [admission.admit("sid1", "send_ice_candidate", 0) for _ in range(50)]
+
+        assert admitted.count(True) == 5
+        ((event, data, to),) = emitter.emitted
+        assert (event, to) == ("error", "sid1")
+        assert data["retry_after"] == 0.1
+
+        # other snakes and events without a limit are untouched
+        assert admission.admit("sid2", "send_ice_candidate", 0)
+        assert admission.admit("sid1", "send_offer", 0)
+
+        # a new streak is reported again once the snake was let through
+        for _ in range(10):
+            admission.admit("sid1", "send_ice_candidate", 1)
+        assert len(emitter.emitted) == 2
+
+        admission.forget("sid1")
+        assert "sid1" not in admission.buckets
+
+    def test_joins_are_refused_while_the_loop_lags(self):
+        emitter = RecordingEmitter()
+        admission = AdmissionControl(emitter, max_loop_lag=0.1)
+        assert admission.connect_retry_after() is None
+
+        admission.loop_lag.record(0.25)
+
+        assert admission.connect_retry_after() == 3
+        assert not admission.admit("sid1", "join_snake_pit")
+        assert emitter.emitted[-1][1]["retry_after"] == 3
+        # signaling in established pits goes on
+        assert admission.admit("sid1", "send_offer")
+
+    def test_lag_estimate_decays(self):
+        monitor = LagMonitor(threshold=0.1, decay=0.5)
+
+        monitor.record(0.4)
+        monitor.record(0)
+        assert monitor.overloaded()
+
+        monitor.record(0)
+        monitor.record(0)
+        assert not monitor.overloaded()
+        assert not LagMonitor(threshold=0).overloaded()
+
+    def test_parse_rate_limits_overrides_the_defaults(self):
+        limits = parse_rate_limits("send_ice_candidate=5/10, send_offer=3")
+
+        assert limits["send_ice_candidate"] == (5, 10)
+        assert limits["send_offer"] == (3, 3)
+        assert limits["create_snake_pit"] == (1, 5)
@@ -0,0 +1,216 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+import socketio
+from aiohttp import web
+
+from server.async_server import create_app, drain
+from server.capture import read_capture
+from server.config import ServerConfig
+from server.sdp_compression import deflate_sdp
+from server.snapshot import WorldSnapshot
+
+PIT_ID = "697d8c94-cee3-4a99-a3b6-b7cced7927fc"
+
+
+class RecordingClient:
+    def __init__(self, serializer="default"):
+        self.sio = socketio.AsyncClient(serializer=serializer)
+        self.events: dict[str, list] = {}
+        self.sio.on("*", self._record)
+
+    async def _record(self, event, *args):
+        self.events.setdefault(event, []).append(args[0] if args else None)
+
+    async def wait_for(self, event, count=1, timeout=2.0):
+        async def received():
+            while len(self.events.get(event, [])) < count:
+                await asyncio.sleep(0.005)
+
+        await asyncio.wait_for(received(), timeout)
+        return self.events[event]
+
+
+async def _serve(scenario, config=None):
+    config = config or ServerConfig()
+    runner = web.AppRunner(create_app(config))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    serializer = "default" if config.serializer == "json" else config.serializer
+    clients = [RecordingClient(serializer), RecordingClient(serializer)]
+    try:
+        for client in clients:
+            await client.sio.connect(f"http://127.0.0.1:{port}", transports=["websocket"])
+        await scenario(*clients)
+    finally:
+        for client in clients:
+            await client.sio.disconnect()
+        await runner.cleanup()
+
+
+class TestAsyncServer:
+    def test_connect_join_and_relay_offer(self):
+        async def scenario(client1, client2):
+            connected = await client1.wait_for("connected")
+            assert "display_name" in connected[0]
+
+            await client1.sio.emit("join_snake_pit", PIT_ID)
+            await client1.wait_for("pit_joined")
+            await client2.sio.emit("join_snake_pit", PIT_ID)
+
+            new_members = await client1.wait_for("new_room_member")
+            client2_peer_id = new_members[0]["new_peer_id"]
+            assert client2_peer_id == client2.sio.get_sid()
+
+            offer = {"type": "offer", "sdp": "test-sdp"}
+            await client1.sio.emit("send_offer", (client2_peer_id, offer))
+            offers = await client2.wait_for("new_offer")
+            assert offers[0] == {"fromPeerId": client1.sio.get_sid(), "offer": offer}
+
+        asyncio.run(_serve(scenario))
+
+    def test_raw_signaling_relays_the_offer_as_sent(self):
+        async def scenario(client1, client2):
+            await client1.sio.emit("join_snake_pit", PIT_ID)
+            await client1.wait_for("pit_joined")
+            await client2.sio.emit("join_snake_pit", PIT_ID)
+            await client1.wait_for("new_room_member")
+
+            offer = {"type": "offer", "sdp": "v=0\r\n", "sent_at": 1.5}
+            await client1.sio.emit("send_offer", (client2.sio.get_sid(), offer))
+            offers = await client2.wait_for("new_offer")
+            assert offers[0] == {"fromPeerId": client1.sio.get_sid(), "offer": offer}
+
+            await client1.sio.emit("send_offer", (client2.sio.get_sid(), {}))
+            errors = await client1.wait_for("error")
+            assert (
+                errors[0]["message"] == "Expected a session description of type offer"
+            )
+
+        asyncio.run(_serve(scenario, ServerConfig(raw_signaling=True)))
+
+    def test_msgpack_serializer_relays_binary_sdps(self):
+        async def scenario(client1, client2):
+            await client1.sio.emit("join_snake_pit", PIT_ID)
+            await client1.wait_for("pit_joined")
+            await client2.sio.emit("join_snake_pit", PIT_ID)
+            await client1.wait_for("new_room_member")
+
+            offer = {"type": "offer", "sdp_deflate": deflate_sdp("v=0\r\n")}
+            await client1.sio.emit("send_offer", (client2.sio.get_sid(), offer))
+            offers = await client2.wait_for("new_offer")
+            assert offers[0]["offer"] == {"type": "offer", "sdp": "v=0\r\n"}
+
+            await client1.sio.emit("send_offer", (client2.sio.get_sid(), b"x" * 70000))
+            errors = await client1.wait_for("error")
+            assert errors[0]["message"] == "Payload too large for send_offer"
+
+        pytest.importorskip("msgpack")
+        asyncio.run(_serve(scenario, ServerConfig(serializer="msgpack")))
+
+    def test_handler_errors_are_sent_back(self):
+        async def scenario(client1, client2):
+            await client1.sio.emit("join_snake_pit", "invalid-pit-id")
+            errors = await client1.wait_for("error")
+            assert errors[0]["message"] == "Invalid pit ID"
+
+        asyncio.run(_serve(scenario))
+
+    def test_leaving_peer_is_announced(self):
+        async def scenario(client1, client2):
+            await client1.sio.emit("join_snake_pit", PIT_ID)
+            await client1.wait_for("pit_joined")
+            await client2.sio.emit("join_snake_pit", PIT_ID)
+            await client2.wait_for("pit_joined")
+
+            await client2.sio.emit("leave_snake_pit")
+            left = await client1.wait_for("room_member_left")
+            assert left[0]["leaving_peer_id"] == client2.sio.get_sid()
+            assert "room_member_left" not in client2.events
+
+        asyncio.run(_serve(scenario))
+
+    def test_oversized_payloads_are_refused_undecoded(self):
+        async def scenario(client1, client2):
+            await client1.sio.emit("join_snake_pit", PIT_ID)
+            await client1.wait_for("pit_joined")
+
+            candidate = {"candidate": "x" * 4096}
+            await client1.sio.emit(
+                "send_ice_candidate", (client2.sio.get_sid(), candidate)
+            )
+            errors = await client1.wait_for("error")
+            assert errors[0]["message"] == "Payload too large for send_ice_candidate"
+
+            # the connection is still good for signaling within the limits
+            await client1.sio.emit("send_offer", (client2.sio.get_sid(), {}))
+            errors = await client1.wait_for("error", count=2)
+            assert (
+                errors[1]["message"] == "Expected a session description of type offer"
+            )
+
+        asyncio.run(_serve(scenario))
+
+    def test_inbound_events_are_captured(self, tmp_path):
+        path = str(tmp_path / "capture.bin")
+
+        async def scenario(client1, client2):
+            await client1.sio.emit("join_snake_pit", PIT_ID)
+            await client1.wait_for("pit_joined")
+            await client2.sio.emit("join_snake_pit", PIT_ID)
+            await client1.wait_for("new_room_member")
+
+            offer = {"type": "offer", "sdp": "v=0\r\n"}
+            await client2.sio.emit("send_offer", (client1.sio.get_sid(), offer))
+            await client1.wait_for("new_offer")
+
+        asyncio.run(_serve(scenario, ServerConfig(capture_path=path)))
+
+        captured = list(read_capture(path))
+        events = [event.event for event in captured]
+        assert events[:2] == ["connect", "connect"]
+        assert events[2:5] == ["join_snake_pit", "join_snake_pit", "send_offer"]
+        assert captured[4].args == (captured[0].sid, 10)
+        assert events.count("disconnect") == 2
+
+    def test_drain_writes_the_snapshot_before_dropping_sessions(self, tmp_path):
+        path = str(tmp_path / "world.snapshot")
+        config = ServerConfig(resume_grace=30, snapshot_path=path, drain_timeout=0.1)
+
+        async def scenario():
+            app = create_app(config)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+
+            clients = [RecordingClient(), RecordingClient()]
+            for client in clients:
+                await client.sio.connect(
+                    f"http://127.0.0.1:{port}", transports=["websocket"]
+                )
+                await client.sio.emit("join_snake_pit", PIT_ID)
+                await client.wait_for("pit_joined")
+
+            # the order of a SIGTERM: stop listening, snapshot, drain, clean up
+            await site.stop()
+            await drain(app, config.drain_timeout)
+            for client in clients:
+                await client.sio.disconnect()
+            await runner.cleanup()
+            return [client.events["connected"][0]["resume_token"] for client in clients]
+
+        tokens = asyncio.run(scenario())
+
+        # the sessions dropped by the drain are left for the next process
+        snapshot = WorldSnapshot.open(path)
+        assert len(snapshot) == 2
+        assert all(snapshot.find_session(token) is not None for token in tokens)
+        snapshot.close()
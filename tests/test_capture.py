@@ -0,0 +1,78 @@
+import uuid
+
+from server.capture import CaptureWriter, read_capture, replay_event
+from server.model import World
+from server.packets import RawJson
+from server.pit_manager import SnakePitManager
+from server.webrtc_manager import WebRtcManager
+
+PIT_ID = str(uuid.uuid4())
+
+
+class TestCapture:
+    def _write_session(self, path, bodies):
+        capture = CaptureWriter(path, bodies)
+        offer = {"type": "offer", "sdp": "v=0\r\n"}
+        answer = {"type": "answer", "sdp": "v=0"}
+        capture.record("connect", "sid1", ({"capabilities": []},), now=capture.started)
+        capture.record("connect", "sid2", (), now=capture.started + 0.5)
+        capture.record("create_snake_pit", "sid1", (PIT_ID,), now=capture.started + 1)
+        capture.record("join_snake_pit", "sid1", (PIT_ID,), now=capture.started + 1)
+        capture.record("join_snake_pit", "sid2", (PIT_ID,), now=capture.started + 1)
+        capture.record("send_offer", "sid2", ("sid1", offer), now=capture.started + 2)
+        capture.record(
+            "send_answer",
+            "sid1",
+            ("sid2", RawJson('{"type":"answer","sdp":"v=0"}', answer)),
+            now=capture.started + 2,
+        )
+        capture.record(
+            "send_ice_candidate", "sid2", ("sid1", None), now=capture.started + 3
+        )
+        capture.close()
+
+    def test_capture_round_trip(self, tmp_path):
+        path = str(tmp_path / "capture.bin")
+        self._write_session(path, bodies=True)
+
+        captured = list(read_capture(path))
+
+        assert [event.at for event in captured] == [0, 0.5, 1, 1, 1, 2, 2, 3]
+        assert captured[0].args == ({"capabilities": []},)
+        assert captured[5].args == ("sid1", {"type": "offer", "sdp": "v=0\r\n"})
+        assert captured[6].args == ("sid2", {"type": "answer", "sdp": "v=0"})
+        assert captured[7].args == ("sid1", None)
+
+    def test_bodies_are_kept_as_their_size_by_default(self, tmp_path):
+        path = str(tmp_path / "capture.bin")
+        self._write_session(path, bodies=False)
+
+        captured = list(read_capture(path))
+
+        assert captured[5].args == ("sid1", 10)
+        assert captured[6].args == ("sid2", 29)
+        assert captured[7].args == ("sid1", 0)
+
+    def test_truncated_capture_ends_at_the_last_whole_event(self, tmp_path):
+        path = tmp_path / "capture.bin"
+        self._write_session(str(path), bodies=True)
+        path.write_bytes(path.read_bytes()[:-3])
+
+        assert len(list(read_capture(str(path)))) == 7
+
+    def test_replay_drives_the_managers(self, tmp_path, emitter):
+        path = str(tmp_path / "capture.bin")
+        self._write_session(path, bodies=False)
+        world = World()
+        pit_manager = SnakePitManager(world, emitter)
+        web_rtc_manager = WebRtcManager(world, emitter)
+
+        for captured in read_capture(path):
+            replay_event(pit_manager, web_rtc_manager, captured)
+
+        assert len(world.get_pit(uuid.UUID(PIT_ID))) == 2
+        ((offer, to),) = emitter.events("new_offer")
+        assert to == "sid1"
+        assert len(offer["offer"]["sdp"]) == 10
+        assert emitter.events("new_answer")[0][1] == "sid2"
+        assert len(emitter.events("new_ice_candidate")) == 1
@@ -0,0 +1,63 @@
+from server.ice_batcher import IceCandidateBatcher
+
+
+def _candidate(n):
+    return {
+        "candidate": f"candidate:{n} 1 UDP 2113667326 192.168.1.100 5440{n} typ host",
+        "sdpMLineIndex": 0,
+        "sdpMid": "0",
+    }
+
+
+class TestIceCandidateBatcher:
+    def test_candidates_held_until_window_ends(self):
+        batcher = IceCandidateBatcher(window=0.05)
+
+        assert batcher.add("a", "b", _candidate(1), now=0.0) is None
+        assert batcher.add("a", "b", _candidate(2), now=0.01) is None
+        assert batcher.flush_due(now=0.04) == []
+
+        assert batcher.flush_due(now=0.05) == [
+            ("a", "b", [_candidate(1), _candidate(2)])
+        ]
+        assert len(batcher) == 0
+
+    def test_exact_duplicates_are_dropped(self):
+        batcher = IceCandidateBatcher(window=0.05)
+
+        batcher.add("a", "b", _candidate(1), now=0.0)
+        batcher.add("a", "b", _candidate(1), now=0.01)
+
+        assert batcher.flush_due(now=1.0) == [("a", "b", [_candidate(1)])]
+
+    def test_end_of_candidates_flushes_immediately(self):
+        batcher = IceCandidateBatcher(window=0.05)
+        batcher.add("a", "b", _candidate(1), now=0.0)
+
+        batch = batcher.add("a", "b", {"candidate": ""}, now=0.01)
+
+        assert batch == [_candidate(1), {"candidate": ""}]
+        assert batcher.flush_due(now=1.0) == []
+
+    def test_pairs_are_batched_separately(self):
+        batcher = IceCandidateBatcher(window=0.05)
+
+        batcher.add("a", "b", _candidate(1), now=0.0)
+        batcher.add("b", "a", _candidate(2), now=0.0)
+        batcher.add("a", "c", _candidate(3), now=0.02)
+
+        assert batcher.flush_due(now=0.05) == [
+            ("a", "b", [_candidate(1)]),
+            ("b", "a", [_candidate(2)]),
+        ]
+        assert batcher.flush_due(now=0.07) == [("a", "c", [_candidate(3)])]
+
+    def test_pair_buffered_again_after_early_flush_keeps_its_own_window(self):
+        batcher = IceCandidateBatcher(window=0.05)
+        batcher.add("a", "b", _candidate(1), now=0.0)
+        batcher.add("a", "b", None, now=0.01)
+
+        batcher.add("a", "b", _candidate(2), now=0.02)
+
+        assert batcher.flush_due(now=0.05) == []
+        assert batcher.flush_due(now=0.07) == [("a", "b", [_candidate(2)])]
@@ -0,0 +1,41 @@
+import json
+import logging
+
+from server.logger import JsonFormatter, SamplingFilter, parse_sample_rates
+
+
+def _record(msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord("server.test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestLogger:
+    def test_json_formatter_puts_extra_fields_at_top_level(self):
+        entry = json.loads(
+            JsonFormatter().format(_record(event="join_snake_pit", pit_size=3))
+        )
+
+        assert entry["message"] == "hello world"
+        assert entry["level"] == "INFO"
+        assert entry["event"] == "join_snake_pit"
+        assert entry["pit_size"] == 3
+        assert "args" not in entry
+
+    def test_sampling_filter_keeps_one_in_n_per_event(self):
+        sampler = SamplingFilter({"send_ice_candidate": 0.25, "send_offer": 0})
+
+        kept = [
+            sampler.filter(_record(event="send_ice_candidate")) for _ in range(8)
+        ]
+        assert kept.count(True) == 2
+        assert not sampler.filter(_record(event="send_offer"))
+        assert sampler.filter(_record(event="join_snake_pit"))
+        assert sampler.filter(_record())
+
+    def test_parse_sample_rates(self):
+        assert parse_sample_rates("send_ice_candidate=0.01, send_offer=0.1") == {
+            "send_ice_candidate": 0.01,
+            "send_offer": 0.1,
+        }
+        assert parse_sample_rates(None) == {}
@@ -0,0 +1,122 @@
+import uuid
+from collections import deque
+
+import pytest
+
+from server.model import World
+from server.pit_manager import SnakePitManager
+from server.webrtc_manager import WebRtcManager
+
+
+class DeliveringEmitter:
+    """Queues what is sent to each snake, rooms being pit ids."""
+
+    def __init__(self, world: World):
+        self.world = world
+        self.delivered: deque[tuple[str, str, dict]] = deque()
+
+    def emit(self, event, data, to, skip_sid=None):
+        skipped = skip_sid if isinstance(skip_sid, list) else [skip_sid]
+        if self.world.has_snake(to):
+            recipients = [to]
+        else:
+            pit = self.world.get_pit(uuid.UUID(to))
+            recipients = [snake.id for snake in pit] if pit is not None else []
+        for recipient in recipients:
+            if recipient not in skipped:
+                self.delivered.append((recipient, event, data))
+
+    def enter_room(self, sid, room):
+        pass
+
+    def leave_room(self, sid, room):
+        pass
+
+    def disconnect(self, sid):
+        pass
+
+
+class PlannedClients:
+    """Snakes following the mesh plan: offer to `offer_to`, answer offers."""
+
+    def __init__(self, enforce_mesh_plan=False):
+        world = World()
+        self.emitter = DeliveringEmitter(world)
+        self.pit_manager = SnakePitManager(world, self.emitter)
+        self.web_rtc_manager = WebRtcManager(
+            world, self.emitter, enforce_mesh_plan=enforce_mesh_plan
+        )
+        self.pit_id = uuid.uuid4()
+        world.create_pit(self.pit_id)
+
+    def join(self, snake_id) -> list[tuple[str, str, dict]]:
+        """Join and run the signaling it sets off, returning what was relayed."""
+        self.pit_manager.handle_connect(snake_id)
+        self.pit_manager.handle_join_pit(snake_id, self.pit_id)
+
+        relayed = []
+        while self.emitter.delivered:
+            delivery = recipient, event, data = self.emitter.delivered.popleft()
+            relayed.append(delivery)
+            if event == "pit_joined":
+                for peer_id in data["offer_to"]:
+                    self.web_rtc_manager.send_offer(
+                        recipient, peer_id, {"type": "offer"}
+                    )
+            elif event == "new_offer":
+                self.web_rtc_manager.send_answer(
+                    recipient, data["fromPeerId"], {"type": "answer"}
+                )
+        return relayed
+
+
+class TestMeshPlan:
+    def _count(self, relayed, name):
+        return sum(1 for _, event, _ in relayed if event == name)
+
+    def test_every_join_takes_one_offer_per_member(self):
+        clients = PlannedClients(enforce_mesh_plan=True)
+
+        for n in range(8):
+            relayed = clients.join(f"sid{n}")
+
+            assert self._count(relayed, "new_offer") == n
+            assert self._count(relayed, "new_answer") == n
+            # every member was told to wait rather than offer to the newcomer
+            assert all(
+                data["await_offer"]
+                for _, event, data in relayed
+                if event == "new_room_member"
+            )
+
+    def test_offers_against_the_plan_are_refused_when_enforced(self):
+        clients = PlannedClients(enforce_mesh_plan=True)
+        clients.join("sid0")
+        clients.join("sid1")
+
+        with pytest.raises(ValueError, match="against the mesh plan"):
+            clients.web_rtc_manager.send_offer("sid0", "sid1", {"type": "offer"})
+
+        # renegotiating from the offering side is fine
+        clients.web_rtc_manager.send_offer("sid1", "sid0", {"type": "offer"})
+
+    def test_offers_against_the_plan_are_relayed_by_default(self):
+        clients = PlannedClients()
+        clients.join("sid0")
+        clients.join("sid1")
+
+        clients.web_rtc_manager.send_offer("sid0", "sid1", {"type": "offer"})
+        assert clients.emitter.delivered[-1][:2] == ("sid1", "new_offer")
+
+    def test_reattached_snakes_keep_their_place_in_the_plan(self):
+        clients = PlannedClients(enforce_mesh_plan=True)
+        clients.join("sid0")
+        clients.join("sid1")
+        world = clients.pit_manager.world
+
+        world.rebind_snake(world.snakes["sid1"], "sid1b")
+
+        # sid1b still offers to sid0, as sid1 did on the connection it keeps
+        clients.web_rtc_manager.send_offer("sid1b", "sid0", {"type": "offer"})
+        with pytest.raises(ValueError, match="against the mesh plan"):
+            clients.web_rtc_manager.send_offer("sid0", "sid1b", {"type": "offer"})
@@ -0,0 +1,65 @@
+from server.metrics import Counter, Gauge, Histogram, MetricsRegistry
+from server.server import app, socketio
+
+SEND_OFFER_MESSAGE_NAME = "send_offer"
+
+
+class TestMetrics:
+    def test_counter_renders_per_label_set(self):
+        registry = MetricsRegistry()
+        counter = registry.register(Counter("events_total", "Events", ("event",)))
+
+        counter.inc("connect")
+        counter.inc("connect")
+        counter.inc("send_offer")
+
+        rendered = registry.render()
+        assert "# TYPE events_total counter" in rendered
+        assert 'events_total{event="connect"} 2' in rendered
+        assert 'events_total{event="send_offer"} 1' in rendered
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.register(
+            Histogram("latency_seconds", "Latency", ("event",), buckets=(0.1, 1.0))
+        )
+
+        histogram.observe(0.05, "join")
+        histogram.observe(0.5, "join")
+        histogram.observe(5.0, "join")
+
+        rendered = registry.render()
+        assert 'latency_seconds_bucket{event="join",le="0.1"} 1' in rendered
+        assert 'latency_seconds_bucket{event="join",le="1.0"} 2' in rendered
+        assert 'latency_seconds_bucket{event="join",le="+Inf"} 3' in rendered
+        assert 'latency_seconds_count{event="join"} 3' in rendered
+        assert 'latency_seconds_sum{event="join"} 5.55' in rendered
+
+    def test_gauge_reads_its_function(self):
+        registry = MetricsRegistry()
+        gauge = registry.register(Gauge("pits_by_size", "Pits", ("size",)))
+        gauge.set_function(lambda: {("2",): 3})
+
+        assert 'pits_by_size{size="2"} 3' in registry.render()
+
+    def test_metrics_endpoint_reports_handlers_and_relay_errors(self):
+        client = socketio.test_client(app)
+        client.emit(SEND_OFFER_MESSAGE_NAME, "unknown-peer", {"type": "offer"})
+
+        response = app.test_client().get("/metrics")
+        body = response.get_data(as_text=True)
+
+        assert response.status_code == 200
+        assert response.content_type.startswith("text/plain")
+        assert 'sss_socketio_events_total{event="connect"}' in body
+        assert 'sss_socketio_handler_errors_total{event="send_offer"}' in body
+        assert 'sss_socketio_handler_duration_seconds_count{event="send_offer"}' in body
+        assert 'sss_relay_errors_total{reason="target_not_found"}' in body
+        assert "# TYPE sss_world_pits gauge" in body
+        assert "# TYPE sss_world_snakes gauge" in body
+        assert "# TYPE sss_world_pits_by_size gauge" in body
+
+    def test_negotiations_endpoint_needs_tracing(self):
+        response = app.test_client().get("/negotiations")
+
+        assert response.status_code == 404
@@ -0,0 +1,107 @@
+import uuid
+
+from server.metrics import JOIN_TO_FULL_MESH, OFFER_TO_ANSWER, OFFER_TO_CONNECTED
+from server.model import Snake, World
+from server.negotiation_trace import NegotiationTracer
+from server.pit_manager import SnakePitManager
+from server.webrtc_manager import WebRtcManager
+
+
+class TestNegotiationTracer:
+    def _pit_of(self, world, *snake_ids, tracer=None):
+        pit = world.create_pit(uuid.uuid4())
+        snakes = []
+        for n, snake_id in enumerate(snake_ids):
+            snake = Snake(snake_id)
+            world.add_snake(snake)
+            world.add_snake_to_pit(snake, pit)
+            if tracer is not None:
+                tracer.joined(pit, now=n)
+            snakes.append(snake)
+        return pit, snakes
+
+    def test_full_mesh_is_timed_from_the_first_join(self):
+        world = World()
+        tracer = NegotiationTracer()
+        pit, (a, b, c) = self._pit_of(world, "a", "b", "c", tracer=tracer)
+        meshes = JOIN_TO_FULL_MESH.count("3")
+        answers = OFFER_TO_ANSWER.count("3")
+
+        # the later member offers, the earlier answers
+        tracer.offer(c, a, now=2)
+        tracer.offer(c, b, now=2)
+        tracer.offer(b, a, now=2)
+        tracer.ice_candidate(a, c, now=2.5)
+        tracer.answer(a, c, now=3)
+        tracer.answer(b, c, now=3)
+        assert JOIN_TO_FULL_MESH.count("3") == meshes
+
+        # an answer in the other direction is the same pair
+        tracer.answer(c, a, now=4)
+        tracer.answer(a, b, now=4)
+        assert OFFER_TO_ANSWER.count("3") == answers + 3
+        assert JOIN_TO_FULL_MESH.count("3") == meshes + 1
+        assert tracer.summary()["pits_meshing"] == 0
+
+        pair = tracer.pits[pit.id].pairs[(a.join_order, c.join_order)]
+        assert (pair.first_ice_at, pair.last_ice_at) == (2.5, 2.5)
+
+        tracer.connected(a, c, now=5)
+        assert OFFER_TO_CONNECTED.count("3") >= 1
+        assert pair.connected_at == 5
+
+    def test_leaving_member_can_complete_the_mesh(self):
+        world = World()
+        tracer = NegotiationTracer()
+        pit, (a, b, c) = self._pit_of(world, "a", "b", "c", tracer=tracer)
+        tracer.offer(b, a, now=2)
+        tracer.answer(a, b, now=3)
+        tracer.offer(c, a, now=3)
+        meshes = JOIN_TO_FULL_MESH.count("2")
+
+        world.remove_snake_from_pit(c, pit)
+        tracer.left(pit, c, now=4)
+
+        assert list(tracer.pits[pit.id].pairs) == [(a.join_order, b.join_order)]
+        assert JOIN_TO_FULL_MESH.count("2") == meshes + 1
+
+        tracer.forget(pit)
+        assert tracer.pits == {}
+
+    def test_pairs_are_bounded_per_pit(self):
+        world = World()
+        tracer = NegotiationTracer(max_pairs=2)
+        pit, (a, b, c) = self._pit_of(world, "a", "b", "c", tracer=tracer)
+
+        tracer.offer(b, a)
+        tracer.offer(c, a)
+        tracer.offer(c, b)
+
+        trace = tracer.pits[pit.id]
+        assert len(trace.pairs) == 2
+        assert trace.overflowed
+
+    def test_managers_report_to_a_shared_tracer(self, emitter):
+        world = World()
+        pit_manager = SnakePitManager(world, emitter)
+        pit_manager.tracer = NegotiationTracer()
+        web_rtc_manager = WebRtcManager(world, emitter, tracer=pit_manager.tracer)
+        pit_id = uuid.uuid4()
+        world.create_pit(pit_id)
+        for sid in ("sid1", "sid2"):
+            pit_manager.handle_connect(sid)
+            pit_manager.handle_join_pit(sid, pit_id)
+
+        web_rtc_manager.send_offer("sid2", "sid1", {"type": "offer", "sdp": ""})
+        web_rtc_manager.send_answer("sid1", "sid2", {"type": "answer", "sdp": ""})
+        web_rtc_manager.peer_connected("sid2", "sid1")
+
+        summary = pit_manager.tracer.summary()
+        assert summary["distributions"][OFFER_TO_ANSWER.name]["2"]["samples"] >= 1
+        assert summary["distributions"][JOIN_TO_FULL_MESH.name]["2"]["samples"] >= 1
+        assert summary["pairs_awaiting_answer"] == 0
+
+        # the trace goes with the pit
+        pit_manager.handle_leave_pit("sid1")
+        pit_manager.handle_leave_pit("sid2")
+        assert pit_manager.tracer.pits == {}
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+from socketio import packet
+
+from server.packets import (
+    PAYLOAD_REJECTED_EVENT,
+    RAW_SIGNALING_EVENTS,
+    RawJson,
+    parse_payload_limits,
+    signaling_packet_class,
+)
+
+
+class TestPackets:
+    def test_packets_over_their_event_limit_are_not_decoded(self):
+        packet_class = signaling_packet_class(
+            parse_payload_limits("send_ice_candidate=64,*=32")
+        )
+
+        small = packet_class(encoded_packet='2["send_ice_candidate","a",{}]')
+        assert small.data == ["send_ice_candidate", "a", {}]
+
+        large = packet_class(
+            encoded_packet='2/pits,7["send_ice_candidate","a","' + "x" * 64 + '"]'
+        )
+        assert (large.namespace, large.id) == ("/pits", 7)
+        assert large.data == [PAYLOAD_REJECTED_EVENT, "send_ice_candidate"]
+
+        unnamed = packet_class(encoded_packet="2" + "[" * 10_000)
+        assert unnamed.data == [PAYLOAD_REJECTED_EVENT, None]
+
+        # offers keep their default limit
+        offer = packet_class(encoded_packet='2["send_offer","' + "x" * 1000 + '"]')
+        assert offer.data[0] == "send_offer"
+
+    def test_binary_attachments_count_towards_the_limit(self):
+        packet_class = signaling_packet_class(
+            parse_payload_limits("send_offer=256"), RAW_SIGNALING_EVENTS
+        )
+        head = '51-["send_offer","a",{"sdp_deflate":{"_placeholder":true,"num":0}}]'
+
+        small = packet_class(encoded_packet=head)
+        assert small.attachment_count == 1
+        assert small.add_attachment(b"x" * 64)
+        assert small.data == ["send_offer", "a", {"sdp_deflate": b"x" * 64}]
+
+        large = packet_class(encoded_packet=head)
+        assert large.add_attachment(b"x" * 256)
+        assert large.data == [PAYLOAD_REJECTED_EVENT, "send_offer"]
+
+        # a head over the limit still takes its attachments, unread
+        placeholders = ",".join(f'{{"_placeholder":true,"num":{n}}}' for n in range(2))
+        too_long = packet_class(
+            encoded_packet=f'52-/pits,["send_offer","{"a" * 256}",{placeholders}]'
+        )
+        assert (too_long.namespace, too_long.attachment_count) == ("/pits", 2)
+        assert not too_long.add_attachment(b"x")
+        assert too_long.add_attachment(b"x")
+        assert too_long.data == [PAYLOAD_REJECTED_EVENT, "send_offer"]
+
+    def test_raw_bodies_are_relayed_without_encoding_them_again(self):
+        packet_class = signaling_packet_class(
+            parse_payload_limits(None), RAW_SIGNALING_EVENTS
+        )
+        body = '{"type": "offer", "sdp": "v=0\\r\\no=- 1 2 IN IP4 127.0.0.1"}'
+
+        received = packet_class(encoded_packet=f'2["send_offer","peer-1",{body}]')
+        event, to_peer_id, offer = received.data
+        assert (event, to_peer_id) == ("send_offer", "peer-1")
+        assert offer.text == body
+        assert offer == json.loads(body)
+
+        relayed = packet_class(
+            packet.EVENT, data=["new_offer", {"fromPeerId": "peer-2", "offer": offer}]
+        ).encode()
+        assert relayed == f'2["new_offer",{{"fromPeerId":"peer-2","offer":{body}}}]'
+
+    def test_unexpected_raw_bodies_are_decoded_as_usual(self):
+        packet_class = signaling_packet_class(
+            parse_payload_limits(None), RAW_SIGNALING_EVENTS
+        )
+
+        broken = packet_class(encoded_packet='2["send_offer","peer-1",{"sdp":1},2]')
+        assert broken.data == ["send_offer", "peer-1", {"sdp": 1}, 2]
+
+        ice = packet_class(encoded_packet='2["send_ice_candidate","peer-1",null]')
+        assert ice.data == ["send_ice_candidate", "peer-1", None]
+
+    def test_msgpack_packets_over_their_event_limit_are_rejected(self):
+        msgpack = pytest.importorskip("msgpack")
+        packet_class = signaling_packet_class(
+            parse_payload_limits("send_ice_candidate=64"), serializer="msgpack"
+        )
+
+        def encoded(*data):
+            return msgpack.dumps({"type": packet.EVENT, "nsp": "/", "data": list(data)})
+
+        small = packet_class(encoded_packet=encoded("send_ice_candidate", "a", None))
+        assert small.data == ["send_ice_candidate", "a", None]
+
+        large = packet_class(
+            encoded_packet=encoded("send_ice_candidate", "a", b"x" * 64)
+        )
+        assert large.data == [PAYLOAD_REJECTED_EVENT, "send_ice_candidate"]
+
+        with pytest.raises(ValueError, match="Unknown serializer"):
+            signaling_packet_class(parse_payload_limits(None), serializer="cbor")
@@ -1,7 +1,13 @@
+import time
 import uuid
-from server.server import app, socketio
+from server.model import World
+from server.pit_manager import SnakePitManager
+from server.reaper import Reaper
+from server.server import app, pit_manager, socketio
 from typing import Any, TypedDict
 
+from conftest import RecordingEmitter
+
 CONNECTED_MESSAGE_NAME = "connected"
 CREATE_SNAKE_PIT_MESSAGE_NAME = "create_snake_pit"
 ERROR_MESSAGE_NAME = "error"
@@ -11,6 +17,7 @@ PIT_CREATED_MESSAGE_NAME = "pit_created"
 PIT_JOINED_MESSAGE_NAME = "pit_joined"
 ROOM_MEMBER_LEFT_MESSAGE_NAME = "room_member_left"
 LEAVE_PIT_MESSAGE_NAME = "leave_snake_pit"
+QUICK_JOIN_MESSAGE_NAME = "quick_join"
 
 
 class SocketIOMessage(TypedDict):
@@ -77,6 +84,7 @@ class TestSnakePitManager:
         pit_joined_events = self._get_events_by_name(client1, PIT_JOINED_MESSAGE_NAME)
         assert len(pit_joined_events) == 1
         assert pit_joined_events[0]["args"][0]["pit_id"] == pit_id
+        assert pit_joined_events[0]["args"][0]["pit_roster"] == []
 
         # new client
         client2 = self._client()
@@ -86,6 +94,13 @@ class TestSnakePitManager:
 
         self._join_pit(client2, pit_id)
 
+        # client2 gets the existing members in its join confirmation
+        client2_joined = self._get_events_by_name(client2, PIT_JOINED_MESSAGE_NAME)
+        roster = client2_joined[0]["args"][0]["pit_roster"]
+        assert [member["display_name"] for member in roster] == [
+            pit_joined_events[0]["args"][0]["display_name"]
+        ]
+
         # check that new client info was properly communicated
         client1_notifs = self._get_events_by_name(client1, NEW_ROOM_MEMBER_MESSAGE_NAME)
         client2_notifs = self._get_events_by_name(client2, NEW_ROOM_MEMBER_MESSAGE_NAME)
@@ -155,3 +170,202 @@ class TestSnakePitManager:
         )
         assert len(client2_notifs) == 1
         assert "leaving_peer_id" in client2_notifs[0]["args"][0]
+
+    def test_connected_display_names_are_unique_and_recycled(self):
+        names_before = len(pit_manager.names)
+        clients = [self._client() for _ in range(20)]
+        display_names = {
+            self._get_events_by_name(client, CONNECTED_MESSAGE_NAME)[0]["args"][0][
+                "display_name"
+            ]
+            for client in clients
+        }
+
+        assert len(display_names) == 20
+        assert len(pit_manager.names) == names_before + 20
+
+        for client in clients:
+            client.disconnect()
+        assert len(pit_manager.names) == names_before
+
+    def test_pit_scoped_display_names(self):
+        emitter = RecordingEmitter()
+        manager = SnakePitManager(World(), emitter, name_scope="pit")
+        pit_id = uuid.uuid4()
+        manager.world.create_pit(pit_id)
+
+        for sid in ("sid1", "sid2", "sid3"):
+            manager.handle_connect(sid)
+            manager.handle_join_pit(sid, pit_id)
+
+        joined = [data for event, data, _ in emitter.emitted if event == "pit_joined"]
+        assert len({data["display_name"] for data in joined}) == 3
+        assert len(manager.pit_names[pit_id]) == 3
+
+        manager.handle_leave_pit("sid1")
+        manager.handle_disconnect("sid2")
+        assert len(manager.pit_names[pit_id]) == 1
+
+        manager.handle_disconnect("sid3")
+        assert pit_id not in manager.pit_names
+
+    def test_quick_join_fills_a_pit_before_opening_another(self):
+        clients = [self._client() for _ in range(pit_manager.open_pits.capacity + 1)]
+        pit_ids = []
+        for client in clients:
+            client.emit(QUICK_JOIN_MESSAGE_NAME)
+            joined = self._get_events_by_name(client, PIT_JOINED_MESSAGE_NAME)
+            pit_ids.append(joined[0]["args"][0]["pit_id"])
+
+        assert len(set(pit_ids[:-1])) == 1
+        assert pit_ids[-1] != pit_ids[0]
+
+        # a seat frees up in the first pit, which is fuller than the second
+        clients[0].disconnect()
+        newcomer = self._client()
+        newcomer.emit(QUICK_JOIN_MESSAGE_NAME)
+        joined = self._get_events_by_name(newcomer, PIT_JOINED_MESSAGE_NAME)
+        assert joined[0]["args"][0]["pit_id"] == pit_ids[0]
+
+        for client in [*clients[1:], newcomer]:
+            client.disconnect()
+        assert len(pit_manager.open_pits) == 0
+
+    def test_join_to_a_full_pit_is_refused(self):
+        emitter = RecordingEmitter()
+        manager = SnakePitManager(World(), emitter, max_pit_size=2)
+        pit_id = uuid.uuid4()
+        manager.world.create_pit(pit_id)
+
+        for sid in ("sid1", "sid2", "sid3"):
+            manager.handle_connect(sid)
+            manager.handle_join_pit(sid, pit_id)
+
+        assert manager.world.pit_size(manager.world.get_pit(pit_id)) == 2
+        assert ("pit_full", {"pit_id": str(pit_id), "max_pit_size": 2}, "sid3") in (
+            emitter.emitted
+        )
+
+    def test_full_pit_spills_over_into_a_linked_pit(self):
+        emitter = RecordingEmitter()
+        manager = SnakePitManager(World(), emitter, max_pit_size=2, pit_overflow=True)
+        lobby_id = uuid.uuid4()
+        manager.world.create_pit(lobby_id)
+
+        for sid in ("sid1", "sid2", "sid3", "sid4", "sid5"):
+            manager.handle_connect(sid)
+            manager.handle_join_pit(sid, lobby_id)
+
+        joined = {
+            to: data for event, data, to in emitter.emitted if event == "pit_joined"
+        }
+        pit_ids = [
+            joined[sid]["pit_id"] for sid in ("sid1", "sid2", "sid3", "sid4", "sid5")
+        ]
+        assert pit_ids[0] == pit_ids[1] == str(lobby_id)
+        assert pit_ids[2] == pit_ids[3] != pit_ids[0]
+        assert pit_ids[4] not in (pit_ids[0], pit_ids[2])
+        assert joined["sid5"]["lobby_id"] == str(lobby_id)
+
+        # the first pit empties out, its lobby still takes joins
+        manager.handle_disconnect("sid1")
+        manager.handle_disconnect("sid2")
+        assert manager.world.get_pit(lobby_id) is None
+        manager.handle_connect("sid6")
+        manager.handle_join_pit("sid6", lobby_id)
+        assert emitter.emitted[-1][:1] != ("error",)
+        assert manager.world.get_snake_state("sid6")[1].id == uuid.UUID(pit_ids[4])
+
+        for sid in ("sid3", "sid4", "sid5", "sid6"):
+            manager.handle_disconnect(sid)
+        assert manager.lobbies == {}
+        assert manager.pit_lobby == {}
+
+    def _resumable_manager(self):
+        emitter = RecordingEmitter()
+        manager = SnakePitManager(World(), emitter, resume_grace=30)
+        manager.reaper = Reaper(manager)
+        pit_id = uuid.uuid4()
+        manager.world.create_pit(pit_id)
+        for sid in ("sid1", "sid2"):
+            manager.handle_connect(sid)
+            manager.handle_join_pit(sid, pit_id)
+        return manager, emitter, pit_id
+
+    def test_reconnect_with_resume_token_keeps_the_pit_slot(self):
+        manager, emitter, pit_id = self._resumable_manager()
+        (connected, _), _ = emitter.events("connected")
+
+        manager.handle_disconnect("sid1")
+        assert emitter.events("room_member_left") == []
+
+        manager.handle_connect("sid1b", resume_token=connected["resume_token"])
+
+        snake, pit = manager.world.get_snake_state("sid1b")
+        assert pit.id == pit_id
+        assert snake.display_name == connected["display_name"]
+        assert not manager.world.has_snake("sid1")
+        assert "sid1b" in pit and "sid1" not in pit
+        assert emitter.events("peer_reattached") == [
+            ({"old_peer_id": "sid1", "new_peer_id": "sid1b"}, str(pit_id))
+        ]
+        resumed, to = emitter.events("connected")[-1]
+        assert to == "sid1b"
+        assert resumed["pit_id"] == str(pit_id)
+        assert resumed["resume_token"] != connected["resume_token"]
+
+    def test_held_session_ends_after_the_grace_period(self):
+        manager, emitter, pit_id = self._resumable_manager()
+        (connected, _), _ = emitter.events("connected")
+
+        disconnected_at = time.monotonic()
+        manager.handle_disconnect("sid1")
+        manager.reaper.expire_due(disconnected_at + 1)
+        assert manager.world.has_snake("sid1")
+
+        manager.reaper.expire_due(disconnected_at + 32)
+        assert not manager.world.has_snake("sid1")
+        assert emitter.events("room_member_left") == [
+            ({"leaving_peer_id": "sid1"}, str(pit_id))
+        ]
+
+        # the token is gone with the session
+        manager.handle_connect("sid1b", resume_token=connected["resume_token"])
+        assert manager.world.get_snake_state("sid1b")[1] is None
+
+    def test_draining_refuses_new_snakes_and_keeps_pits(self):
+        emitter = RecordingEmitter()
+        manager = SnakePitManager(World(), emitter)
+        pit_id = uuid.uuid4()
+        manager.world.create_pit(pit_id)
+        for sid in ("sid1", "sid2", "lurker"):
+            manager.handle_connect(sid)
+        for sid in ("sid1", "sid2"):
+            manager.handle_join_pit(sid, pit_id)
+
+        manager.start_draining(timeout=30)
+
+        assert emitter.events("server_draining") == [({}, str(pit_id))]
+        assert emitter.disconnected == ["lurker"]
+        assert manager.handle_connect("sid3") is False
+        assert not manager.world.has_snake("sid3")
+
+        manager.handle_create_pit("sid1", uuid.uuid4())
+        assert emitter.events("pit_created") == []
+        assert manager.world.get_snake_state("sid1")[1].id == pit_id
+
+        # members leaving are sent on to the next process
+        manager.handle_leave_pit("sid2")
+        assert emitter.disconnected == ["lurker", "sid2"]
+
+    def test_drained_once_the_snakes_are_gone_or_at_the_deadline(self):
+        manager = SnakePitManager(World(), RecordingEmitter())
+        manager.handle_connect("sid1")
+        manager.handle_join_pit("sid1", manager.world.create_pit(uuid.uuid4()).id)
+
+        manager.start_draining(timeout=30)
+        assert not manager.drained()
+        assert manager.drained(time.monotonic() + 31)
+
+        manager.handle_disconnect("sid1")
+        assert manager.drained()
@@ -0,0 +1,109 @@
+from conftest import RecordingEmitter
+from server.emitter import PriorityEmitter
+
+
+def _joined(peer_id):
+    return {"new_peer_id": peer_id, "new_peer_display_name": peer_id}
+
+
+class TestPriorityEmitter:
+    def test_offers_jump_ahead_of_ice_and_presence(self):
+        inner = RecordingEmitter()
+        lanes = PriorityEmitter(inner)
+
+        lanes.emit("new_room_member", _joined("c"), to="pit", skip_sid="c")
+        lanes.emit("new_ice_candidate", {"from_peer_id": "a"}, to="b")
+        lanes.emit("new_offer", {"from_peer_id": "a"}, to="b")
+        lanes.emit("error", {"message": "Pit does not exist"}, to="a")
+        assert inner.operation_names() == ["new_offer", "error"]
+
+        lanes.flush()
+        assert inner.operation_names() == [
+            "new_offer",
+            "error",
+            "new_ice_candidate",
+            "new_room_member",
+        ]
+        assert inner.operations[-1][3] == ["c"]
+
+        lanes.flush()
+        assert len(inner.operations) == 4
+
+    def test_join_then_leave_between_flushes_is_coalesced(self):
+        inner = RecordingEmitter()
+        lanes = PriorityEmitter(inner)
+
+        lanes.emit("new_room_member", _joined("c"), to="pit", skip_sid="c")
+        lanes.emit("new_room_member", _joined("d"), to="pit", skip_sid="d")
+        lanes.emit("room_member_left", {"leaving_peer_id": "c"}, to="pit")
+        lanes.flush()
+
+        assert [operation[1] for operation in inner.operations] == [_joined("d")]
+
+    def test_lanes_keep_the_newest_events_per_recipient(self):
+        inner = RecordingEmitter()
+        lanes = PriorityEmitter(inner, max_depth=2)
+
+        for n in range(5):
+            lanes.emit("new_ice_candidate", {"n": n}, to="b")
+        lanes.emit("new_ice_candidate", {"n": 0}, to="c")
+        lanes.flush()
+
+        assert [(operation[1], operation[2]) for operation in inner.operations] == [
+            ({"n": 3}, "b"),
+            ({"n": 4}, "b"),
+            ({"n": 0}, "c"),
+        ]
+
+    def test_join_then_leave_is_sent_once_the_member_was_seen(self):
+        inner = RecordingEmitter()
+        lanes = PriorityEmitter(inner)
+
+        lanes.emit("new_room_member", _joined("c"), to="pit", skip_sid="c")
+        lanes.emit("new_offer", {"fromPeerId": "c", "offer": {}}, to="x")
+        lanes.emit("room_member_left", {"leaving_peer_id": "c"}, to="pit")
+        lanes.flush()
+
+        assert inner.operation_names() == [
+            "new_offer",
+            "new_room_member",
+            "room_member_left",
+        ]
+
+    def test_join_then_leave_is_sent_once_a_roster_named_the_member(self):
+        inner = RecordingEmitter()
+        lanes = PriorityEmitter(inner)
+
+        lanes.emit("new_room_member", _joined("c"), to="pit", skip_sid="c")
+        lanes.enter_room("d", "pit")
+        lanes.emit("room_member_left", {"leaving_peer_id": "c"}, to="pit")
+        lanes.flush()
+
+        assert inner.operation_names() == [
+            "enter_room",
+            "new_room_member",
+            "room_member_left",
+        ]
+        # d had c in its roster, and hears it left
+        assert inner.operations[2][3] is None
+
+    def test_late_room_members_are_skipped(self):
+        inner = RecordingEmitter()
+        lanes = PriorityEmitter(inner)
+
+        lanes.emit("new_room_member", _joined("c"), to="pit", skip_sid="c")
+        lanes.enter_room("d", "pit")
+        lanes.flush()
+
+        assert inner.operations[0] == ("enter_room", "d", "pit")
+        assert inner.operations[1][3] == ["c", "d"]
+
+    def test_disconnect_drops_what_was_queued_for_the_snake(self):
+        inner = RecordingEmitter()
+        lanes = PriorityEmitter(inner)
+
+        lanes.emit("new_ice_candidate", {"from_peer_id": "a"}, to="b")
+        lanes.disconnect("b")
+        lanes.flush()
+
+        assert inner.operations == [("disconnect", "b")]
@@ -0,0 +1,88 @@
+import uuid
+
+from conftest import RecordingEmitter
+from server.model import World
+from server.pit_manager import SnakePitManager
+from server.reaper import Reaper
+
+
+class TestReaper:
+    def _manager(self, **ttls):
+        emitter = RecordingEmitter()
+        manager = SnakePitManager(World(), emitter)
+        manager.reaper = Reaper(manager, now=0.0, **ttls)
+        return manager, emitter
+
+    def test_pit_nobody_joins_is_deleted(self):
+        manager, _ = self._manager(empty_pit_ttl=60)
+        manager.handle_connect("sid1")
+        pit_id = uuid.uuid4()
+        manager.handle_create_pit("sid1", pit_id)
+        created_at = manager.world.get_pit(pit_id).last_active
+
+        manager.reaper.expire_due(created_at + 59)
+        assert pit_id in manager.world
+
+        manager.reaper.expire_due(created_at + 61)
+        assert pit_id not in manager.world
+
+    def test_joined_pit_is_kept(self):
+        manager, _ = self._manager(empty_pit_ttl=60)
+        manager.handle_connect("sid1")
+        pit_id = uuid.uuid4()
+        manager.handle_create_pit("sid1", pit_id)
+        manager.handle_join_pit("sid1", pit_id)
+        joined_at = manager.world.get_pit(pit_id).last_active
+
+        manager.reaper.expire_due(joined_at + 600)
+        assert pit_id in manager.world
+        assert len(manager.reaper.wheel) == 0
+
+    def test_idle_pit_is_closed_and_activity_pushes_it_back(self):
+        manager, emitter = self._manager(pit_idle_ttl=60)
+        pit_id = uuid.uuid4()
+        manager.world.create_pit(pit_id)
+        manager.handle_connect("sid1")
+        manager.handle_join_pit("sid1", pit_id)
+        pit = manager.world.get_pit(pit_id)
+        joined_at = pit.last_active
+
+        # a signaling message half way through
+        pit.last_active = joined_at + 50
+        manager.reaper.expire_due(joined_at + 70)
+        assert pit_id in manager.world
+
+        manager.reaper.expire_due(joined_at + 111)
+        assert pit_id not in manager.world
+        assert ("pit_expired", {"pit_id": str(pit_id)}, str(pit_id)) in emitter.emitted
+        assert manager.world.get_snake_state("sid1")[1] is None
+
+    def test_emptied_pit_goes_at_its_empty_deadline(self):
+        manager, _ = self._manager(empty_pit_ttl=60, pit_idle_ttl=600)
+        pit_id = uuid.uuid4()
+        pit = manager.world.create_pit(pit_id)
+        manager.handle_connect("sid1")
+        manager.handle_join_pit("sid1", pit_id)
+        joined_at = pit.last_active
+
+        # left in the world while empty, before the idle deadline came up
+        manager.world.remove_snake_from_pit(manager.world.snakes["sid1"], pit)
+        manager.reaper.watch_pit(pit)
+
+        manager.reaper.expire_due(joined_at + 61)
+        assert pit_id not in manager.world
+
+    def test_idle_snake_outside_of_pits_is_disconnected(self):
+        manager, emitter = self._manager(snake_idle_ttl=60)
+        manager.handle_connect("idle")
+        manager.handle_connect("in_pit")
+        pit_id = uuid.uuid4()
+        manager.world.create_pit(pit_id)
+        manager.handle_join_pit("in_pit", pit_id)
+        connected_at = manager.world.get_snake_state("idle")[0].last_active
+
+        manager.reaper.expire_due(connected_at + 3600)
+
+        assert emitter.disconnected == ["idle"]
+        assert not manager.world.has_snake("idle")
+        assert manager.world.has_snake("in_pit")
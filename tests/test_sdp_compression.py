@@ -0,0 +1,62 @@
+import zlib
+
+import pytest
+
+from server.sdp_compression import (
+    DICTIONARY_ID,
+    MAX_INFLATED_SDP,
+    SDP_DICTIONARY,
+    deflate_sdp,
+    inflate_description,
+    inflate_sdp,
+)
+
+SDP = "\r\n".join(
+    [
+        "v=0",
+        "o=- 4611731400430051336 2 IN IP4 127.0.0.1",
+        "s=-",
+        "t=0 0",
+        "a=group:BUNDLE 0",
+        "m=audio 9 UDP/TLS/RTP/SAVPF 111 63 9 0 8 13 110 126",
+        "c=IN IP4 0.0.0.0",
+        "a=rtpmap:111 opus/48000/2",
+        "a=fmtp:111 minptime=10;useinbandfec=1",
+        "",
+    ]
+)
+
+
+class TestSdpCompression:
+    def test_round_trip_with_the_preset_dictionary(self):
+        deflated = deflate_sdp(SDP)
+
+        assert inflate_sdp(deflated) == SDP
+        assert len(deflated) < len(zlib.compress(SDP.encode()))
+        # FDICT is set and the dictionary id follows the zlib header
+        assert deflated[1] & 0x20
+        assert (
+            int.from_bytes(deflated[2:6])
+            == DICTIONARY_ID
+            == zlib.adler32(SDP_DICTIONARY)
+        )
+
+    def test_invalid_and_oversized_sdps_are_refused(self):
+        deflated = deflate_sdp(SDP)
+
+        for invalid in (
+            b"not zlib",
+            deflated[:-4],
+            zlib.compress(b"x" * MAX_INFLATED_SDP * 2),
+        ):
+            with pytest.raises(ValueError, match="Invalid deflated SDP"):
+                inflate_sdp(invalid)
+
+    def test_inflate_description_keeps_the_other_fields(self):
+        description = {"type": "answer", "sdp_deflate": deflate_sdp(SDP), "sent_at": 1}
+
+        assert inflate_description(description) == {
+            "type": "answer",
+            "sent_at": 1,
+            "sdp": SDP,
+        }
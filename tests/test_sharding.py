@@ -0,0 +1,97 @@
+import asyncio
+import uuid
+
+from server.server import app, pit_manager, socketio
+from server.sharding import (
+    PitRouter,
+    WorkerShard,
+    pick_worker,
+    shard_for_address,
+    shard_for_pit,
+)
+
+CREATE_SNAKE_PIT_MESSAGE_NAME = "create_snake_pit"
+JOIN_PIT_MESSAGE_NAME = "join_snake_pit"
+PIT_REDIRECT_MESSAGE_NAME = "pit_redirect"
+
+
+def _request_head(path: str) -> bytes:
+    return f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+
+
+class TestSharding:
+    def test_shard_for_pit_is_stable_and_in_range(self):
+        pit_ids = [uuid.uuid4() for _ in range(1000)]
+        shards = [shard_for_pit(pit_id, 4) for pit_id in pit_ids]
+
+        assert shards == [shard_for_pit(pit_id, 4) for pit_id in pit_ids]
+        assert set(shards) == {0, 1, 2, 3}
+
+    def test_pick_worker_uses_pit_id_from_query(self):
+        pit_id = uuid.uuid4()
+        head = _request_head(f"/socket.io/?EIO=4&transport=websocket&pit_id={pit_id}")
+
+        assert pick_worker(head, "10.0.0.1", 8) == shard_for_pit(pit_id, 8)
+
+    def test_pick_worker_falls_back_to_client_address(self):
+        head = _request_head("/socket.io/?EIO=4&transport=polling&pit_id=nope")
+
+        assert pick_worker(head, "10.0.0.1", 8) == shard_for_address("10.0.0.1", 8)
+
+    def test_manager_redirects_pits_owned_by_another_worker(self):
+        pit_id = uuid.uuid4()
+        owner = shard_for_pit(pit_id, 2)
+        client = socketio.test_client(app)
+        client.get_received()
+
+        pit_manager.shard = WorkerShard(1 - owner, 2)
+        try:
+            client.emit(CREATE_SNAKE_PIT_MESSAGE_NAME, str(pit_id))
+            client.emit(JOIN_PIT_MESSAGE_NAME, str(pit_id))
+        finally:
+            pit_manager.shard = None
+
+        redirects = [
+            event
+            for event in client.get_received()
+            if event["name"] == PIT_REDIRECT_MESSAGE_NAME
+        ]
+        assert len(redirects) == 2
+        assert redirects[0]["args"][0]["pit_id"] == str(pit_id)
+
+    def test_router_pins_connection_to_pit_owner(self):
+        async def scenario():
+            async def worker(index, reader, writer):
+                await reader.readuntil(b"\r\n\r\n")
+                writer.write(f"worker-{index}".encode())
+                await writer.drain()
+                writer.close()
+
+            workers = []
+            for index in range(3):
+                server = await asyncio.start_server(
+                    lambda r, w, index=index: worker(index, r, w), "127.0.0.1", 0
+                )
+                workers.append(server)
+
+            addresses = [s.sockets[0].getsockname()[:2] for s in workers]
+            router = await asyncio.start_server(
+                PitRouter(addresses)._handle_client, "127.0.0.1", 0
+            )
+            router_port = router.sockets[0].getsockname()[1]
+
+            pit_id = uuid.uuid4()
+            reader, writer = await asyncio.open_connection("127.0.0.1", router_port)
+            writer.write(_request_head(f"/socket.io/?pit_id={pit_id}"))
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+
+            router.close()
+            for server in workers:
+                server.close()
+
+            return response.decode(), shard_for_pit(pit_id, 3)
+
+        response, expected_worker = asyncio.run(scenario())
+        assert response == f"worker-{expected_worker}"
@@ -0,0 +1,120 @@
+import secrets
+import time
+import uuid
+
+from conftest import RecordingEmitter
+from server.model import World
+from server.negotiation_trace import NegotiationTracer
+from server.pit_manager import SnakePitManager
+from server.reaper import Reaper
+from server.snapshot import WorldSnapshot, write_snapshot
+
+
+class TestSnapshot:
+    def _resumable_manager(self):
+        emitter = RecordingEmitter()
+        manager = SnakePitManager(World(), emitter, resume_grace=30)
+        manager.reaper = Reaper(manager)
+        return manager, emitter
+
+    def _populated_manager(self):
+        manager, emitter = self._resumable_manager()
+        pit_id = uuid.uuid4()
+        manager.world.create_pit(pit_id)
+        for sid in ("sid1", "sid2"):
+            manager.handle_connect(sid)
+            manager.handle_join_pit(sid, pit_id)
+        tokens = [
+            connected["resume_token"] for connected, _ in emitter.events("connected")
+        ]
+        return manager, pit_id, tokens
+
+    def test_snapshot_round_trip(self, tmp_path):
+        manager, pit_id, tokens = self._populated_manager()
+        empty_pit_id = uuid.uuid4()
+        manager.world.create_pit(empty_pit_id)
+        path = str(tmp_path / "world.snapshot")
+
+        assert write_snapshot(manager.world, path) == 2
+
+        snapshot = WorldSnapshot.open(path)
+        assert len(snapshot) == 2
+        assert snapshot.has_pit(pit_id)
+        assert snapshot.has_pit(empty_pit_id)
+        assert not snapshot.has_pit(uuid.uuid4())
+
+        session = snapshot.find_session(tokens[1])
+        assert session.old_snake_id == "sid2"
+        assert session.pit_id == pit_id
+        assert session.name_index == manager.world.snakes["sid2"].name_index
+        assert snapshot.find_session("not-a-token") is None
+        assert snapshot.find_session(secrets.token_urlsafe(16)) is None
+        snapshot.close()
+
+    def test_missing_snapshot_opens_as_none(self, tmp_path):
+        assert WorldSnapshot.open(str(tmp_path / "missing")) is None
+
+    def test_sessions_resume_on_a_restarted_manager(self, tmp_path):
+        old_manager, pit_id, tokens = self._populated_manager()
+        path = str(tmp_path / "world.snapshot")
+        write_snapshot(old_manager.world, path)
+        old_name = old_manager.world.snakes["sid1"].display_name
+
+        manager, emitter = self._resumable_manager()
+        manager.load_snapshot(WorldSnapshot.open(path))
+        manager.handle_connect("sid1b", resume_token=tokens[0])
+
+        snake, pit = manager.world.get_snake_state("sid1b")
+        assert pit.id == pit_id
+        assert snake.display_name == old_name
+        resumed, to = emitter.events("connected")[-1]
+        assert to == "sid1b"
+        assert resumed["pit_id"] == str(pit_id)
+        assert emitter.events("peer_reattached") == [
+            ({"old_peer_id": "sid1", "new_peer_id": "sid1b"}, str(pit_id))
+        ]
+
+        # tokens from the snapshot are single use
+        manager.handle_connect("sid1c", resume_token=tokens[0])
+        assert manager.world.get_snake_state("sid1c")[1] is None
+
+        # peers without a token can still join the restored pit
+        manager.handle_connect("sid3")
+        manager.handle_join_pit("sid3", pit_id)
+        assert "sid3" in pit
+
+    def test_restored_names_stay_unique_after_the_snake_leaves(self, tmp_path):
+        old_manager, pit_id, tokens = self._populated_manager()
+        path = str(tmp_path / "world.snapshot")
+        write_snapshot(old_manager.world, path)
+
+        manager, _ = self._resumable_manager()
+        manager.load_snapshot(WorldSnapshot.open(path))
+        manager.handle_connect("sid1b", resume_token=tokens[0])
+        manager.handle_connect("sid2b", resume_token=tokens[1])
+        assert len(manager.names) == 2
+
+        manager.handle_disconnect("sid1b")
+        manager.reaper.expire_due(time.monotonic() + 60)
+        assert "sid1b" not in manager.world.snakes
+        assert len(manager.names) == 1
+
+        for index in range(200):
+            manager.handle_connect(f"new{index}")
+        names = [snake.display_name for snake in manager.world.snakes.values()]
+        assert len(set(names)) == len(names) == 201
+        assert len(manager.names) == 201
+
+    def test_restored_pit_is_traced_like_a_joined_one(self, tmp_path):
+        old_manager, pit_id, tokens = self._populated_manager()
+        path = str(tmp_path / "world.snapshot")
+        write_snapshot(old_manager.world, path)
+
+        manager, _ = self._resumable_manager()
+        manager.tracer = NegotiationTracer()
+        manager.load_snapshot(WorldSnapshot.open(path))
+        manager.handle_connect("sid1b", resume_token=tokens[0])
+        assert manager.tracer.pits[pit_id].mesh_started_at is None
+
+        manager.handle_connect("sid2b", resume_token=tokens[1])
+        assert manager.tracer.pits[pit_id].mesh_started_at is not None
@@ -0,0 +1,32 @@
+from server.timing_wheel import TimingWheel
+
+
+class TestTimingWheel:
+    def test_items_expire_once_their_deadline_passes(self):
+        wheel = TimingWheel(tick=1.0, now=0.0, slots=4, levels=2)
+        wheel.schedule("soon", 2.0)
+        wheel.schedule("later", 3.5)
+
+        assert wheel.advance(1.5) == []
+        assert wheel.advance(2.0) == ["soon"]
+        assert wheel.advance(3.9) == []
+        assert wheel.advance(4.0) == ["later"]
+        assert len(wheel) == 0
+
+    def test_far_deadlines_cascade_down_the_levels(self):
+        wheel = TimingWheel(tick=1.0, now=0.0, slots=4, levels=2)
+        # past the 16 ticks the two levels cover
+        wheel.schedule("far", 37.0)
+        wheel.schedule("mid", 9.0)
+
+        assert wheel.advance(8.0) == []
+        assert wheel.advance(9.0) == ["mid"]
+        assert wheel.advance(36.0) == []
+        assert wheel.advance(37.0) == ["far"]
+
+    def test_past_deadlines_expire_on_the_next_tick(self):
+        wheel = TimingWheel(tick=1.0, now=10.0)
+        wheel.schedule("late", 3.0)
+
+        assert wheel.advance(10.5) == []
+        assert wheel.advance(11.0) == ["late"]
@@ -0,0 +1,51 @@
+import uuid
+
+import pytest
+
+from server.packets import RawJson
+from server.validation import (
+    parse_ice_candidate,
+    parse_pit_id,
+    parse_session_description,
+    parse_snake_id,
+)
+
+
+class TestValidation:
+    def test_snake_ids(self):
+        assert parse_snake_id("AbC-12_x") == "AbC-12_x"
+        # the second lookup is answered from the cache
+        assert parse_snake_id("AbC-12_x") == "AbC-12_x"
+
+        for snake_id in ("", "a b", "a" * 65, None, 12, ["a"]):
+            with pytest.raises(ValueError, match="Invalid snake ID"):
+                parse_snake_id(snake_id)
+
+    def test_pit_ids(self):
+        pit_id = uuid.uuid4()
+        assert parse_pit_id(str(pit_id)) == pit_id
+
+        for invalid in ("not-a-uuid", None, 7):
+            with pytest.raises(ValueError, match="Invalid pit ID"):
+                parse_pit_id(invalid)
+
+    def test_session_descriptions_need_the_right_type(self):
+        offer = {"type": "offer", "sdp": "v=0", "sent_at": 1.5}
+        assert parse_session_description(offer, "offer") is offer
+        assert parse_session_description({"type": "pranswer"}, "answer", "pranswer")
+        raw = RawJson('{"type":"offer"}', {"type": "offer"})
+        assert parse_session_description(raw, "offer") is raw
+
+        for invalid in (offer, "v=0", None, {"type": "answer", "sdp": 0}):
+            with pytest.raises(ValueError):
+                parse_session_description(invalid, "answer")
+
+    def test_ice_candidates(self):
+        candidate = {"candidate": "candidate:1 1 udp 1 10.0.0.1 9 typ host"}
+        assert parse_ice_candidate(candidate) is candidate
+        # end of candidates
+        assert parse_ice_candidate(None) is None
+
+        for invalid in ("candidate", {"candidate": 1}, {"candidate": "x" * 2000}):
+            with pytest.raises(ValueError, match="Invalid ICE candidate"):
+                parse_ice_candidate(invalid)
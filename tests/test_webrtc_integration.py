@@ -1,7 +1,9 @@
+import math
 import time
 from typing import Any, TypedDict
 
-from server.server import app, socketio
+from server.sdp_compression import deflate_sdp
+from server.server import app, socketio, web_rtc_manager
 
 NEW_ROOM_MEMBER_MESSAGE_NAME = "new_room_member"
 JOIN_PIT_MESSAGE_NAME = "join_snake_pit"
@@ -11,6 +13,7 @@ SEND_ANSWER_MESSAGE_NAME = "send_answer"
 NEW_ANSWER_MESSAGE_NAME = "new_answer"
 SEND_ICE_CANDIDATE_MESSAGE_NAME = "send_ice_candidate"
 NEW_ICE_CANDIDATE_MESSAGE_NAME = "new_ice_candidate"
+NEW_ICE_CANDIDATES_MESSAGE_NAME = "new_ice_candidates"
 
 
 class SocketIOMessage(TypedDict):
@@ -29,8 +32,8 @@ class TestWebRtcIntegration:
             if event["name"] == NEW_ROOM_MEMBER_MESSAGE_NAME
         ]
 
-    def _create_and_connect_client(self):
-        client = socketio.test_client(app)
+    def _create_and_connect_client(self, auth=None):
+        client = socketio.test_client(app, auth=auth)
         client.get_received()  # Clear initial connection events to avoid interference with test assertions
         return client
 
@@ -118,6 +121,70 @@ class TestWebRtcIntegration:
         assert event_data["newIceCandidate"] == ice_candidate_data
         assert "fromPeerId" in event_data
 
+    def test_ice_candidates_batched_for_capable_peer(self):
+        # setup
+        client1 = self._create_and_connect_client()
+        client2 = self._create_and_connect_client(
+            auth={"capabilities": ["ice_candidate_batching"]}
+        )
+
+        self._join_pit(client1, self.PIT_ID)
+        time.sleep(0.01)
+        self._join_pit(client2, self.PIT_ID)
+        time.sleep(0.01)
+
+        peer_ids = self._get_peer_ids_from_events(client1.get_received())
+        client2_peer_id = peer_ids[0]
+
+        candidates = [
+            {
+                "candidate": f"candidate:{n} 1 UDP 2113667326 192.168.1.100 5440{n} typ host",
+                "sdpMLineIndex": 0,
+                "sdpMid": "0",
+            }
+            for n in range(3)
+        ]
+        for candidate in candidates + [candidates[0]]:
+            client1.emit(SEND_ICE_CANDIDATE_MESSAGE_NAME, client2_peer_id, candidate)
+
+        web_rtc_manager.flush_ice_candidates(now=math.inf)
+
+        # verify
+        received = client2.get_received()
+        single_events = [e for e in received if e["name"] == NEW_ICE_CANDIDATE_MESSAGE_NAME]
+        batch_events = [e for e in received if e["name"] == NEW_ICE_CANDIDATES_MESSAGE_NAME]
+
+        assert len(single_events) == 0
+        assert len(batch_events) == 1
+        assert batch_events[0]["args"][0]["newIceCandidates"] == candidates
+        assert "fromPeerId" in batch_events[0]["args"][0]
+
+    def test_deflated_offers_are_inflated_for_plain_peers(self):
+        # setup
+        client1 = self._create_and_connect_client(
+            auth={"capabilities": ["sdp_deflate"]}
+        )
+        client2 = self._create_and_connect_client()
+        client3 = self._create_and_connect_client(
+            auth={"capabilities": ["sdp_deflate"]}
+        )
+
+        for client in (client1, client2, client3):
+            self._join_pit(client, self.PIT_ID)
+            time.sleep(0.01)
+
+        peer_ids = self._get_peer_ids_from_events(client1.get_received())
+        sdp = "v=0\r\no=- 1 2 IN IP4 127.0.0.1\r\ns=-\r\nt=0 0\r\n"
+        offer = {"type": "offer", "sdp_deflate": deflate_sdp(sdp)}
+        for peer_id in peer_ids:
+            client1.emit(SEND_OFFER_MESSAGE_NAME, peer_id, offer)
+
+        # verify
+        plain = self._get_events_by_name(client2, NEW_OFFER_MESSAGE_NAME)
+        deflated = self._get_events_by_name(client3, NEW_OFFER_MESSAGE_NAME)
+        assert plain[0]["args"][0]["offer"] == {"type": "offer", "sdp": sdp}
+        assert deflated[0]["args"][0]["offer"] == offer
+
     def test_webrtc_messages_only_sent_to_target_peer(self):
         # setup
         client1 = self._create_and_connect_client()